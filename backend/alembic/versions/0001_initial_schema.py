@@ -0,0 +1,65 @@
+"""Initial schema: products and product_chunks.
+
+Databases created before migrations existed (by Base.metadata.create_all at
+startup) already have these tables, so they are only created when missing.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "products" not in existing:
+        op.create_table(
+            "products",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("title", sa.String(), nullable=False),
+            sa.Column("price", sa.String(), nullable=True),
+            sa.Column("description", sa.Text(), nullable=True),
+            sa.Column("features", sa.JSON(), nullable=True),
+            sa.Column("image_url", sa.String(), nullable=True),
+            sa.Column("category", sa.String(), nullable=True),
+            sa.Column("source_url", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("source_url"),
+        )
+        op.create_index("ix_products_id", "products", ["id"])
+
+    if "product_chunks" not in existing:
+        op.create_table(
+            "product_chunks",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("product_id", sa.Integer(), nullable=False),
+            sa.Column("chunk_text", sa.Text(), nullable=False),
+            sa.Column("embedding", sa.JSON(), nullable=True),
+            sa.Column("meta", sa.JSON(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.ForeignKeyConstraint(["product_id"], ["products.id"], ondelete="CASCADE"),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_product_chunks_id", "product_chunks", ["id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_product_chunks_id", table_name="product_chunks")
+    op.drop_table("product_chunks")
+    op.drop_index("ix_products_id", table_name="products")
+    op.drop_table("products")
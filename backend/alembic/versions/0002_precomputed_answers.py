@@ -0,0 +1,49 @@
+"""Precomputed chat answers per query cluster and catalog version.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if "precomputed_answers" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "precomputed_answers",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("catalog_version", sa.String(), nullable=False),
+        sa.Column("encoder", sa.String(), nullable=False),
+        sa.Column("cluster", sa.Integer(), nullable=False),
+        sa.Column("query", sa.Text(), nullable=False),
+        sa.Column("member_queries", sa.JSON(), nullable=True),
+        sa.Column("centroid", sa.JSON(), nullable=False),
+        sa.Column("top_k", sa.Integer(), nullable=False),
+        sa.Column("message", sa.Text(), nullable=False),
+        sa.Column("recommendations", sa.JSON(), nullable=False),
+        sa.Column("meta", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_precomputed_answers_id", "precomputed_answers", ["id"])
+    op.create_index("ix_precomputed_answers_catalog_version", "precomputed_answers", ["catalog_version"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_precomputed_answers_catalog_version", table_name="precomputed_answers")
+    op.drop_index("ix_precomputed_answers_id", table_name="precomputed_answers")
+    op.drop_table("precomputed_answers")
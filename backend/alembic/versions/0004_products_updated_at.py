@@ -0,0 +1,36 @@
+"""products.updated_at for incremental catalog store refreshes.
+
+Existing rows keep NULL; the catalog store picks them up by id on its first load.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    columns = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("products")}
+    if "updated_at" not in columns:
+        with op.batch_alter_table("products") as batch_op:
+            batch_op.add_column(sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True))
+            batch_op.create_index("ix_products_updated_at", ["updated_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("products") as batch_op:
+        batch_op.drop_index("ix_products_updated_at")
+        batch_op.drop_column("updated_at")
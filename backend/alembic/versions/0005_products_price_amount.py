@@ -0,0 +1,84 @@
+"""Normalized numeric price and currency on products.
+
+Existing rows are backfilled by parsing their price text. The parser is a
+frozen copy of app.pricing.parse_price as of this revision, so the migration
+does not import (and start) the app.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 00:00:00
+
+"""
+import os
+import re
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, Sequence[str], None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DEFAULT_CURRENCY = os.getenv("DEFAULT_CURRENCY", "INR")
+CURRENCY_SYMBOLS = {
+    "₹": "INR", "rs": "INR", "rs.": "INR", "inr": "INR",
+    "$": "USD", "usd": "USD",
+    "€": "EUR", "eur": "EUR",
+    "£": "GBP", "gbp": "GBP",
+}
+_AMOUNT = r"(\d{1,3}(?:,\d{2,3})+(?:\.\d+)?|\d+(?:\.\d+)?)"
+_WITH_CURRENCY = re.compile(r"(₹|\$|€|£|\brs\.?|\binr\b|\busd\b|\beur\b|\bgbp\b)\s*" + _AMOUNT, re.IGNORECASE)
+_BARE = re.compile(r"(?<![\w.])" + _AMOUNT + r"(?![\w.])")
+
+
+def parse_price(text):
+    """(amount, currency) from scraped price text, or (None, None); the first amount wins."""
+    match = _WITH_CURRENCY.search(text)
+    if match:
+        symbol, amount = match.group(1).lower(), match.group(2)
+        currency = CURRENCY_SYMBOLS.get(symbol, DEFAULT_CURRENCY)
+    else:
+        match = _BARE.search(text)
+        if not match:
+            return None, None
+        amount, currency = match.group(1), DEFAULT_CURRENCY
+    return float(amount.replace(",", "")), currency.upper()
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    columns = {c["name"] for c in sa.inspect(bind).get_columns("products")}
+    if "price_amount" in columns:
+        return
+    with op.batch_alter_table("products") as batch_op:
+        batch_op.add_column(sa.Column("price_amount", sa.Numeric(12, 2, asdecimal=False), nullable=True))
+        batch_op.add_column(sa.Column("price_currency", sa.String(3), nullable=True))
+        batch_op.create_index("ix_products_price_amount", ["price_amount"])
+
+    rows = bind.execute(sa.text("SELECT id, price FROM products WHERE price IS NOT NULL")).all()
+    updates = []
+    for pid, price in rows:
+        amount, currency = parse_price(str(price))
+        if amount is not None:
+            updates.append({"id": pid, "amount": amount, "currency": currency})
+    if updates:
+        bind.execute(
+            sa.text("UPDATE products SET price_amount = :amount, price_currency = :currency WHERE id = :id"),
+            updates,
+        )
+        # new catalog version: ETags change and the catalog store reloads (rows have no version stamp
+        # before 0007, so the store's incremental refresh cannot pick them out)
+        bind.execute(sa.text("UPDATE catalog_state SET version = version + 1 WHERE id = 1"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("products") as batch_op:
+        batch_op.drop_index("ix_products_price_amount")
+        batch_op.drop_column("price_currency")
+        batch_op.drop_column("price_amount")
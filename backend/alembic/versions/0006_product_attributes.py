@@ -0,0 +1,128 @@
+"""Normalized product attributes: interned keys and values, product_attributes rows.
+
+Existing rows are backfilled from products.features. The backfill is a
+frozen copy of app.attributes (normalize, feature_pairs, interning) as of
+this revision, in Core only, so the migration does not import the app.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, Sequence[str], None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH = 5000
+
+products = sa.table("products", sa.column("id", sa.Integer), sa.column("features", sa.JSON))
+attribute_keys = sa.table("attribute_keys", sa.column("id", sa.Integer), sa.column("name", sa.String), sa.column("label", sa.String))
+attribute_values = sa.table("attribute_values", sa.column("id", sa.Integer), sa.column("value", sa.Text), sa.column("label", sa.Text))
+product_attributes = sa.table(
+    "product_attributes", sa.column("product_id", sa.Integer), sa.column("key_id", sa.Integer), sa.column("value_id", sa.Integer)
+)
+
+
+def normalize(text) -> str:
+    return " ".join(str(text).split()).lower()
+
+
+def feature_pairs(features):
+    """Distinct (key, value) display pairs of a product's features JSON; nested values are skipped."""
+    if not isinstance(features, dict):
+        return []
+    pairs, seen = [], set()
+    for key, value in features.items():
+        key = " ".join(str(key).split())
+        for item in value if isinstance(value, list) else [value]:
+            if item is None or isinstance(item, (dict, list)):
+                continue
+            text = " ".join(str(item).split())
+            norm = (normalize(key), normalize(text))
+            if key and text and norm not in seen:
+                seen.add(norm)
+                pairs.append((key, text))
+    return pairs
+
+
+def intern(bind, table, column: str, labels, ids) -> None:
+    """Add the ids of `labels` ({normalized: label}) not in `ids` yet, inserting them."""
+    missing = [norm for norm in labels if norm not in ids]
+    if not missing:
+        return
+    bind.execute(table.insert(), [{column: norm, "label": labels[norm]} for norm in missing])
+    col = table.c[column]
+    for start in range(0, len(missing), 500):
+        ids.update({norm: i for i, norm in bind.execute(sa.select(table.c.id, col).where(col.in_(missing[start:start + 500])))})
+
+
+def backfill(bind) -> None:
+    key_ids, value_ids = {}, {}
+    last_id = 0
+    while True:
+        page = bind.execute(
+            sa.select(products.c.id, products.c.features).where(products.c.id > last_id).order_by(products.c.id).limit(BATCH)
+        ).all()
+        if not page:
+            return
+        pairs = {pid: feature_pairs(features) for pid, features in page}
+        intern(bind, attribute_keys, "name", {normalize(k): k for ps in pairs.values() for k, _ in ps}, key_ids)
+        intern(bind, attribute_values, "value", {normalize(v): v for ps in pairs.values() for _, v in ps}, value_ids)
+        rows = [
+            {"product_id": pid, "key_id": key_ids[normalize(k)], "value_id": value_ids[normalize(v)]}
+            for pid, ps in pairs.items() for k, v in ps
+        ]
+        if rows:
+            bind.execute(product_attributes.insert(), rows)
+        last_id = page[-1][0]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if "product_attributes" in sa.inspect(bind).get_table_names():
+        return
+    op.create_table(
+        "attribute_keys",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("label", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("name"),
+    )
+    op.create_table(
+        "attribute_values",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("value", sa.Text(), nullable=False),
+        sa.Column("label", sa.Text(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("value"),
+    )
+    op.create_table(
+        "product_attributes",
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("key_id", sa.Integer(), nullable=False),
+        sa.Column("value_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["product_id"], ["products.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["key_id"], ["attribute_keys.id"]),
+        sa.ForeignKeyConstraint(["value_id"], ["attribute_values.id"]),
+        sa.PrimaryKeyConstraint("product_id", "key_id", "value_id"),
+    )
+    op.create_index("ix_product_attributes_key_value", "product_attributes", ["key_id", "value_id"])
+    backfill(bind)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_product_attributes_key_value", table_name="product_attributes")
+    op.drop_table("product_attributes")
+    op.drop_table("attribute_values")
+    op.drop_table("attribute_keys")
@@ -0,0 +1,39 @@
+"""products.catalog_version: the catalog version of each row's last write.
+
+Replaces updated_at as the catalog store's incremental refresh marker;
+SQLite's CURRENT_TIMESTAMP has one-second resolution, so rows written in
+the same second as a load were missed. Existing rows keep NULL; the store
+picks them up on its first full load.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, Sequence[str], None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    columns = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("products")}
+    if "catalog_version" not in columns:
+        with op.batch_alter_table("products") as batch_op:
+            batch_op.add_column(sa.Column("catalog_version", sa.Integer(), nullable=True))
+            batch_op.create_index("ix_products_catalog_version", ["catalog_version"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("products") as batch_op:
+        batch_op.drop_index("ix_products_catalog_version")
+        batch_op.drop_column("catalog_version")
@@ -0,0 +1,35 @@
+"""Cross-process job leases (app.leases).
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, Sequence[str], None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if "job_leases" not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table(
+            "job_leases",
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("holder", sa.String(), nullable=True),
+            sa.Column("expires_at", sa.Float(), nullable=False),
+            sa.PrimaryKeyConstraint("name"),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("job_leases")
@@ -0,0 +1,37 @@
+"""Drop products.updated_at, superseded by products.catalog_version (0007).
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0009"
+down_revision: Union[str, Sequence[str], None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if "updated_at" not in {c["name"] for c in sa.inspect(bind).get_columns("products")}:
+        return
+    indexes = {i["name"] for i in sa.inspect(bind).get_indexes("products")}
+    with op.batch_alter_table("products") as batch_op:
+        if "ix_products_updated_at" in indexes:
+            batch_op.drop_index("ix_products_updated_at")
+        batch_op.drop_column("updated_at")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("products") as batch_op:
+        batch_op.add_column(sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True))
+        batch_op.create_index("ix_products_updated_at", ["updated_at"])
@@ -1,13 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
-from .database import get_db, engine, Base
-from . import crud, schemas, models
-from scraper.scraper import scrape_site
+from sqlalchemy.ext.asyncio import AsyncSession
+from .database import get_db, get_read_db, engine, Base
+from .async_database import get_async_db
+from . import crud, schemas
 from .retrieval import search_knn, build_embeddings_for_products, get_embedding_model
-from .database import SessionLocal
-from .llm import generate_response
+from .search_filters import SearchFilters
+from .llm import generate_response, gateway
+from .context_builder import build_prompt
+from .catalog import get_catalog_version_async, product_dict
+from .http_cache import catalog_response
+from .metrics import PROFILER_MAX_SECONDS, profiler
+from . import attributes, catalog_store, precomputed, warmup
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Any, Dict, NamedTuple, Optional, List, Union
 import logging
 
 logger = logging.getLogger(__name__)
@@ -17,23 +24,16 @@ router = APIRouter()
 
 @router.on_event("startup")
 def on_startup():
-    import os
-    print(f"Current working directory: {os.getcwd()}")
-    print(f"Files in cwd: {os.listdir('.')}")
-    print(f"dev.db exists: {os.path.exists('dev.db')}")
-    if os.path.exists('dev.db'):
-        print(f"dev.db size: {os.path.getsize('dev.db')} bytes")
-    # create tables if they do not exist (for quick start)
-    Base.metadata.create_all(bind=engine)
-    # Check how many products are in database
-    db = SessionLocal()
-    count = db.query(models.Product).count()
-    print(f"Products in database: {count}")
-    db.close()
+    # Schema is managed by Alembic (`alembic upgrade head`); nothing blocking happens here
+    # so the worker starts listening immediately. See app.warmup for STARTUP_MODE.
+    if warmup.AUTO_CREATE_SCHEMA:
+        Base.metadata.create_all(bind=engine)
+    if warmup.STARTUP_MODE == "warm":
+        warmup.start_warmup()
 
 
 @router.get("/debug/db")
-def debug_db(db: Session = Depends(get_db)):
+async def debug_db(db: AsyncSession = Depends(get_async_db)):
     """Debug endpoint to check database status"""
     import os
     from pathlib import Path
@@ -46,15 +46,48 @@ def debug_db(db: Session = Depends(get_db)):
         "db_path": str(db_path),
         "db_exists": os.path.exists(db_path),
         "db_size": os.path.getsize(db_path) if os.path.exists(db_path) else 0,
-        "product_count": db.query(models.Product).count(),
-        "chunk_count": db.query(models.ProductChunk).count(),
+        "product_count": await crud.count_products_async(db),
+        "chunk_count": await crud.count_chunks_async(db),
         "files_in_base_dir": os.listdir(BASE_DIR) if os.path.exists(BASE_DIR) else []
     }
 
 
+@router.post("/debug/profiler/start")
+def profiler_start(
+    interval_ms: float = Query(None, gt=0, le=1000, description="Sampling interval"),
+    seconds: float = Query(PROFILER_MAX_SECONDS, gt=0, le=PROFILER_MAX_SECONDS, description="Stop automatically after"),
+):
+    """Start the sampling profiler on this worker; it stops itself after `seconds`."""
+    profiler.start(interval_ms / 1000.0 if interval_ms else None, seconds=seconds)
+    return profiler.summary(top=0)
+
+
+@router.post("/debug/profiler/stop")
+def profiler_stop(top: int = Query(20, ge=1, le=200)):
+    """Stop the sampling profiler and return the hottest stacks."""
+    profiler.stop()
+    return profiler.summary(top=top)
+
+
+@router.get("/debug/profiler")
+def profiler_report(top: int = Query(20, ge=1, le=200), collapsed: bool = False):
+    """Current profile; collapsed=true returns flamegraph-ready text."""
+    if collapsed:
+        return PlainTextResponse(profiler.collapsed())
+    return profiler.summary(top=top)
+
+
+@router.get("/debug/llm")
+def llm_status():
+    """LLM gateway state: circuit breaker, recent latency quantiles and the next attempt timeout."""
+    return gateway.stats()
+
+
 @router.post("/scrape")
 def run_scraper(site: str = "furlenco", db: Session = Depends(get_db)):
     """Run scraper for a given site. Returns number of items inserted."""
+    # imported on first use: requests + bs4 are not needed to serve reads
+    from scraper.scraper import scrape_site
     try:
         products = scrape_site(site)
     except Exception as e:
@@ -73,45 +106,118 @@ def run_scraper(site: str = "furlenco", db: Session = Depends(get_db)):
     return {"inserted": inserted, "attempted": len(products), "site": site}
 
 
+def check_price_range(min_price: Optional[float], max_price: Optional[float]) -> None:
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise HTTPException(status_code=422, detail="min_price must not exceed max_price")
+
+
+def parse_attribute_filters(attr: Optional[List[str]]) -> Dict[str, str]:
+    try:
+        return attributes.parse_filters(attr)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
 @router.get("/products")
-def products(
+async def products(
+    request: Request,
     skip: int = Query(0, ge=0, description="Number of products to skip"),
     limit: int = Query(100, ge=1, le=500, description="Max products to return"),
     search: Optional[str] = Query(None, description="Search in title/description"),
     category: Optional[str] = Query(None, description="Filter by category"),
-    db: Session = Depends(get_db)
+    min_price: Optional[float] = Query(None, ge=0, description="Minimum price_amount"),
+    max_price: Optional[float] = Query(None, ge=0, description="Maximum price_amount"),
+    sort: str = Query("id", pattern="^(id|price_asc|price_desc)$", description="id, price_asc or price_desc"),
+    attr: Optional[List[str]] = Query(None, description="Feature filter as key:value (value substring), repeatable"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """List products with optional filtering and pagination."""
-    items = crud.list_products(db, skip=skip, limit=limit)
-    
-    # Apply filters if provided
-    if search:
-        search_lower = search.lower()
-        items = [p for p in items if search_lower in (p.title or "").lower() or search_lower in (p.description or "").lower()]
-    
-    if category:
-        items = [p for p in items if category.lower() in (p.category or "").lower()]
-    
-    return {
-        "products": items,
-        "count": len(items),
-        "skip": skip,
-        "limit": limit
-    }
+    """List products with optional filtering and pagination.
+
+    Filters apply before pagination; `total` counts all matches. Price filters
+    and sorting use the parsed `price_amount` (products without one are
+    excluded by price filters and sorted last); `attr` filters use the
+    normalized attribute tables (app.attributes). Served from the in-memory
+    catalog store (CATALOG_STORE) or SQL, and cached per catalog version
+    (ETag / 304, see app.http_cache).
+    """
+    check_price_range(min_price, max_price)
+    attribute_filters = parse_attribute_filters(attr)
+    version = await get_catalog_version_async(db)
+    filters = dict(search=search, category=category, min_price=min_price, max_price=max_price, sort=sort)
+
+    async def build():
+        if catalog_store.CATALOG_STORE:
+            cols = await catalog_store.store.ensure(db, version)
+            product_ids = None
+            if attribute_filters:
+                product_ids = await crud.product_ids_with_attributes_async(db, attribute_filters)
+            positions, total = catalog_store.store.query(cols, skip, limit, product_ids=product_ids, **filters)
+            return catalog_store.render_page(cols, positions, total, skip, limit)
+
+        items, total = await crud.search_products_async(db, skip=skip, limit=limit, attr_filters=attribute_filters, **filters)
+        return {
+            "products": [product_dict(p) for p in items],
+            "count": len(items),
+            "total": total,
+            "skip": skip,
+            "limit": limit
+        }
+
+    return await catalog_response(request, version, build)
+
+
+@router.get("/facets")
+async def facets(
+    request: Request,
+    search: Optional[str] = Query(None, description="Search in title/description"),
+    category: Optional[str] = Query(None, description="Filter by category"),
+    min_price: Optional[float] = Query(None, ge=0, description="Minimum price_amount"),
+    max_price: Optional[float] = Query(None, ge=0, description="Maximum price_amount"),
+    attr: Optional[List[str]] = Query(None, description="Feature filter as key:value (value substring), repeatable"),
+    keys: Optional[str] = Query(None, description="Comma-separated attribute keys to count (default all)"),
+    limit: int = Query(20, ge=1, le=200, description="Max values per attribute key"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Product counts per category and per feature value, among products matching the /products filters.
+
+    Counted in SQL over the normalized attribute tables and cached per catalog
+    version like /products. Each attribute's `key` is what `attr` filters take.
+    """
+    check_price_range(min_price, max_price)
+    attribute_filters = parse_attribute_filters(attr)
+    key_names = [attributes.normalize(k) for k in keys.split(",") if k.strip()] if keys else None
+
+    async def build():
+        return await crud.facet_counts_async(
+            db, keys=key_names, limit=limit, search=search, category=category,
+            min_price=min_price, max_price=max_price, attr_filters=attribute_filters,
+        )
+
+    return await catalog_response(request, await get_catalog_version_async(db), build)
 
 
 @router.get("/products/{product_id}")
-def product_detail(product_id: int, db: Session = Depends(get_db)):
+async def product_detail(request: Request, product_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get detailed information about a specific product."""
-    item = crud.get_product(db, product_id)
-    if not item:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return item
+    async def build():
+        item = await crud.get_product_async(db, product_id)
+        if not item:
+            raise HTTPException(status_code=404, detail="Product not found")
+        return product_dict(item)
+
+    return await catalog_response(request, await get_catalog_version_async(db), build)
 
 
 class ChatRequest(BaseModel):
     message: str = Field(..., min_length=2, max_length=1000, description="User's query")
     top_k: int = Field(3, ge=1, le=10, description="Number of recommendations")
+    min_price: Optional[float] = Field(None, ge=0, description="Only recommend products priced at least this")
+    max_price: Optional[float] = Field(None, ge=0, description="Only recommend products priced at most this")
+    category: Optional[str] = Field(None, max_length=100, description="Only recommend products in a matching category")
+    attributes: Optional[Dict[str, str]] = Field(
+        None, description='Feature filters, e.g. {"Concern": "hair fall"}; values match as substrings'
+    )
+    sort: str = Field("relevance", pattern="^(relevance|price_asc|price_desc)$", description="Order of the recommendations")
 
 
 class ProductRecommendation(BaseModel):
@@ -119,16 +225,20 @@ class ProductRecommendation(BaseModel):
     title: str
     score: float
     reason: str
+    price_amount: Optional[float] = None
+    price_currency: Optional[str] = None
 
 
 class ChatResponse(BaseModel):
     message: str
     recommendations: List[ProductRecommendation]
     query: str
+    # prompt size estimates from the context builder; None when no prompt was built
+    metadata: Optional[Dict[str, Any]] = None
 
 
 @router.post("/chat", response_model=ChatResponse)
-def chat(req: ChatRequest):
+def chat(req: ChatRequest, db: Session = Depends(get_read_db)):
     """
     AI-powered product recommendation chat.
     
@@ -191,12 +301,76 @@ def chat(req: ChatRequest):
     except Exception as e:
         logger.error(f"Embedding model error: {e}")
         raise HTTPException(status_code=503, detail="AI service temporarily unavailable")
-    
+
+    check_price_range(req.min_price, req.max_price)
+    precomputed.log_query(original_query)
+    filters = SearchFilters(req.category, req.min_price, req.max_price, req.attributes)
+    # Popular concerns are answered from the precomputed table (see app.precomputed); those are unfiltered
+    hit, query_embedding = None, None
+    if not filters and req.sort == "relevance":
+        hit, query_embedding = precomputed.lookup(original_query, req.top_k, db)
+    if hit:
+        return ChatResponse(query=query, **hit)
+
+    draft = prepare_answer(original_query, req.top_k, db, filters=filters, sort=req.sort, query_embedding=query_embedding)
+    if isinstance(draft, ChatResponse):
+        return draft
+    # Return this request's pooled connection before the (slow) LLM call
+    db.close()
+    return complete_answer(draft)
+
+
+class AnswerDraft(NamedTuple):
+    """Everything complete_answer() needs; it does not touch the database."""
+    original_query: str
+    recommendations: List[ProductRecommendation]
+    prompt: str
+    metadata: Dict[str, Any]
+
+
+def answer_query(
+    original_query: str,
+    top_k: int,
+    db: Session,
+    filters: Optional[SearchFilters] = None,
+    sort: str = "relevance",
+    query_embedding=None,
+) -> ChatResponse:
+    """Retrieval + LLM answer for an in-scope query; also used to build precomputed answers.
+
+    `db` stays open; callers that can release it before the LLM call use
+    prepare_answer() and complete_answer() instead.
+    """
+    draft = prepare_answer(original_query, top_k, db, filters=filters, sort=sort, query_embedding=query_embedding)
+    return draft if isinstance(draft, ChatResponse) else complete_answer(draft)
+
+
+def prepare_answer(
+    original_query: str,
+    top_k: int,
+    db: Session,
+    filters: Optional[SearchFilters] = None,
+    sort: str = "relevance",
+    query_embedding=None,
+) -> Union[ChatResponse, AnswerDraft]:
+    """Retrieval, hydration and prompt building; a ChatResponse when there is nothing to ask the LLM.
+
+    Filters are applied inside the vector search, before top-k selection;
+    `sort` reorders the chosen products. `query_embedding` is passed on to search_knn.
+    """
+    query = original_query.lower()
+
     # Semantic search
-    results = search_knn(original_query, top_k=10)
+    results = search_knn(original_query, top_k=10, db=db, filters=filters, query_embedding=query_embedding)
     
     # Edge case: no results found OR very low relevance scores
     if not results:
+        if filters:
+            return ChatResponse(
+                message="I couldn't find products matching your query with those filters. Try widening the price range or removing some filters.",
+                recommendations=[],
+                query=query
+            )
         return ChatResponse(
             message="I couldn't find products matching your query. Try describing your needs differently, for example: 'I need help with hair fall' or 'looking for scalp treatment'.",
             recommendations=[],
@@ -213,55 +387,37 @@ def chat(req: ChatRequest):
         context_snippets.append(chunk)
 
     # Pick top products
-    ranked = sorted(agg.items(), key=lambda kv: kv[1]["score"], reverse=True)[:req.top_k]
+    ranked = sorted(agg.items(), key=lambda kv: kv[1]["score"], reverse=True)[:top_k]
+    # Hydrate the ranked products with one query on the request session
+    products_by_id = crud.get_products(db, [prod_id for prod_id, _ in ranked])
+    if sort != "relevance":
+        ranked = sort_by_price(ranked, products_by_id, descending=sort == "price_desc")
     recs = []
-    db = SessionLocal()
-    try:
-        for prod_id, info in ranked:
-            prod = crud.get_product(db, prod_id)
-            title = prod.title if prod else f"Product {prod_id}"
-            reason = info["chunks"][0][:200] if info["chunks"] else "Matches your query"
-            recs.append(ProductRecommendation(
-                product_id=prod_id,
-                title=title,
-                score=round(info["score"], 3),
-                reason=reason
-            ))
-    finally:
-        db.close()
-
-    # Build prompt for Gemini - include more product details
-    product_context = ""
-    db2 = SessionLocal()
-    try:
-        for r in recs:
-            prod = crud.get_product(db2, r.product_id)
-            if prod:
-                desc = (prod.description or "")[:300]
-                product_context += f"- {r.title}: {desc}\n"
-            else:
-                product_context += f"- {r.title}: {r.reason}\n"
-    finally:
-        db2.close()
-    
-    prompt = f"""You are a knowledgeable health & wellness product advisor.
-
-The customer asked: "{original_query}"
-
-Here are the most relevant products from our store:
-{product_context}
+    for prod_id, info in ranked:
+        prod = products_by_id.get(prod_id)
+        title = prod.title if prod else f"Product {prod_id}"
+        reason = info["chunks"][0][:200] if info["chunks"] else "Matches your query"
+        recs.append(ProductRecommendation(
+            product_id=prod_id,
+            title=title,
+            score=round(info["score"], 3),
+            reason=reason,
+            price_amount=prod.price_amount if prod else None,
+            price_currency=prod.price_currency if prod else None,
+        ))
 
-Write a helpful, personalized response that:
-1. Acknowledges what the customer is looking for
-2. Explains specifically WHY each recommended product would help with their concern
-3. Mentions key ingredients or benefits if relevant
-4. Keep it conversational and friendly (3-4 sentences max)
+    # Pack the most relevant product context under the prompt token budget
+    prompt, prompt_stats = build_prompt(original_query, [prod_id for prod_id, _ in ranked], products_by_id, results)
+    metadata = {**prompt_stats, "filters": filters.as_dict()} if filters else prompt_stats
+    return AnswerDraft(original_query, recs, prompt, metadata)
 
-Do NOT use bullet points or markdown. Write in natural paragraphs."""
 
+def complete_answer(draft: AnswerDraft) -> ChatResponse:
+    """LLM answer for a prepared draft, with a fallback message when the LLM fails."""
+    original_query, recs = draft.original_query, draft.recommendations
     # Generate LLM response with fallback
     try:
-        llm_out = generate_response(prompt)
+        llm_out = generate_response(draft.prompt)
     except Exception as e:
         logger.warning(f"LLM error: {e}")
         llm_out = None
@@ -274,5 +430,16 @@ Do NOT use bullet points or markdown. Write in natural paragraphs."""
     return ChatResponse(
         message=llm_out,
         recommendations=[r.dict() for r in recs],
-        query=query
+        query=original_query.lower(),
+        metadata=draft.metadata,
     )
+
+
+def sort_by_price(ranked, products_by_id, descending: bool = False):
+    """Reorder (product_id, info) pairs by price_amount; unknown prices go last."""
+    def price(item):
+        prod = products_by_id.get(item[0])
+        return prod.price_amount if prod is not None else None
+
+    known = sorted((item for item in ranked if price(item) is not None), key=price, reverse=descending)
+    return known + [item for item in ranked if price(item) is None]
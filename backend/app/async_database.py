@@ -0,0 +1,37 @@
+"""Async SQLAlchemy engine for read endpoints served on the event loop.
+
+Mirrors app.database: same URL (rewritten to the aiosqlite / asyncpg driver),
+same SQLite pragmas and pool settings. The sync engine in app.database stays
+the one used by scripts such as init_db.py and create_embeddings.py.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from .database import DATABASE_URL, apply_sqlite_pragmas, pool_options
+
+
+def to_async_url(url: str) -> str:
+    """Swap the sync driver in a database URL for its asyncio counterpart."""
+    scheme, sep, rest = url.partition("://")
+    driver = scheme.split("+", 1)[0]
+    if driver == "sqlite":
+        return f"sqlite+aiosqlite{sep}{rest}"
+    if driver in ("postgres", "postgresql"):
+        return f"postgresql+asyncpg{sep}{rest}"
+    return url
+
+
+ASYNC_DATABASE_URL = to_async_url(DATABASE_URL)
+
+if ASYNC_DATABASE_URL.startswith("sqlite"):
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=False)
+    apply_sqlite_pragmas(async_engine.sync_engine)
+else:
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=False, **pool_options())
+
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False, class_=AsyncSession)
+
+
+async def get_async_db():
+    """Request-scoped AsyncSession for read endpoints."""
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,165 @@
+"""Normalized storage of Product.features.
+
+`Product.features` stays the scraped JSON; it is what the API returns. Its
+(key, value) pairs are also stored normalized:
+- attribute_keys / attribute_values: interned strings. Each distinct key or
+  value is stored once, however many products use it.
+- product_attributes: (product_id, key_id, value_id) rows, indexed by product
+  and by (key, value)
+
+Facet counts and attribute filters read these tables instead of loading and
+parsing every product's JSON. A flush that inserts a product, changes its
+features or deletes it rewrites the product's rows in the same transaction
+(like the catalog version bump in app.catalog). Bulk and raw-SQL writers call
+rebuild_product_attributes() themselves.
+
+Keys and values are matched on their normalized form (lowercased,
+whitespace collapsed); `label` keeps the text as first scraped for display.
+The scrapers' `features` list fallback becomes key "features" with one value
+per item.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, event, insert, inspect, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from . import models
+
+BATCH = 500
+
+
+def normalize(text) -> str:
+    return " ".join(str(text).split()).lower()
+
+
+def feature_pairs(features) -> List[Tuple[str, str]]:
+    """Distinct (key, value) display pairs of a product's features JSON; nested values are skipped."""
+    if not isinstance(features, dict):
+        return []
+    pairs, seen = [], set()
+    for key, value in features.items():
+        key = " ".join(str(key).split())
+        for item in value if isinstance(value, list) else [value]:
+            if item is None or isinstance(item, (dict, list)):
+                continue
+            text = " ".join(str(item).split())
+            norm = (normalize(key), normalize(text))
+            if key and text and norm not in seen:
+                seen.add(norm)
+                pairs.append((key, text))
+    return pairs
+
+
+def parse_filters(items: Optional[Iterable[str]]) -> Dict[str, str]:
+    """{normalized key: normalized value} from "key:value" strings (query parameters)."""
+    filters = {}
+    for item in items or []:
+        key, sep, value = item.partition(":")
+        if not sep or not key.strip() or not value.strip():
+            raise ValueError(f"attribute filter must look like key:value, got {item!r}")
+        filters[normalize(key)] = normalize(value)
+    return filters
+
+
+def _batches(items: List, size: int = BATCH):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _insert_missing(connection, table, column: str):
+    """INSERT that skips rows whose `column` is already stored, e.g. by a concurrent writer."""
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(table).on_conflict_do_nothing(index_elements=[column])
+    if dialect == "sqlite":
+        return sqlite.insert(table).on_conflict_do_nothing(index_elements=[column])
+    return insert(table)
+
+
+def _intern(connection, table, column: str, labels: Dict[str, str]) -> Dict[str, int]:
+    """{normalized: id} for `labels` ({normalized: label}), inserting the ones not stored yet."""
+    ids: Dict[str, int] = {}
+    col = table.c[column]
+    for batch in _batches(list(labels)):
+        ids.update({norm: i for i, norm in connection.execute(select(table.c.id, col).where(col.in_(batch)))})
+    missing = [norm for norm in labels if norm not in ids]
+    if missing:
+        # another transaction may intern the same string between the select and the insert
+        connection.execute(_insert_missing(connection, table, column), [{column: norm, "label": labels[norm]} for norm in missing])
+        for batch in _batches(missing):
+            ids.update({norm: i for i, norm in connection.execute(select(table.c.id, col).where(col.in_(batch)))})
+    return ids
+
+
+def write_product_attributes(connection, features_by_product: Dict[int, object]) -> int:
+    """Replace the product_attributes rows of the given products. Returns the number of rows written."""
+    rows_table = models.ProductAttribute.__table__
+    product_ids = list(features_by_product)
+    for batch in _batches(product_ids):
+        connection.execute(delete(rows_table).where(rows_table.c.product_id.in_(batch)))
+
+    pairs = {pid: feature_pairs(features) for pid, features in features_by_product.items()}
+    keys = {normalize(k): k for ps in pairs.values() for k, _ in ps}
+    values = {normalize(v): v for ps in pairs.values() for _, v in ps}
+    if not keys:
+        return 0
+    key_ids = _intern(connection, models.AttributeKey.__table__, "name", keys)
+    value_ids = _intern(connection, models.AttributeValue.__table__, "value", values)
+    rows = [
+        {"product_id": pid, "key_id": key_ids[normalize(k)], "value_id": value_ids[normalize(v)]}
+        for pid, ps in pairs.items() for k, v in ps
+    ]
+    for batch in _batches(rows, 5000):
+        connection.execute(insert(rows_table), batch)
+    return len(rows)
+
+
+def rebuild_product_attributes(connection, product_ids: Optional[List[int]] = None) -> int:
+    """Re-derive product_attributes from products.features (all products, or `product_ids`)."""
+    products = models.Product.__table__
+    query = select(products.c.id, products.c.features)
+    if product_ids is None:
+        connection.execute(delete(models.ProductAttribute.__table__))
+        written = 0
+        last_id = 0
+        while True:
+            page = connection.execute(query.where(products.c.id > last_id).order_by(products.c.id).limit(5000)).all()
+            if not page:
+                return written
+            written += write_product_attributes(connection, {pid: features for pid, features in page})
+            last_id = page[-1][0]
+    written = 0
+    for batch in _batches(list(product_ids)):
+        written += write_product_attributes(connection, dict(connection.execute(query.where(products.c.id.in_(batch))).all()))
+    return written
+
+
+@event.listens_for(Session, "before_flush")
+def _detect_feature_writes(session, flush_context, instances):
+    changed = session.info.setdefault("attributes_changed", [])
+    deleted = session.info.setdefault("attributes_deleted", [])
+    for obj in session.new:
+        if isinstance(obj, models.Product):
+            changed.append(obj)
+    for obj in session.dirty:
+        if isinstance(obj, models.Product) and inspect(obj).attrs.features.history.has_changes():
+            changed.append(obj)
+    for obj in session.deleted:
+        if isinstance(obj, models.Product):
+            deleted.append(obj.id)
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_product_attributes(session, flush_context):
+    changed = session.info.pop("attributes_changed", [])
+    deleted = session.info.pop("attributes_deleted", [])
+    if not changed and not deleted:
+        return
+    connection = session.connection()
+    if deleted:
+        table = models.ProductAttribute.__table__
+        for batch in _batches(deleted):
+            connection.execute(delete(table).where(table.c.product_id.in_(batch)))
+    if changed:
+        write_product_attributes(connection, {p.id: p.features for p in changed})
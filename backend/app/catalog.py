@@ -0,0 +1,75 @@
+"""Catalog versioning helpers.
+
+The catalog version is a counter in the single-row `catalog_state` table. A
+flush that inserts, updates or deletes products or chunks bumps it in the same
+transaction, so every ORM write path (scrape, ingest, embedding builds) is
+covered. Raw SQL writers must bump it themselves (see cleanup_db.py).
+
+Inserted and updated products are stamped with the new version
+(`products.catalog_version`). The bump locks the catalog_state row until
+commit, so stamps follow commit order: once version N is visible, every row
+stamped N or lower is too. app.catalog_store relies on this to refresh
+incrementally.
+
+Caches derived from the catalog (HTTP responses, index snapshots,
+precomputed answers) key on it.
+"""
+from sqlalchemy import event, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+
+CATALOG_MODELS = (models.Product, models.ProductChunk)
+
+
+def _version_query():
+    return select(models.CatalogState.version).where(models.CatalogState.id == 1)
+
+
+def get_catalog_version(db) -> str:
+    """Current catalog version, e.g. "v42" ("v0" before the first write)."""
+    return f"v{db.execute(_version_query()).scalar() or 0}"
+
+
+async def get_catalog_version_async(db) -> str:
+    return f"v{(await db.execute(_version_query())).scalar() or 0}"
+
+
+def bump_catalog_version(connection) -> int:
+    """Increment the counter on `connection` (inside the caller's transaction); returns the new value."""
+    state = models.CatalogState.__table__
+    updated = connection.execute(
+        update(state).where(state.c.id == 1).values(version=state.c.version + 1, updated_at=func.now())
+    ).rowcount
+    if not updated:
+        # databases created with create_all have no seeded row
+        connection.execute(insert(state).values(id=1, version=1))
+    return connection.execute(_version_query()).scalar_one()
+
+
+def version_number(version: str) -> int:
+    """42 for "v42"."""
+    return int(version.lstrip("v") or 0)
+
+
+@event.listens_for(Session, "before_flush")
+def _bump_on_catalog_writes(session, flush_context, instances):
+    dirty = [obj for obj in session.dirty if isinstance(obj, CATALOG_MODELS) and session.is_modified(obj)]
+    deleted = [obj for obj in session.deleted if isinstance(obj, CATALOG_MODELS)]
+    new = [obj for obj in session.new if isinstance(obj, CATALOG_MODELS)]
+    if not (new or dirty or deleted):
+        return
+    # bumped before the rows are written, so they can carry the new version
+    version = bump_catalog_version(session.connection())
+    for obj in (*new, *dirty):
+        if isinstance(obj, models.Product):
+            obj.catalog_version = version
+
+
+# bookkeeping columns left out of API responses
+INTERNAL_COLUMNS = frozenset({"catalog_version"})
+
+
+def product_dict(p) -> dict:
+    """JSON-ready dict of a Product row, matching what FastAPI returned for the ORM object."""
+    return {c.key: getattr(p, c.key) for c in models.Product.__mapper__.column_attrs if c.key not in INTERNAL_COLUMNS}
@@ -0,0 +1,174 @@
+"""Read-optimized, columnar in-memory copy of the products table for /api/products.
+
+Instead of ORM objects the store keeps, per product in id order:
+- ids, category codes and prices (app.product_columns), for vectorized
+  category and price range masks and price sorting
+- search: lowercased "title\\x00description" string for substring search
+- fragments: the product's JSON, serialized once, spliced into responses
+
+The store follows the catalog version (app.catalog). When the version
+changes, only rows inserted (id above the loaded maximum) or stamped with a
+catalog version above the loaded one are fetched. Stamps follow commit order,
+so nothing committed before the loaded version can be missed. A count
+mismatch afterwards means rows were deleted, and the store reloads fully.
+"""
+import asyncio
+import logging
+import os
+import sys
+from typing import List, Optional
+
+import numpy as np
+from sqlalchemy import func, or_, select
+
+from . import models
+from .catalog import product_dict, version_number
+from .http_cache import dumps
+from .metrics import record_cache, span
+from .product_columns import ProductColumns
+
+logger = logging.getLogger(__name__)
+
+CATALOG_STORE = os.getenv("CATALOG_STORE", "true").lower() == "true"
+
+
+def _fragment(p) -> bytes:
+    # orjson hands back an over-allocated buffer (KBs per call); keep an exact-size copy
+    return bytes(memoryview(dumps(product_dict(p))))
+
+
+def _search_text(p) -> str:
+    return f"{(p.title or '').lower()}\x00{(p.description or '').lower()}"
+
+
+class _Columns:
+    """One immutable generation of the store; refreshes build a new one and swap it in."""
+
+    __slots__ = ("version", "products", "search", "fragments", "max_id")
+
+    def __init__(self, version, products: ProductColumns, search, fragments):
+        self.version = version
+        self.products = products
+        self.search = search
+        self.fragments = fragments
+        self.max_id = int(products.ids[-1]) if len(products) else 0
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self.products.ids
+
+    def __len__(self):
+        return len(self.products)
+
+
+def _columns(version: str, rows: List[models.Product]) -> _Columns:
+    rows = sorted(rows, key=lambda p: p.id)
+    return _Columns(version, ProductColumns.build(rows), [_search_text(p) for p in rows], [_fragment(p) for p in rows])
+
+
+class CatalogStore:
+    def __init__(self):
+        self.cols: Optional[_Columns] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def ensure(self, db, version: str) -> _Columns:
+        """Store for `version`, loading or incrementally refreshing it on the async session `db`."""
+        cols = self.cols
+        record_cache("catalog_store", cols is not None and cols.version == version)
+        if cols is not None and cols.version == version:
+            return cols
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            cols = self.cols
+            if cols is None or cols.version != version:
+                with span("catalog_store.refresh"):
+                    cols = await self._refresh(db, version, cols)
+                self.cols = cols
+        return cols
+
+    async def _refresh(self, db, version: str, old: Optional[_Columns]) -> _Columns:
+        Product = models.Product
+        if old is None:
+            rows = (await db.execute(select(Product))).scalars().all()
+            logger.info(f"Catalog store loaded {len(rows)} products (catalog {version})")
+            return _columns(version, rows)
+
+        # rows stamped up to old.version were committed before it became visible, so they are loaded
+        touched = Product.catalog_version > version_number(old.version)
+        changed = select(Product).where(or_(Product.id > old.max_id, touched))
+        rows = (await db.execute(changed)).scalars().all()
+        total = (await db.execute(select(func.count(Product.id)))).scalar_one()
+
+        by_id = {int(i): pos for pos, i in enumerate(old.ids)}
+        updated = {p.id: p for p in rows if p.id in by_id}
+        added = [p for p in rows if p.id not in by_id]
+        if len(old) + len(added) != total:
+            # rows were deleted (or written outside the ORM): start over
+            return await self._refresh(db, version, None)
+
+        fragments = list(old.fragments)
+        search = list(old.search)
+        changed = {by_id[pid]: p for pid, p in updated.items()}
+        for pos, p in changed.items():
+            fragments[pos], search[pos] = _fragment(p), _search_text(p)
+        # new ids are all above old.max_id, so appending keeps id order
+        added.sort(key=lambda p: p.id)
+        fragments += [_fragment(p) for p in added]
+        search += [_search_text(p) for p in added]
+
+        logger.info(f"Catalog store: {len(added)} added, {len(updated)} updated (catalog {version})")
+        return _Columns(version, old.products.replace(changed, added), search, fragments)
+
+    @staticmethod
+    def query(
+        cols: _Columns,
+        skip: int,
+        limit: int,
+        search: Optional[str] = None,
+        category: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        sort: str = "id",
+        product_ids=None,
+    ):
+        """(positions of the requested page, total matches), in id order or by price (unknown prices last).
+
+        product_ids, when given, restricts the page to those ids (attribute filters resolved in SQL).
+        """
+        with span("catalog_store.query"):
+            filtered = search or category or min_price is not None or max_price is not None or product_ids is not None
+            if not filtered and sort == "id":
+                total = len(cols)
+                return range(min(skip, total), min(skip + limit, total)), total
+            mask = cols.products.mask(category, min_price, max_price)
+            if product_ids is not None:
+                mask &= np.isin(cols.ids, np.asarray(product_ids, dtype=np.int64))
+            if search:
+                needle = search.lower()
+                mask &= np.fromiter((needle in s for s in cols.search), dtype=bool, count=len(cols))
+            positions = np.flatnonzero(mask)
+            if sort != "id":
+                prices = cols.products.prices[positions]
+                # stable, so equal prices stay in id order; NaN sorts last either way
+                positions = positions[np.argsort(prices if sort == "price_asc" else -prices, kind="stable")]
+            return positions[skip:skip + limit].tolist(), len(positions)
+
+    @staticmethod
+    def nbytes(cols: _Columns) -> int:
+        """Approximate memory held by one generation."""
+        return (
+            cols.products.nbytes
+            + sum(sys.getsizeof(s) for s in cols.search)
+            + sum(sys.getsizeof(f) for f in cols.fragments)
+        )
+
+
+store = CatalogStore()
+
+
+def render_page(cols: _Columns, positions, total: int, skip: int, limit: int) -> bytes:
+    """/api/products body assembled from the precomputed fragments."""
+    products = b",".join(cols.fragments[i] for i in positions)
+    count = len(positions)
+    return b'{"products":[%s],"count":%d,"total":%d,"skip":%d,"limit":%d}' % (products, count, total, skip, limit)
@@ -0,0 +1,346 @@
+"""Optional compression for chunk embedding vectors.
+
+Three codecs are available, selected with EMBEDDING_COMPRESSION:
+- "pca": project onto the top principal components (EMBEDDING_PCA_DIM)
+- "sq8": per-dimension int8 scalar quantization
+- "pq":  product quantization (EMBEDDING_PQ_SUBVECTORS codes of 8 bits each)
+
+Codecs are trained from the existing embeddings and saved next to their codes
+as one .npy file per array, which readers memory-map (so worker processes
+share the pages). They are searched with asymmetric distance: the query stays
+in full precision and is scored directly against the compressed codes.
+"""
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+COMPRESSION = os.getenv("EMBEDDING_COMPRESSION", "none").lower()
+PCA_DIM = int(os.getenv("EMBEDDING_PCA_DIM", "128"))
+PQ_SUBVECTORS = int(os.getenv("EMBEDDING_PQ_SUBVECTORS", "48"))
+RERANK = os.getenv("EMBEDDING_RERANK", "true").lower() == "true"
+RERANK_CANDIDATES = int(os.getenv("EMBEDDING_RERANK_CANDIDATES", "50"))
+
+METHODS = ("pca", "sq8", "pq")
+
+# score in blocks so int8 codes are never upcast to one full float32 copy
+_BLOCK_ROWS = 65536
+
+
+def normalize(x: np.ndarray) -> np.ndarray:
+    """L2-normalize rows (or a single vector) so inner product == cosine."""
+    x = np.asarray(x, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return x / norms
+
+
+def kmeans(x: np.ndarray, k: int, iters: int = 20, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Plain Lloyd's k-means with k-means++ seeding. Returns (centroids, labels)."""
+    x = np.asarray(x, dtype=np.float32)
+    n = x.shape[0]
+    k = max(1, min(k, n))
+    rng = np.random.default_rng(seed)
+
+    centroids = np.empty((k, x.shape[1]), dtype=np.float32)
+    centroids[0] = x[rng.integers(n)]
+    closest = ((x - centroids[0]) ** 2).sum(axis=1)
+    for i in range(1, k):
+        total = closest.sum()
+        if total <= 0:
+            centroids[i:] = x[rng.integers(n, size=k - i)]
+            break
+        centroids[i] = x[rng.choice(n, p=closest / total)]
+        closest = np.minimum(closest, ((x - centroids[i]) ** 2).sum(axis=1))
+
+    labels = np.zeros(n, dtype=np.int64)
+    x_sq = (x ** 2).sum(axis=1, keepdims=True)
+    for it in range(iters):
+        dists = x_sq - 2.0 * (x @ centroids.T) + (centroids ** 2).sum(axis=1)
+        new_labels = dists.argmin(axis=1)
+        if it > 0 and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for j in range(k):
+            members = x[labels == j]
+            if len(members):
+                centroids[j] = members.mean(axis=0)
+    return centroids, labels
+
+
+class PCACodec:
+    method = "pca"
+
+    def __init__(self, dim: int = PCA_DIM):
+        self.dim = dim
+        self.mean = None
+        self.components = None  # (d, dim)
+
+    def fit(self, x: np.ndarray) -> "PCACodec":
+        self.mean = x.mean(axis=0).astype(np.float32)
+        _, _, vt = np.linalg.svd(x - self.mean, full_matrices=False)
+        self.dim = min(self.dim, vt.shape[0])
+        self.components = vt[: self.dim].T.astype(np.float32)
+        return self
+
+    def encode(self, x: np.ndarray) -> np.ndarray:
+        return ((x - self.mean) @ self.components).astype(np.float32)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return codes @ self.components.T + self.mean
+
+    def scores(self, codes: np.ndarray, q: np.ndarray) -> np.ndarray:
+        # x ~= mean + P z  =>  x.q ~= z.(P^T q) + mean.q
+        return codes @ (self.components.T @ q) + float(self.mean @ q)
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {"mean": self.mean, "components": self.components}
+
+    @classmethod
+    def from_arrays(cls, arrays) -> "PCACodec":
+        codec = cls(dim=arrays["components"].shape[1])
+        codec.mean = arrays["mean"]
+        codec.components = arrays["components"]
+        return codec
+
+
+class ScalarQuantizer:
+    method = "sq8"
+
+    def __init__(self):
+        self.vmin = None
+        self.scale = None
+
+    def fit(self, x: np.ndarray) -> "ScalarQuantizer":
+        self.vmin = x.min(axis=0).astype(np.float32)
+        span = x.max(axis=0) - self.vmin
+        span[span == 0] = 1.0
+        self.scale = (span / 255.0).astype(np.float32)
+        return self
+
+    def encode(self, x: np.ndarray) -> np.ndarray:
+        codes = np.rint((x - self.vmin) / self.scale)
+        return np.clip(codes, 0, 255).astype(np.uint8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return codes.astype(np.float32) * self.scale + self.vmin
+
+    def scores(self, codes: np.ndarray, q: np.ndarray) -> np.ndarray:
+        # x ~= vmin + scale * c  =>  x.q ~= c.(scale * q) + vmin.q
+        w = (self.scale * q).astype(np.float32)
+        bias = float(self.vmin @ q)
+        out = np.empty(codes.shape[0], dtype=np.float32)
+        for start in range(0, codes.shape[0], _BLOCK_ROWS):
+            block = codes[start:start + _BLOCK_ROWS]
+            out[start:start + len(block)] = block.astype(np.float32) @ w
+        return out + bias
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {"vmin": self.vmin, "scale": self.scale}
+
+    @classmethod
+    def from_arrays(cls, arrays) -> "ScalarQuantizer":
+        codec = cls()
+        codec.vmin = arrays["vmin"]
+        codec.scale = arrays["scale"]
+        return codec
+
+
+class ProductQuantizer:
+    method = "pq"
+
+    def __init__(self, subvectors: int = PQ_SUBVECTORS, centroids: int = 256):
+        self.subvectors = subvectors
+        self.centroids = centroids
+        self.codebooks = None  # (m, ks, d / m)
+
+    def fit(self, x: np.ndarray) -> "ProductQuantizer":
+        d = x.shape[1]
+        if d % self.subvectors:
+            raise ValueError(f"dimension {d} is not divisible by {self.subvectors} PQ subvectors")
+        sub = d // self.subvectors
+        ks = min(self.centroids, x.shape[0])
+        books = np.zeros((self.subvectors, ks, sub), dtype=np.float32)
+        for j in range(self.subvectors):
+            cents, _ = kmeans(x[:, j * sub:(j + 1) * sub], ks, seed=j)
+            books[j, : len(cents)] = cents
+        self.codebooks = books
+        return self
+
+    def encode(self, x: np.ndarray) -> np.ndarray:
+        m, ks, sub = self.codebooks.shape
+        codes = np.empty((x.shape[0], m), dtype=np.uint8)
+        for j in range(m):
+            part = x[:, j * sub:(j + 1) * sub]
+            book = self.codebooks[j]
+            dists = (part ** 2).sum(axis=1, keepdims=True) - 2.0 * part @ book.T + (book ** 2).sum(axis=1)
+            codes[:, j] = dists.argmin(axis=1)
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        m = self.codebooks.shape[0]
+        return np.concatenate([self.codebooks[j][codes[:, j]] for j in range(m)], axis=1)
+
+    def scores(self, codes: np.ndarray, q: np.ndarray) -> np.ndarray:
+        # asymmetric distance: per-subspace lookup table of centroid.q_j
+        m, ks, sub = self.codebooks.shape
+        table = np.einsum("mkd,md->mk", self.codebooks, q.reshape(m, sub))
+        out = np.zeros(codes.shape[0], dtype=np.float32)
+        for j in range(m):
+            out += table[j][codes[:, j]]
+        return out
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {"codebooks": self.codebooks}
+
+    @classmethod
+    def from_arrays(cls, arrays) -> "ProductQuantizer":
+        books = arrays["codebooks"]
+        codec = cls(subvectors=books.shape[0], centroids=books.shape[1])
+        codec.codebooks = books
+        return codec
+
+
+_CODECS = {"pca": PCACodec, "sq8": ScalarQuantizer, "pq": ProductQuantizer}
+
+
+def make_codec(method: str):
+    if method not in _CODECS:
+        raise ValueError(f"Unknown compression method: {method!r} (expected one of {METHODS})")
+    return _CODECS[method]()
+
+
+class CompressedIndex:
+    """Compressed chunk vectors plus the ids needed to map hits back to rows."""
+
+    def __init__(self, codec, codes: np.ndarray, chunk_ids: np.ndarray, product_ids: np.ndarray):
+        self.codec = codec
+        self.codes = codes
+        self.chunk_ids = chunk_ids
+        self.product_ids = product_ids
+
+    @property
+    def method(self) -> str:
+        return self.codec.method
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.codes.nbytes)
+
+    @classmethod
+    def train(cls, method: str, embeddings: np.ndarray, chunk_ids: Sequence[int], product_ids: Sequence[int]) -> "CompressedIndex":
+        x = normalize(embeddings)
+        codec = make_codec(method).fit(x)
+        return cls(codec, codec.encode(x), np.asarray(chunk_ids, dtype=np.int64), np.asarray(product_ids, dtype=np.int64))
+
+    def search(self, q: np.ndarray, top_k: int, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (row positions, approximate scores) of the best top_k codes."""
+        scores = self.codec.scores(self.codes, normalize(q))
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+        return top_k_indices(scores, top_k)
+
+    def save(self, path: Path) -> None:
+        """Write the index as a directory: codec.json, codes.npy, chunk_ids.npy, product_ids.npy, codec_<name>.npy."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.tmp-{os.getpid()}")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+        arrays = {"codes": self.codes, "chunk_ids": self.chunk_ids, "product_ids": self.product_ids}
+        arrays.update({f"codec_{k}": v for k, v in self.codec.to_arrays().items()})
+        for name, array in arrays.items():
+            np.save(tmp / f"{name}.npy", np.ascontiguousarray(array))
+        with open(tmp / "codec.json", "w") as f:
+            json.dump({"method": self.method, "codec_arrays": sorted(self.codec.to_arrays())}, f)
+        shutil.rmtree(path, ignore_errors=True)
+        os.rename(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path, mmap_mode: Optional[str] = "r") -> "CompressedIndex":
+        """Open a saved index; arrays are memory-mapped read-only by default."""
+        path = Path(path)
+        with open(path / "codec.json") as f:
+            meta = json.load(f)
+
+        def array(name):
+            return np.load(path / f"{name}.npy", mmap_mode=mmap_mode)
+
+        codec = _CODECS[meta["method"]].from_arrays({k: array(f"codec_{k}") for k in meta["codec_arrays"]})
+        return cls(codec, array("codes"), array("chunk_ids"), array("product_ids"))
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Indices of the k largest finite scores, best first (argpartition, then sort)."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    if k < len(scores):
+        idx = np.argpartition(-scores, k - 1)[:k]
+    else:
+        idx = np.arange(len(scores))
+    idx = idx[np.argsort(-scores[idx], kind="stable")]
+    idx = idx[np.isfinite(scores[idx])]
+    return idx, scores[idx]
+
+
+def rerank_exact(candidates: np.ndarray, vectors: np.ndarray, q: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Re-score candidate rows with their full-precision vectors."""
+    exact = normalize(vectors) @ normalize(q)
+    order, scores = top_k_indices(exact, top_k)
+    return candidates[order], scores
+
+
+def recall_report(
+    embeddings: np.ndarray,
+    queries: np.ndarray,
+    ks: Sequence[int] = (1, 5, 10),
+    methods: Sequence[str] = METHODS,
+    rerank_candidates: int = RERANK_CANDIDATES,
+) -> List[Dict]:
+    """Measure recall@k of each codec against exact full-precision search.
+
+    One row per (method, rerank) pair, with bytes per vector so the memory
+    versus quality tradeoff can be read off directly.
+    """
+    x = normalize(embeddings)
+    qs = normalize(queries)
+    ids = np.arange(len(x))
+    max_k = max(ks)
+    truth = [top_k_indices(x @ q, max_k)[0] for q in qs]
+
+    rows = [{
+        "method": "none",
+        "rerank": False,
+        "bytes_per_vector": int(x.shape[1] * x.itemsize),
+        **{f"recall@{k}": 1.0 for k in ks},
+    }]
+    for method in methods:
+        try:
+            index = CompressedIndex.train(method, x, ids, ids)
+        except ValueError as e:
+            rows.append({"method": method, "error": str(e)})
+            continue
+        for rerank in (False, True):
+            hits = {k: 0.0 for k in ks}
+            for q, gt in zip(qs, truth):
+                if rerank:
+                    cand, _ = index.search(q, max(rerank_candidates, max_k))
+                    found, _ = rerank_exact(cand, x[cand], q, max_k)
+                else:
+                    found, _ = index.search(q, max_k)
+                for k in ks:
+                    hits[k] += len(set(found[:k].tolist()) & set(gt[:k].tolist())) / max(1, min(k, len(gt)))
+            rows.append({
+                "method": method,
+                "rerank": rerank,
+                "bytes_per_vector": int(index.nbytes // max(1, len(index))),
+                **{f"recall@{k}": round(hits[k] / max(1, len(qs)), 4) for k in ks},
+            })
+    return rows
@@ -0,0 +1,181 @@
+"""Builds the chat prompt under a token budget.
+
+Each recommended product contributes a short header (title plus the first
+sentences of its description, cached per product). The remaining budget is
+filled with sentences from the retrieved chunks, most relevant chunk first.
+Sentences that repeat the header or an earlier snippet are skipped; chunks
+are title + description + features, so most of them overlap.
+
+Token counts are estimated at ~4 characters per token, which is close enough
+for Gemini's tokenizer on English text and needs no extra dependency.
+"""
+import collections
+import math
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from .metrics import record_cache, timed
+
+# Whole prompt (instructions + query + product context)
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "700"))
+CONTEXT_PRODUCT_TOKENS = int(os.getenv("CONTEXT_PRODUCT_TOKENS", "60"))
+CONTEXT_SNIPPET_TOKENS = int(os.getenv("CONTEXT_SNIPPET_TOKENS", "50"))
+# Word-set Jaccard similarity above which a sentence counts as a repeat
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8"))
+# Shorter lines (category labels, "Products", ...) carry no information for the LLM
+CONTEXT_MIN_SNIPPET_WORDS = int(os.getenv("CONTEXT_MIN_SNIPPET_WORDS", "4"))
+CONTEXT_CACHE_SIZE = int(os.getenv("CONTEXT_CACHE_SIZE", "4096"))
+
+PROMPT_TEMPLATE = """You are a knowledgeable health & wellness product advisor.
+
+The customer asked: "{query}"
+
+Here are the most relevant products from our store:
+{context}
+
+Write a helpful, personalized response that:
+1. Acknowledges what the customer is looking for
+2. Explains specifically WHY each recommended product would help with their concern
+3. Mentions key ingredients or benefits if relevant
+4. Keep it conversational and friendly (3-4 sentences max)
+
+Do NOT use bullet points or markdown. Write in natural paragraphs."""
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+_product_cache: "collections.OrderedDict[tuple, str]" = collections.OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / 4) if text else 0
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_RE.split(text or "") if s.strip()]
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut at a word boundary so the estimate fits max_tokens."""
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars - 1].rsplit(" ", 1)[0]
+    return cut.rstrip(",;: ") + "…"
+
+
+def _words(text: str) -> frozenset:
+    return frozenset(_WORD_RE.findall(text.lower()))
+
+
+def render_product(product_id: int, title: str, description: Optional[str]) -> str:
+    """'- Title: first sentences of the description' within CONTEXT_PRODUCT_TOKENS, cached."""
+    key = (product_id, title, description)
+    with _cache_lock:
+        cached = _product_cache.get(key)
+        if cached is not None:
+            _product_cache.move_to_end(key)
+    record_cache("product_context", cached is not None)
+    if cached is not None:
+        return cached
+
+    line = f"- {title}"
+    sentences = split_sentences(description or "")
+    if sentences:
+        desc = sentences[0]
+        for sentence in sentences[1:]:
+            if estimate_tokens(f"{line}: {desc} {sentence}") > CONTEXT_PRODUCT_TOKENS:
+                break
+            desc = f"{desc} {sentence}"
+        line = trim_to_tokens(f"{line}: {desc}", CONTEXT_PRODUCT_TOKENS)
+
+    with _cache_lock:
+        _product_cache[key] = line
+        if len(_product_cache) > CONTEXT_CACHE_SIZE:
+            _product_cache.popitem(last=False)
+    return line
+
+
+class _Seen:
+    """Sentences already in the prompt, for near-duplicate checks."""
+
+    def __init__(self):
+        self.text = ""
+        self.word_sets: List[frozenset] = []
+
+    def add(self, text: str) -> None:
+        self.text += " " + " ".join(_WORD_RE.findall(text.lower()))
+        self.word_sets.extend(_words(s) for s in split_sentences(text))
+
+    def contains(self, sentence: str) -> bool:
+        normalized = " ".join(_WORD_RE.findall(sentence.lower()))
+        if not normalized or normalized in self.text:
+            return True
+        words = _words(sentence)
+        return any(len(words & seen) / len(words | seen) >= CONTEXT_DEDUP_THRESHOLD for seen in self.word_sets)
+
+
+@timed("chat.build_prompt")
+def build_prompt(
+    query: str,
+    product_ids: List[int],
+    products_by_id: Dict[int, object],
+    results: List[Tuple[int, float, str]],
+    budget: int = PROMPT_TOKEN_BUDGET,
+) -> Tuple[str, dict]:
+    """Prompt for the ranked products plus stats for the response metadata.
+
+    results are search_knn's (product_id, score, chunk_text) tuples; only
+    chunks of products in product_ids are used.
+    """
+    context_budget = budget - estimate_tokens(PROMPT_TEMPLATE.format(query=query, context=""))
+    used = 0
+    headers: Dict[int, str] = {}
+    seen = _Seen()
+    for prod_id in product_ids:
+        prod = products_by_id.get(prod_id)
+        header = render_product(prod_id, prod.title, prod.description) if prod else f"- Product {prod_id}"
+        cost = estimate_tokens(header) + 1
+        if headers and used + cost > context_budget:
+            break
+        headers[prod_id] = header
+        seen.add(header)
+        used += cost
+
+    extras: Dict[int, List[str]] = {prod_id: [] for prod_id in headers}
+    snippets = deduplicated = 0
+    for prod_id, _, chunk in sorted(results, key=lambda r: r[1], reverse=True):
+        if prod_id not in extras:
+            continue
+        for sentence in split_sentences(chunk):
+            if len(sentence.split()) < CONTEXT_MIN_SNIPPET_WORDS:
+                continue
+            if seen.contains(sentence):
+                deduplicated += 1
+                continue
+            piece = trim_to_tokens(sentence, CONTEXT_SNIPPET_TOKENS)
+            cost = estimate_tokens(piece) + 1
+            if used + cost > context_budget:
+                continue
+            extras[prod_id].append(piece)
+            seen.add(sentence)
+            used += cost
+            snippets += 1
+
+    lines = []
+    for prod_id, header in headers.items():
+        lines.append(header)
+        if extras[prod_id]:
+            lines.append("  " + " ".join(extras[prod_id]))
+    prompt = PROMPT_TEMPLATE.format(query=query, context="\n".join(lines))
+    return prompt, {
+        "prompt_tokens": estimate_tokens(prompt),
+        "prompt_token_budget": budget,
+        "context_tokens": used,
+        "products_in_context": len(headers),
+        "snippets": snippets,
+        "deduplicated_sentences": deduplicated,
+    }
@@ -1,11 +1,24 @@
+from typing import Dict, List
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from . import models, schemas
+# catalog / attributes: register the version bump and attribute sync on product writes
+from . import attributes, catalog, models, schemas
+from .metrics import timed
+from .pricing import parse_price
 
 
+@timed("crud.create_product")
 def create_product(db: Session, product_in: schemas.ProductCreate):
+    # scrapers may pass the amount from structured data; otherwise parse the display text
+    raw = product_in.price if product_in.price_amount is None else product_in.price_amount
+    amount, currency = parse_price(raw, product_in.price_currency)
     obj = models.Product(
         title=product_in.title,
         price=product_in.price,
+        price_amount=amount,
+        price_currency=currency,
         description=product_in.description,
         features=product_in.features,
         image_url=product_in.image_url,
@@ -18,9 +31,157 @@ def create_product(db: Session, product_in: schemas.ProductCreate):
     return obj
 
 
+@timed("crud.get_product")
 def get_product(db: Session, product_id: int):
     return db.query(models.Product).filter(models.Product.id == product_id).first()
 
 
+@timed("crud.get_products")
+def get_products(db: Session, product_ids):
+    """Fetch several products in one query, returned as {id: product}."""
+    ids = list(product_ids)
+    if not ids:
+        return {}
+    rows = db.query(models.Product).filter(models.Product.id.in_(ids)).all()
+    return {p.id: p for p in rows}
+
+
+@timed("crud.list_products")
 def list_products(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models.Product).offset(skip).limit(limit).all()
+
+
+# Async variants for read endpoints running on the event loop (see app.async_database)
+
+@timed("crud.get_product_async")
+async def get_product_async(db: AsyncSession, product_id: int):
+    return await db.get(models.Product, product_id)
+
+
+@timed("crud.list_products_async")
+async def list_products_async(db: AsyncSession, skip: int = 0, limit: int = 100):
+    result = await db.execute(select(models.Product).order_by(models.Product.id).offset(skip).limit(limit))
+    return result.scalars().all()
+
+
+# /api/products sort keys; products without a parsed price sort last
+PRODUCT_SORTS = {
+    "id": (models.Product.id,),
+    "price_asc": (models.Product.price_amount.asc().nulls_last(), models.Product.id),
+    "price_desc": (models.Product.price_amount.desc().nulls_last(), models.Product.id),
+}
+
+
+def price_filter(query, min_price=None, max_price=None):
+    """Range filter on the indexed price_amount column."""
+    if min_price is not None:
+        query = query.where(models.Product.price_amount >= min_price)
+    if max_price is not None:
+        query = query.where(models.Product.price_amount <= max_price)
+    return query
+
+
+def attribute_filter(query, attr_filters=None):
+    """Products having, for every {key: value} (normalized, see app.attributes), a value containing it.
+
+    The value is matched as a plain substring, like app.search_filters does, against
+    the interned value dictionary; product rows are then found through the
+    (key_id, value_id) index.
+    """
+    PA, K, V = models.ProductAttribute, models.AttributeKey, models.AttributeValue
+    for key, needle in (attr_filters or {}).items():
+        matching = (
+            select(PA.product_id)
+            .join(K, K.id == PA.key_id)
+            .join(V, V.id == PA.value_id)
+            .where(K.name == key, V.value.contains(needle, autoescape=True))
+        )
+        query = query.where(models.Product.id.in_(matching))
+    return query
+
+
+def product_filters(query, search=None, category=None, min_price=None, max_price=None, attr_filters=None):
+    """Apply the /api/products filters to a select over products."""
+    query = attribute_filter(price_filter(query, min_price, max_price), attr_filters)
+    # plain substring matches (% and _ escaped), like the catalog store's
+    if search:
+        needle = search.lower()
+        query = query.where(or_(
+            func.lower(models.Product.title).contains(needle, autoescape=True),
+            func.lower(models.Product.description).contains(needle, autoescape=True),
+        ))
+    if category:
+        query = query.where(func.lower(models.Product.category).contains(category.lower(), autoescape=True))
+    return query
+
+
+@timed("crud.search_products_async")
+async def search_products_async(db: AsyncSession, skip: int = 0, limit: int = 100, sort: str = "id", **filters):
+    """One page of products matching the filters (see product_filters), and the total number of matches."""
+    query = product_filters(select(models.Product), **filters)
+    total = (await db.execute(select(func.count()).select_from(query.subquery()))).scalar_one()
+    result = await db.execute(query.order_by(*PRODUCT_SORTS[sort]).offset(skip).limit(limit))
+    return result.scalars().all(), total
+
+
+@timed("crud.product_ids_with_attributes_async")
+async def product_ids_with_attributes_async(db: AsyncSession, attr_filters) -> List[int]:
+    result = await db.execute(attribute_filter(select(models.Product.id), attr_filters))
+    return result.scalars().all()
+
+
+@timed("crud.facet_counts_async")
+async def facet_counts_async(db: AsyncSession, keys=None, limit: int = 20, **filters) -> dict:
+    """Product counts per category and per attribute value, among products matching the filters.
+
+    Counted in SQL over product_attributes; no product JSON is loaded.
+    """
+    P, PA, K, V = models.Product, models.ProductAttribute, models.AttributeKey, models.AttributeValue
+    filtered = any(v not in (None, "", {}) for v in filters.values())
+    matching = product_filters(select(P.id), **filters) if filtered else None
+
+    if matching is None:
+        total = (await db.execute(select(func.count(P.id)))).scalar_one()
+    else:
+        total = (await db.execute(select(func.count()).select_from(matching.subquery()))).scalar_one()
+
+    n = func.count(P.id)
+    categories = select(P.category, n).group_by(P.category).order_by(n.desc(), P.category)
+    if matching is not None:
+        categories = categories.where(P.id.in_(matching))
+
+    # (product_id, key_id, value_id) is the primary key, so each product counts once per value
+    n = func.count(PA.product_id)
+    values = (
+        select(K.name, K.label, V.label, n)
+        .select_from(PA)
+        .join(K, K.id == PA.key_id)
+        .join(V, V.id == PA.value_id)
+        .group_by(K.id, V.id)
+        .order_by(K.name, n.desc(), V.label)
+    )
+    if keys:
+        values = values.where(K.name.in_(keys))
+    if matching is not None:
+        values = values.where(PA.product_id.in_(matching))
+
+    facets: Dict[str, dict] = {}
+    for name, key_label, value_label, count in await db.execute(values):
+        facet = facets.setdefault(name, {"key": name, "label": key_label, "values": []})
+        if len(facet["values"]) < limit:
+            facet["values"].append({"value": value_label, "count": count})
+    return {
+        "total": total,
+        "categories": [{"value": c or "", "count": count} for c, count in await db.execute(categories)],
+        "attributes": list(facets.values()),
+    }
+
+
+@timed("crud.count_products_async")
+async def count_products_async(db: AsyncSession) -> int:
+    return (await db.execute(select(func.count(models.Product.id)))).scalar_one()
+
+
+@timed("crud.count_chunks_async")
+async def count_chunks_async(db: AsyncSession) -> int:
+    return (await db.execute(select(func.count(models.ProductChunk.id)))).scalar_one()
@@ -1,6 +1,7 @@
 import os
+from contextlib import contextmanager
 from pathlib import Path
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 # Get the directory where this file is located
@@ -9,20 +10,90 @@ BASE_DIR = Path(__file__).resolve().parent.parent  # backend/
 # Prefer DATABASE_URL (Postgres), otherwise fall back to local SQLite for quick testing.
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# SQLite tuning, applied to every new connection.
+# WAL lets readers run alongside a writer; busy_timeout makes writers wait
+# for the lock instead of failing with "database is locked".
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))  # negative = KiB, so 64 MiB
+
+# Connection pool settings for server databases (Postgres).
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+
+def _sqlite_pragmas() -> list:
+    pragmas = [
+        f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA cache_size={SQLITE_CACHE_SIZE}",
+        f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}",
+    ]
+    if SQLITE_JOURNAL_MODE:
+        pragmas.append(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    if SQLITE_SYNCHRONOUS:
+        pragmas.append(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    return pragmas
+
+
+def apply_sqlite_pragmas(engine):
+    """Run the SQLite tuning pragmas on every new DBAPI connection of `engine`."""
+    pragmas = _sqlite_pragmas()
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def pool_options() -> dict:
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def make_engine(url: str, tuned: bool = True):
+    """Create an engine for `url`.
+
+    With tuned=False this is the plain SQLAlchemy default, which the
+    concurrency benchmark uses as its baseline.
+    """
+    if url.startswith("sqlite"):
+        engine = create_engine(url, connect_args={"check_same_thread": False}, echo=False)
+        if tuned:
+            apply_sqlite_pragmas(engine)
+        return engine
+
+    if not tuned:
+        return create_engine(url, echo=False)
+    return create_engine(url, echo=False, **pool_options())
+
+
 if DATABASE_URL:
-    # Handle SQLite URLs specially (need check_same_thread for SQLite)
-    if DATABASE_URL.startswith("sqlite"):
-        engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False}, echo=False)
-    else:
-        engine = create_engine(DATABASE_URL, echo=False)
+    engine = make_engine(DATABASE_URL)
 else:
     # Use absolute path to dev.db in the backend folder
     db_path = BASE_DIR / "dev.db"
-    sqlite_url = f"sqlite:///{db_path}"
+    DATABASE_URL = f"sqlite:///{db_path}"
     print(f"Using SQLite database at: {db_path}")
-    engine = create_engine(sqlite_url, connect_args={"check_same_thread": False}, echo=False)
+    engine = make_engine(DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Read paths: no autoflush, and objects stay usable after commit/close
+# without a refresh round-trip.
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 Base = declarative_base()
 
 
@@ -32,3 +103,35 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def get_read_db():
+    """Request-scoped session for read-only handlers; pass it down instead of opening new ones."""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def run_migrations(revision: str = "head"):
+    """Upgrade the schema with Alembic (backend/alembic); replaces create_all at startup."""
+    from alembic import command
+    from alembic.config import Config
+
+    cfg = Config(str(BASE_DIR / "alembic.ini"))
+    cfg.set_main_option("script_location", str(BASE_DIR / "alembic"))
+    command.upgrade(cfg, revision)
+
+
+@contextmanager
+def session_scope(read_only: bool = False):
+    """One session for a unit of work outside a request (startup, scripts)."""
+    db = (ReadSessionLocal if read_only else SessionLocal)()
+    try:
+        yield db
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
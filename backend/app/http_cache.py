@@ -0,0 +1,128 @@
+"""HTTP caching for catalog read endpoints.
+
+Responses are keyed on the catalog version (app.catalog) plus path and query
+parameters:
+- a strong ETag and Cache-Control on every response; a matching If-None-Match
+  gets 304 Not Modified without touching the products table
+- an in-process LRU of serialized bodies: orjson when installed, gzip-compressed
+  once and sent as-is to clients accepting gzip
+
+The catalog version only changes on writes, so entries never need explicit
+invalidation; stale ones age out of the LRU.
+"""
+import collections
+import gzip
+import hashlib
+import json
+import os
+import threading
+from typing import Awaitable, Callable, Tuple
+
+from fastapi import Request, Response
+
+from .metrics import record_cache, span
+
+try:
+    import orjson
+
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+except ImportError:  # stdlib fallback
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, default=str, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+CATALOG_CACHE_MAX_AGE = int(os.getenv("CATALOG_CACHE_MAX_AGE", "60"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
+
+
+class ResponseCache:
+    """LRU of (catalog version, request key) -> gzip-compressed JSON body."""
+
+    def __init__(self, size: int = RESPONSE_CACHE_SIZE):
+        self.size = size
+        self._entries: "collections.OrderedDict[Tuple, bytes]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key, body: bytes) -> None:
+        with self._lock:
+            self._entries[key] = body
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+response_cache = ResponseCache()
+
+
+def _request_key(request: Request) -> Tuple:
+    return request.url.path, tuple(sorted(request.query_params.multi_items()))
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    # If-None-Match uses weak comparison
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    """True if Accept-Encoding allows gzip: listed (or via "*") with a non-zero q-value."""
+    qualities = {}
+    for item in accept_encoding.lower().split(","):
+        coding, _, params = item.partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qualities[coding.strip()] = q
+    q = qualities.get("gzip", qualities.get("x-gzip", qualities.get("*", 0.0)))
+    return q > 0
+
+
+async def catalog_response(request: Request, version: str, build: Callable[[], Awaitable[object]]) -> Response:
+    """Cached JSON response for a catalog read; build() produces the payload (or JSON bytes) on a miss."""
+    key = _request_key(request)
+    gzip_ok = _accepts_gzip(request.headers.get("accept-encoding", ""))
+    digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:16]
+    # strong ETags differ per content-coding
+    etag = f'"{version}-{digest}{"-gz" if gzip_ok else ""}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={CATALOG_CACHE_MAX_AGE}",
+        "Vary": "Accept-Encoding",
+    }
+
+    if _etag_matches(request.headers.get("if-none-match", ""), etag):
+        record_cache("http_not_modified", True)
+        return Response(status_code=304, headers=headers)
+    record_cache("http_not_modified", False)
+
+    body = response_cache.get((version, key))
+    record_cache("catalog_response", body is not None)
+    if body is None:
+        payload = await build()
+        with span("http_cache.serialize"):
+            # build() may hand back an already serialized body (see app.catalog_store)
+            raw = payload if isinstance(payload, bytes) else dumps(payload)
+            body = gzip.compress(raw, compresslevel=RESPONSE_GZIP_LEVEL)
+        response_cache.put((version, key), body)
+
+    if gzip_ok:
+        return Response(body, media_type="application/json", headers={**headers, "Content-Encoding": "gzip"})
+    return Response(gzip.decompress(body), media_type="application/json", headers=headers)
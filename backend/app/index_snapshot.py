@@ -0,0 +1,165 @@
+"""Versioned, memory-mapped snapshots of the chunk embedding index.
+
+Layout under INDEX_DIR:
+
+    snapshots/v000001/embeddings.npy   L2-normalized float32 matrix (n, dim)
+    snapshots/v000001/chunk_ids.npy    int64 ProductChunk.id per row
+    snapshots/v000001/product_ids.npy  int64 Product.id per row
+    snapshots/v000001/compressed/      optional codec + codes, one .npy per array (see app.compression)
+    snapshots/v000001/manifest.json    version, catalog_version, shape, compression
+    CURRENT                            name of the active snapshot
+
+Snapshots are written to a temp dir and renamed into place, then CURRENT is
+atomically replaced. Readers open the arrays, compressed ones included, with
+np.load(mmap_mode="r"), so every worker process shares the same pages through
+the OS page cache, and they re-check CURRENT periodically to pick up a new
+snapshot without restart.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from .database import BASE_DIR
+from . import compression
+from .metrics import record_cache, set_index_size
+
+INDEX_DIR = Path(os.getenv("INDEX_DIR", str(BASE_DIR / "index")))
+SNAPSHOT_DIR = INDEX_DIR / "snapshots"
+CURRENT_FILE = INDEX_DIR / "CURRENT"
+KEEP_SNAPSHOTS = int(os.getenv("INDEX_KEEP_SNAPSHOTS", "3"))
+RELOAD_INTERVAL = float(os.getenv("INDEX_RELOAD_INTERVAL", "2.0"))
+
+_lock = threading.Lock()
+_active = None  # type: Optional[Snapshot]
+_last_check = 0.0
+
+
+class Snapshot:
+    """A read-only, memory-mapped index snapshot."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path / "manifest.json") as f:
+            self.manifest = json.load(f)
+        self.embeddings = np.load(self.path / "embeddings.npy", mmap_mode="r")
+        self.chunk_ids = np.load(self.path / "chunk_ids.npy", mmap_mode="r")
+        self.product_ids = np.load(self.path / "product_ids.npy", mmap_mode="r")
+        self.compressed = None
+        if (self.path / "compressed").is_dir():
+            self.compressed = compression.CompressedIndex.load(self.path / "compressed")
+
+    @property
+    def nbytes(self) -> dict:
+        parts = {"embeddings": int(self.embeddings.nbytes), "ids": int(self.chunk_ids.nbytes + self.product_ids.nbytes)}
+        if self.compressed is not None:
+            parts["compressed"] = self.compressed.nbytes
+        return parts
+
+    @property
+    def version(self) -> str:
+        return self.manifest["version"]
+
+    @property
+    def catalog_version(self):
+        return self.manifest.get("catalog_version")
+
+    def __len__(self) -> int:
+        return int(self.manifest["count"])
+
+
+def _next_version() -> str:
+    existing = [p.name for p in SNAPSHOT_DIR.glob("v*") if p.is_dir() and p.name[1:].isdigit()]
+    last = max((int(n[1:]) for n in existing), default=0)
+    return f"v{last + 1:06d}"
+
+
+def write_snapshot(embeddings: np.ndarray, chunk_ids, product_ids, catalog_version=None, compression_method: str = None) -> Snapshot:
+    """Write a new snapshot and make it the active one. Returns the loaded snapshot."""
+    SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+    embs = compression.normalize(embeddings)
+    chunk_ids = np.asarray(chunk_ids, dtype=np.int64)
+    product_ids = np.asarray(product_ids, dtype=np.int64)
+
+    version = _next_version()
+    tmp = SNAPSHOT_DIR / f".{version}.tmp-{os.getpid()}"
+    tmp.mkdir()
+    try:
+        np.save(tmp / "embeddings.npy", embs)
+        np.save(tmp / "chunk_ids.npy", chunk_ids)
+        np.save(tmp / "product_ids.npy", product_ids)
+        if compression_method and compression_method != "none" and len(embs):
+            index = compression.CompressedIndex.train(compression_method, embs, chunk_ids, product_ids)
+            index.save(tmp / "compressed")
+        manifest = {
+            "version": version,
+            "catalog_version": catalog_version,
+            "count": int(embs.shape[0]),
+            "dim": int(embs.shape[1]) if embs.ndim == 2 else 0,
+            "dtype": str(embs.dtype),
+            "normalized": True,
+            "compression": compression_method if compression_method != "none" else None,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+        with open(tmp / "manifest.json", "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.rename(tmp, SNAPSHOT_DIR / version)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    current_tmp = CURRENT_FILE.with_name(f"CURRENT.tmp-{os.getpid()}")
+    current_tmp.write_text(version)
+    os.replace(current_tmp, CURRENT_FILE)
+    _prune()
+    return get_snapshot(force=True)
+
+
+def _prune():
+    """Remove old snapshots, keeping the newest KEEP_SNAPSHOTS.
+
+    Workers that still map an older snapshot keep reading it: on POSIX an
+    unlinked file stays valid until the last mapping is closed.
+    """
+    versions = sorted(p for p in SNAPSHOT_DIR.glob("v*") if p.is_dir() and p.name[1:].isdigit())
+    for old in versions[:-KEEP_SNAPSHOTS] if KEEP_SNAPSHOTS > 0 else []:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def current_version() -> Optional[str]:
+    try:
+        return CURRENT_FILE.read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def get_snapshot(force: bool = False) -> Optional[Snapshot]:
+    """Return the active snapshot, hot-swapping when CURRENT points somewhere new.
+
+    CURRENT is re-read at most every INDEX_RELOAD_INTERVAL seconds.
+    """
+    global _active, _last_check
+    now = time.monotonic()
+    if not force and _last_check and now - _last_check < RELOAD_INTERVAL:
+        record_cache("index_snapshot", _active is not None)
+        return _active
+    with _lock:
+        _last_check = now
+        version = current_version()
+        hit = _active is not None and _active.version == version
+        if version is None:
+            _active = None
+        elif not hit:
+            try:
+                _active = Snapshot(SNAPSHOT_DIR / version)
+                set_index_size(len(_active), _active.nbytes)
+            except FileNotFoundError:
+                pass  # keep serving the previous snapshot
+        record_cache("index_snapshot", hit)
+        return _active
@@ -0,0 +1,44 @@
+"""Database-backed leases, so only one worker process runs a background job at a time.
+
+A lease is a row in `job_leases`. Taking it is a single conditional UPDATE
+(or the INSERT that creates the row), which the database serializes across
+processes. It expires after `seconds`, so a crashed holder blocks the job
+for at most that long.
+"""
+import logging
+import time
+import uuid
+from typing import Optional
+
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+
+from . import models
+from .database import session_scope
+
+logger = logging.getLogger(__name__)
+
+
+def acquire(name: str, seconds: float) -> Optional[str]:
+    """Take the lease `name` for `seconds`; returns a token for release(), or None if it is held."""
+    table = models.JobLease.__table__
+    token = uuid.uuid4().hex
+    now = time.time()
+    with session_scope() as db:
+        taken = db.execute(
+            update(table).where(table.c.name == name, table.c.expires_at < now).values(holder=token, expires_at=now + seconds)
+        ).rowcount
+        if not taken:
+            try:
+                db.execute(insert(table).values(name=name, holder=token, expires_at=now + seconds))
+            except IntegrityError:  # the row exists and has not expired
+                return None
+        db.commit()
+    return token
+
+
+def release(name: str, token: str) -> None:
+    table = models.JobLease.__table__
+    with session_scope() as db:
+        db.execute(update(table).where(table.c.name == name, table.c.holder == token).values(holder=None, expires_at=0.0))
+        db.commit()
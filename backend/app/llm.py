@@ -1,22 +1,35 @@
 """LLM client for Gemini API integration."""
 import os
+import logging
 from dotenv import load_dotenv
 import httpx
 from typing import Optional
+from .metrics import timed
+from .llm_gateway import LLMGateway
+
+logger = logging.getLogger(__name__)
 
 # Load .env file
 load_dotenv()
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+# Point at app.scripts.fake_gemini to exercise the gateway locally
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com").rstrip("/")
+
 
+@timed("llm.generate_with_gemini")
+def generate_with_gemini(prompt: str, max_tokens: int = 1024, temperature: float = 0.7,
+                         timeout: float = 30.0, raise_errors: bool = False) -> Optional[str]:
+    """Call Google Gemini API (v1beta) and return text response.
 
-def generate_with_gemini(prompt: str, max_tokens: int = 1024, temperature: float = 0.7) -> Optional[str]:
-    """Call Google Gemini API (v1beta) and return text response."""
+    Errors are logged and give None, unless raise_errors is set (the gateway
+    needs them to drive its circuit breaker).
+    """
     if not GEMINI_API_KEY:
         return None
     
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}"
+    url = f"{GEMINI_BASE_URL}/v1beta/models/{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}"
     
     payload = {
         "contents": [
@@ -33,7 +46,7 @@ def generate_with_gemini(prompt: str, max_tokens: int = 1024, temperature: float
     }
     
     try:
-        with httpx.Client(timeout=30.0) as client:
+        with httpx.Client(timeout=timeout) as client:
             resp = client.post(url, json=payload)
             resp.raise_for_status()
             data = resp.json()
@@ -45,14 +58,24 @@ def generate_with_gemini(prompt: str, max_tokens: int = 1024, temperature: float
                 if parts:
                     return parts[0].get("text", "")
     except Exception as e:
-        print(f"Gemini API error: {e}")
+        if raise_errors:
+            raise
+        logger.warning(f"Gemini API error: {e}")
     return None
 
 
-def generate_response(prompt: str) -> str:
-    """Generate response using Gemini if configured, else return fallback."""
+# Looks generate_with_gemini up at call time so it can be swapped out (benchmarks stub it)
+gateway = LLMGateway(lambda prompt, timeout: generate_with_gemini(prompt, timeout=timeout, raise_errors=True))
+
+
+def generate_response(prompt: str, budget: Optional[float] = None) -> str:
+    """Generate response using Gemini if configured, else return fallback.
+
+    Goes through the gateway, so this returns within `budget` seconds
+    (LLM_BUDGET_MS by default) even when Gemini is slow or down.
+    """
     if GEMINI_API_KEY:
-        out = generate_with_gemini(prompt)
+        out = gateway.generate(prompt, budget=budget)
         if out:
             return out
 
@@ -0,0 +1,237 @@
+"""Resilience around the Gemini call: coalescing, circuit breaker, adaptive timeouts and hedging.
+
+LLMGateway.generate() never raises and never waits longer than its latency
+budget; it returns None whenever the caller should use the templated answer.
+
+- single-flight: a prompt identical to one already in flight waits for that
+  call instead of sending its own
+- circuit breaker: after LLM_BREAKER_FAILURES consecutive failures, calls fail
+  fast for LLM_BREAKER_RESET seconds; then one probe call is let through
+- adaptive timeout: each attempt gets LLM_TIMEOUT_MULTIPLIER x the recent p99
+  latency, clamped to [LLM_MIN_TIMEOUT, LLM_MAX_TIMEOUT] and to what is left
+  of the budget (LLM_BUDGET_MS)
+- hedging (LLM_HEDGE=true): when the first attempt is still running after the
+  recent p95 latency, an identical second request is sent; the first answer wins
+"""
+import collections
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from typing import Callable, Optional
+
+from .metrics import LLM_CALLS, LLM_CIRCUIT_OPEN, record_cache, span
+
+logger = logging.getLogger(__name__)
+
+LLM_BUDGET = float(os.getenv("LLM_BUDGET_MS", "8000")) / 1000.0
+LLM_MIN_TIMEOUT = float(os.getenv("LLM_MIN_TIMEOUT", "1.0"))
+LLM_MAX_TIMEOUT = float(os.getenv("LLM_MAX_TIMEOUT", "30.0"))
+LLM_TIMEOUT_MULTIPLIER = float(os.getenv("LLM_TIMEOUT_MULTIPLIER", "2.0"))
+LLM_HEDGE = os.getenv("LLM_HEDGE", "false").lower() == "true"
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+# Latency-derived timeouts and hedging only kick in once this many samples exist
+LLM_MIN_SAMPLES = int(os.getenv("LLM_MIN_SAMPLES", "20"))
+LLM_LATENCY_WINDOW = int(os.getenv("LLM_LATENCY_WINDOW", "200"))
+
+
+class LatencyWindow:
+    """Latencies of the most recent successful calls."""
+
+    def __init__(self, size: int = LLM_LATENCY_WINDOW, min_samples: int = LLM_MIN_SAMPLES):
+        self.min_samples = min_samples
+        self._samples = collections.deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._samples)
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """None until min_samples latencies have been seen."""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open probe."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failures: int = LLM_BREAKER_FAILURES, reset_seconds: float = LLM_BREAKER_RESET):
+        self.threshold = failures
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+        LLM_CIRCUIT_OPEN.set(0)
+
+    def failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"LLM circuit open after {self.failures} failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+            is_open = self.state == self.OPEN
+        if is_open:
+            LLM_CIRCUIT_OPEN.set(1)
+
+    def release(self) -> None:
+        """An allowed call was not made; a half-open probe goes back to open, due for another probe."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+
+class LLMGateway:
+    """Wraps call(prompt, timeout=seconds) -> text, which raises on any upstream error."""
+
+    def __init__(self, call: Callable[..., Optional[str]], budget: float = LLM_BUDGET, hedge: bool = LLM_HEDGE,
+                 breaker: Optional[CircuitBreaker] = None, latency: Optional[LatencyWindow] = None):
+        self.call = call
+        self.budget = budget
+        self.hedge = hedge
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = latency or LatencyWindow()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="llm")
+
+    def attempt_timeout(self, remaining: float) -> float:
+        p99 = self.latency.quantile(0.99)
+        if p99 is None:
+            timeout = LLM_MAX_TIMEOUT
+        else:
+            timeout = min(max(p99 * LLM_TIMEOUT_MULTIPLIER, LLM_MIN_TIMEOUT), LLM_MAX_TIMEOUT)
+        return min(timeout, remaining)
+
+    def generate(self, prompt: str, budget: Optional[float] = None) -> Optional[str]:
+        """Answer text, or None on timeout, error or open circuit."""
+        deadline = time.monotonic() + (budget or self.budget)
+        key = hashlib.sha1(prompt.encode("utf-8")).hexdigest()
+        with self._lock:
+            shared = self._inflight.get(key)
+            if shared is None:
+                own = self._inflight[key] = Future()
+        record_cache("llm_singleflight", shared is not None)
+
+        with span("llm.gateway"):
+            if shared is not None:
+                try:
+                    return shared.result(timeout=max(0.0, deadline - time.monotonic()))
+                except FutureTimeout:
+                    LLM_CALLS.labels("coalesced_timeout").inc()
+                    return None
+
+            result = None
+            try:
+                result = self._call_upstream(prompt, deadline)
+            except Exception as e:  # never let the gateway itself break chat
+                logger.warning(f"LLM gateway error: {e}")
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+                own.set_result(result)
+            return result
+
+    def _attempt(self, prompt: str, timeout: float) -> str:
+        start = time.monotonic()
+        text = self.call(prompt, timeout=timeout)
+        if not text:
+            raise ValueError("empty response")
+        # recorded even when the attempt lost a hedge race or outlived its caller
+        self.latency.add(time.monotonic() - start)
+        return text
+
+    def _call_upstream(self, prompt: str, deadline: float) -> Optional[str]:
+        if not self.breaker.allow():
+            LLM_CALLS.labels("short_circuited").inc()
+            return None
+        recorded = False
+        try:
+            text, recorded = self._attempts(prompt, deadline)
+            return text
+        finally:
+            # every allowed call reports back, or a half-open breaker would wait for its probe forever
+            if not recorded:
+                self.breaker.release()
+
+    def _attempts(self, prompt: str, deadline: float):
+        """(text or None, whether the outcome was recorded on the breaker)."""
+        start = time.monotonic()
+        timeout = self.attempt_timeout(deadline - start)
+        if timeout <= 0:
+            LLM_CALLS.labels("timeout").inc()
+            return None, False
+        end = start + timeout
+        pending = {self._executor.submit(self._attempt, prompt, timeout)}
+
+        hedge_after = self.latency.quantile(LLM_HEDGE_QUANTILE) if self.hedge else None
+        if hedge_after is not None and hedge_after < timeout:
+            done, _ = wait(pending, timeout=hedge_after)
+            if not done:
+                LLM_CALLS.labels("hedged").inc()
+                pending.add(self._executor.submit(self._attempt, prompt, timeout - hedge_after))
+
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, end - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    self.breaker.success()
+                    LLM_CALLS.labels("ok").inc()
+                    return future.result(), True
+                error = future.exception()
+
+        self.breaker.failure()
+        if error is not None and not pending:
+            logger.warning(f"Gemini API error: {error}")
+            LLM_CALLS.labels("error").inc()
+        else:
+            logger.warning(f"Gemini call exceeded {timeout:.2f}s")
+            LLM_CALLS.labels("timeout").inc()
+        return None, True
+
+    def stats(self) -> dict:
+        return {
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "in_flight": len(self._inflight),
+            "latency_samples": len(self.latency),
+            "p50": self.latency.quantile(0.5),
+            "p95": self.latency.quantile(0.95),
+            "p99": self.latency.quantile(0.99),
+            "next_timeout": self.attempt_timeout(self.budget),
+            "budget": self.budget,
+            "hedge": self.hedge,
+        }
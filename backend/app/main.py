@@ -1,6 +1,8 @@
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from .api import router as api_router
+from . import metrics, warmup
 
 app = FastAPI(title="Neusearch - Product Discovery Backend")
 
@@ -10,11 +12,45 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "ETag"],
 )
 
+
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    """Attach per-stage timings as a Server-Timing header when requested."""
+    if not metrics.wants_server_timing(request.headers):
+        return await call_next(request)
+    spans, token = metrics.start_request_spans()
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        metrics.end_request_spans(token)
+    response.headers["Server-Timing"] = metrics.format_server_timing(spans, total=time.perf_counter() - start)
+    return response
+
+
 app.include_router(api_router, prefix="/api")
 
 
 @app.get("/health")
 def health():
     return {"status": "ok"}
+
+
+@app.get("/ready")
+def ready(response: Response):
+    """Readiness (vs /health liveness): 503 until STARTUP_MODE=warm preloading is done."""
+    state = warmup.readiness()
+    if not state["ready"]:
+        response.status_code = 503
+    return state
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    body = metrics.render_latest()
+    if body is None:
+        return Response("prometheus_client is not installed\n", status_code=503, media_type="text/plain")
+    return Response(body, media_type=metrics.CONTENT_TYPE_LATEST)
@@ -0,0 +1,248 @@
+"""Hot-path instrumentation: Prometheus metrics, Server-Timing spans and a sampling profiler.
+
+Wrap a stage with `with span("search_knn.score"):` or decorate a function with
+`@timed("crud.get_product")`. Every span is observed in the
+`neusearch_stage_seconds` histogram and, when the current request asked for
+it, reported back in a `Server-Timing` response header.
+
+prometheus_client is optional: without it spans still feed Server-Timing and
+/metrics answers 503.
+"""
+import asyncio
+import collections
+import contextvars
+import functools
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+    PROMETHEUS_AVAILABLE = True
+except ImportError:  # metrics become no-ops
+    PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+# Server-Timing on every response; otherwise only when the request sends X-Server-Timing: 1
+SERVER_TIMING = os.getenv("SERVER_TIMING", "false").lower() == "true"
+SERVER_TIMING_HEADER = "x-server-timing"
+PROFILER_INTERVAL = float(os.getenv("PROFILER_INTERVAL_MS", "10")) / 1000.0
+# A started profile stops itself after this many seconds
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+# Distinct stacks kept; samples of further stacks are counted under OTHER_STACK
+PROFILER_MAX_STACKS = int(os.getenv("PROFILER_MAX_STACKS", "5000"))
+
+_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class _NoopMetric:
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, *args):
+        pass
+
+    def inc(self, *args):
+        pass
+
+    def set(self, *args):
+        pass
+
+
+if PROMETHEUS_AVAILABLE:
+    STAGE_SECONDS = Histogram("neusearch_stage_seconds", "Time spent per hot-path stage", ["stage"], buckets=_BUCKETS)
+    CACHE_REQUESTS = Counter("neusearch_cache_requests_total", "Cache lookups by result", ["cache", "result"])
+    CACHE_HIT_RATIO = Gauge("neusearch_cache_hit_ratio", "Hit ratio since process start", ["cache"])
+    INDEX_VECTORS = Gauge("neusearch_index_vectors", "Vectors in the active index snapshot")
+    INDEX_BYTES = Gauge("neusearch_index_bytes", "Size of the active index snapshot", ["part"])
+    PRODUCTS = Gauge("neusearch_products", "Products in the database at last check")
+    EMBEDDING_MODEL = Gauge("neusearch_embedding_model_info", "Loaded embedding model", ["mode"])
+    LLM_CALLS = Counter("neusearch_llm_calls_total", "LLM gateway calls by outcome", ["outcome"])
+    LLM_CIRCUIT_OPEN = Gauge("neusearch_llm_circuit_open", "1 while the LLM circuit breaker is open")
+else:
+    STAGE_SECONDS = CACHE_REQUESTS = CACHE_HIT_RATIO = _NoopMetric()
+    INDEX_VECTORS = INDEX_BYTES = PRODUCTS = EMBEDDING_MODEL = _NoopMetric()
+    LLM_CALLS = LLM_CIRCUIT_OPEN = _NoopMetric()
+
+_cache_counts: Dict[str, List[int]] = collections.defaultdict(lambda: [0, 0])
+_cache_lock = threading.Lock()
+
+# Spans of the current request, set by the Server-Timing middleware
+_request_spans: contextvars.ContextVar = contextvars.ContextVar("request_spans", default=None)
+
+
+@contextmanager
+def span(stage: str):
+    """Time a block and record it under `stage`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(stage).observe(elapsed)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((stage, elapsed))
+
+
+def timed(stage: str):
+    """Decorator form of span(); works for plain and async functions."""
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+    with _cache_lock:
+        counts = _cache_counts[cache]
+        counts[0 if hit else 1] += 1
+        ratio = counts[0] / (counts[0] + counts[1])
+    CACHE_HIT_RATIO.labels(cache).set(ratio)
+
+
+def set_index_size(vectors: int, parts: Dict[str, int]) -> None:
+    INDEX_VECTORS.set(vectors)
+    for part, nbytes in parts.items():
+        INDEX_BYTES.labels(part).set(nbytes)
+
+
+def start_request_spans() -> Tuple[list, contextvars.Token]:
+    spans = []
+    return spans, _request_spans.set(spans)
+
+
+def end_request_spans(token: contextvars.Token) -> None:
+    _request_spans.reset(token)
+
+
+def wants_server_timing(headers) -> bool:
+    return SERVER_TIMING or headers.get(SERVER_TIMING_HEADER, "").lower() in ("1", "true")
+
+
+def format_server_timing(spans: List[Tuple[str, float]], total: Optional[float] = None) -> str:
+    """Server-Timing header value; repeated stages are summed."""
+    totals: Dict[str, float] = collections.OrderedDict()
+    for stage, elapsed in spans:
+        totals[stage] = totals.get(stage, 0.0) + elapsed
+    parts = [f"{stage.replace('.', '-')};dur={secs * 1000.0:.2f}" for stage, secs in totals.items()]
+    if total is not None:
+        parts.append(f"total;dur={total * 1000.0:.2f}")
+    return ", ".join(parts)
+
+
+def render_latest() -> Optional[bytes]:
+    """Prometheus text exposition, aggregated across workers when PROMETHEUS_MULTIPROC_DIR is set."""
+    if not PROMETHEUS_AVAILABLE:
+        return None
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest()
+
+
+class SamplingProfiler:
+    """Samples every thread's Python stack at a fixed interval, in collapsed-stack form.
+
+    Cheap enough to toggle on a live worker for a few seconds; the output of
+    collapsed() can be fed straight to flamegraph.pl or speedscope. A profile
+    stops itself after `seconds` and keeps at most max_stacks distinct stacks.
+    """
+
+    OTHER_STACK = "(other stacks)"
+
+    def __init__(self, interval: float = PROFILER_INTERVAL, max_stacks: int = PROFILER_MAX_STACKS):
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self.counts: collections.Counter = collections.Counter()
+        self.samples = 0
+        self.started_at = None
+        self.stops_at = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()  # start/stop
+        self._counts_lock = threading.Lock()  # counts/samples, shared with the sampling thread
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval: Optional[float] = None, seconds: float = PROFILER_MAX_SECONDS) -> None:
+        with self._lock:
+            if self.running:
+                return
+            if interval:
+                self.interval = interval
+            with self._counts_lock:
+                self.counts.clear()
+                self.samples = 0
+            self.started_at = time.time()
+            self.stops_at = self.started_at + seconds
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        with self._lock:
+            self._stop.set()
+            if self._thread is not None:
+                self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval) and time.time() < self.stops_at:
+            stacks = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stacks.append(";".join(reversed(stack)))
+            with self._counts_lock:
+                for stack in stacks:
+                    if stack not in self.counts and len(self.counts) >= self.max_stacks:
+                        stack = self.OTHER_STACK
+                    self.counts[stack] += 1
+                self.samples += 1
+
+    def _snapshot(self):
+        with self._counts_lock:
+            return self.counts.most_common(), self.samples
+
+    def collapsed(self) -> str:
+        counts, _ = self._snapshot()
+        return "\n".join(f"{stack} {n}" for stack, n in counts)
+
+    def summary(self, top: int = 20) -> dict:
+        counts, samples = self._snapshot()
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000.0,
+            "samples": samples,
+            "started_at": self.started_at,
+            "stops_at": self.stops_at,
+            "distinct_stacks": len(counts),
+            "top_stacks": [{"stack": s.split(";")[-5:], "count": n} for s, n in counts[:top]],
+        }
+
+
+profiler = SamplingProfiler()
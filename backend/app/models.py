@@ -1,5 +1,5 @@
 import os
-from sqlalchemy import Column, Integer, String, Text, Numeric, ForeignKey, DateTime, JSON
+from sqlalchemy import Column, Integer, String, Text, Numeric, ForeignKey, DateTime, JSON, Index, Float
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from .database import Base
@@ -21,12 +21,17 @@ class Product(Base):
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
     price = Column(String, nullable=True)
+    # parsed from `price` at ingest (see app.pricing); NULL when the text has no amount
+    price_amount = Column(Numeric(12, 2, asdecimal=False), nullable=True, index=True)
+    price_currency = Column(String(3), nullable=True)
     description = Column(Text, nullable=True)
     features = Column(JSON, nullable=True)
     image_url = Column(String, nullable=True)
     category = Column(String, nullable=True)
     source_url = Column(String, nullable=True, unique=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # catalog version of the last ORM insert/update (see app.catalog); lets app.catalog_store refresh incrementally
+    catalog_version = Column(Integer, nullable=True, index=True)
 
     chunks = relationship("ProductChunk", back_populates="product")
 
@@ -43,3 +48,68 @@ class ProductChunk(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     product = relationship("Product", back_populates="chunks")
+
+
+class AttributeKey(Base):
+    """Interned feature key; `name` is the normalized form (see app.attributes), `label` as first scraped."""
+    __tablename__ = "attribute_keys"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False, unique=True)
+    label = Column(String, nullable=False)
+
+
+class AttributeValue(Base):
+    """Interned feature value, shared by every key and product that uses it."""
+    __tablename__ = "attribute_values"
+
+    id = Column(Integer, primary_key=True)
+    value = Column(Text, nullable=False, unique=True)
+    label = Column(Text, nullable=False)
+
+
+class ProductAttribute(Base):
+    """One (key, value) pair of a product's features, kept in sync with Product.features by app.attributes."""
+    __tablename__ = "product_attributes"
+    __table_args__ = (Index("ix_product_attributes_key_value", "key_id", "value_id"),)
+
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    key_id = Column(Integer, ForeignKey("attribute_keys.id"), primary_key=True)
+    value_id = Column(Integer, ForeignKey("attribute_values.id"), primary_key=True)
+
+
+class PrecomputedAnswer(Base):
+    """Chat answer for one cluster of popular queries, built by app.precomputed for one catalog version."""
+    __tablename__ = "precomputed_answers"
+
+    id = Column(Integer, primary_key=True, index=True)
+    catalog_version = Column(String, nullable=False, index=True)
+    # query encoder the centroid was computed with ("model" name or "hashing")
+    encoder = Column(String, nullable=False)
+    cluster = Column(Integer, nullable=False)
+    query = Column(Text, nullable=False)
+    member_queries = Column(JSON, nullable=True)
+    centroid = Column(JSON, nullable=False)
+    top_k = Column(Integer, nullable=False)
+    message = Column(Text, nullable=False)
+    recommendations = Column(JSON, nullable=False)
+    meta = Column(JSON, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class CatalogState(Base):
+    """Single-row catalog version counter, bumped by every write to products or product_chunks (see app.catalog)."""
+    __tablename__ = "catalog_state"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class JobLease(Base):
+    """Cross-process lease on a background job (see app.leases); expires_at is a Unix timestamp."""
+    __tablename__ = "job_leases"
+
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=True)
+    expires_at = Column(Float, nullable=False, default=0.0)
@@ -0,0 +1,380 @@
+"""Precomputed chat answers for popular concerns.
+
+Offline (`python -m app.scripts.precompute_answers`), seeded queries and the
+chat query log are embedded and clustered with k-means. The full chat
+pipeline (retrieval + LLM) runs once for the query closest to each centroid,
+and the result is stored in `precomputed_answers` under the current catalog
+version.
+
+Online, /api/chat embeds the query and serves the stored answer of the
+nearest centroid when the cosine similarity reaches PRECOMPUTED_MIN_SIMILARITY.
+Cluster members that already reached it at build time are stored with their
+similarity and matched without encoding; other members (outliers k-means
+had to put somewhere) are not. Answers are only served for the
+catalog version they were built from. When the catalog version changes, the
+next lookup starts a background rebuild (PRECOMPUTE_AUTO). A lease in
+`job_leases` (app.leases) lets only one worker process run it; the others
+keep serving without precomputed answers until it lands.
+
+Logging chat queries for the clustering job is opt-in (QUERY_LOG). The log
+is rotated to `<path>.1` at QUERY_LOG_MAX_BYTES, so the job reads at most
+two generations.
+
+Queries are embedded with the SentenceTransformer when it is loaded; in
+precomputed-embeddings mode, a hashed bag-of-words vector stands in.
+"""
+import collections
+import json
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from . import compression, leases, models
+from .catalog import get_catalog_version
+from .database import BASE_DIR, session_scope
+from .metrics import record_cache, span, timed
+
+logger = logging.getLogger(__name__)
+
+PRECOMPUTED_ANSWERS = os.getenv("PRECOMPUTED_ANSWERS", "true").lower() == "true"
+PRECOMPUTED_MIN_SIMILARITY = float(os.getenv("PRECOMPUTED_MIN_SIMILARITY", "0.85"))
+# Seconds between catalog version checks on the chat path
+PRECOMPUTED_CHECK_INTERVAL = float(os.getenv("PRECOMPUTED_CHECK_INTERVAL", "30"))
+# Rebuild in the background when the catalog version changes (only once answers have been built)
+PRECOMPUTE_AUTO = os.getenv("PRECOMPUTE_AUTO", "true").lower() == "true"
+PRECOMPUTE_CLUSTERS = int(os.getenv("PRECOMPUTE_CLUSTERS", "16"))
+PRECOMPUTE_MAX_QUERIES = int(os.getenv("PRECOMPUTE_MAX_QUERIES", "2000"))
+PRECOMPUTE_TOP_K = int(os.getenv("PRECOMPUTE_TOP_K", "3"))
+# Seconds a rebuild may hold the job lease before another process can take over
+PRECOMPUTE_LEASE_SECONDS = float(os.getenv("PRECOMPUTE_LEASE_SECONDS", "900"))
+QUERY_LOG = os.getenv("QUERY_LOG", "false").lower() == "true"
+QUERY_LOG_PATH = Path(os.getenv("QUERY_LOG_PATH", str(BASE_DIR / "data" / "chat_queries.jsonl")))
+QUERY_LOG_MAX_BYTES = int(os.getenv("QUERY_LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+
+LEASE_NAME = "precompute_answers"
+
+HASHING_ENCODER = "hashing"
+HASHING_DIM = 512
+
+SEED_QUERIES = [
+    "what helps with hair fall?",
+    "how to stop hair fall",
+    "hair fall treatment",
+    "my hair is thinning",
+    "something for hair growth",
+    "hair regrowth serum",
+    "how to get rid of dandruff",
+    "anti dandruff shampoo",
+    "itchy flaky scalp",
+    "scalp treatment for dandruff",
+    "I can't sleep at night",
+    "something for better sleep",
+    "natural sleep aid",
+    "help with stress and anxiety",
+    "something to calm my mind",
+    "stress relief supplement",
+    "improve my digestion",
+    "remedy for gas and bloating",
+    "help with constipation",
+    "gut health supplement",
+    "acidity relief",
+    "lower my cholesterol naturally",
+    "metabolism booster",
+    "weight management supplement",
+    "low energy and fatigue",
+    "vitamins for hair and skin",
+    "skin care for acne",
+    "glowing skin",
+    "hair oil for stronger hair",
+    "minoxidil for hair loss",
+]
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are can do for get help helps how i is it me my of on or something the to what with".split()
+)
+
+
+def normalize_query(text: str) -> str:
+    return " ".join(_TOKEN.findall(text.lower()))
+
+
+def _hash_vector(text: str) -> np.ndarray:
+    tokens = [t for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS]
+    v = np.zeros(HASHING_DIM, dtype=np.float32)
+    for tok in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+        h = zlib.crc32(tok.encode())
+        v[h % HASHING_DIM] += 1.0 if (h >> 16) & 1 else -1.0
+    return v
+
+
+def _embed(texts: List[str]) -> Tuple[str, np.ndarray]:
+    """(encoder name, raw query vectors), as search_knn would encode them."""
+    from .retrieval import get_embedding_model
+
+    model = get_embedding_model()
+    if model == "precomputed":
+        return HASHING_ENCODER, np.vstack([_hash_vector(t) for t in texts])
+    return "sentence-transformer", np.asarray(model.encode(texts, convert_to_numpy=True, show_progress_bar=False), dtype=np.float32)
+
+
+def encode_queries(texts: List[str]) -> Tuple[str, np.ndarray]:
+    """(encoder name, unit-norm query vectors)."""
+    encoder, vecs = _embed(texts)
+    return encoder, compression.normalize(vecs)
+
+
+def _log_paths() -> List[Path]:
+    """Query log generations, oldest first."""
+    return [QUERY_LOG_PATH.with_name(QUERY_LOG_PATH.name + ".1"), QUERY_LOG_PATH]
+
+
+def log_query(text: str) -> None:
+    """Append a chat query to the query log that the clustering job reads."""
+    if not QUERY_LOG:
+        return
+    try:
+        QUERY_LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(QUERY_LOG_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"ts": time.time(), "query": text}) + "\n")
+            size = f.tell()
+        if size >= QUERY_LOG_MAX_BYTES:
+            os.replace(QUERY_LOG_PATH, _log_paths()[0])
+    except OSError as e:
+        logger.warning(f"Could not write query log: {e}")
+
+
+def collect_queries(max_queries: int = PRECOMPUTE_MAX_QUERIES) -> List[Tuple[str, int]]:
+    """(query, count) for seeded and logged queries, most frequent first, one per normalized form."""
+    counts: Dict[str, int] = collections.Counter()
+    originals: Dict[str, str] = {}
+    texts = list(SEED_QUERIES)
+    for path in _log_paths():
+        if not path.exists():
+            continue
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    texts.append(json.loads(line)["query"])
+                except (ValueError, KeyError):
+                    continue
+    for text in texts:
+        key = normalize_query(text)
+        if key:
+            counts[key] += 1
+            originals.setdefault(key, text.strip())
+    return [(originals[key], n) for key, n in counts.most_common(max_queries)]
+
+
+def cluster_queries(queries: List[Tuple[str, int]], k: int = PRECOMPUTE_CLUSTERS):
+    """(encoder name, [(cluster, representative query, [(member query, similarity)], unit centroid)]).
+
+    Members are ordered most typical first; similarity is cosine to the centroid.
+    """
+    texts = [q for q, _ in queries]
+    encoder, vecs = encode_queries(texts)
+    counts = np.array([n for _, n in queries], dtype=np.float32)
+    # weight frequent queries by repeating them in the k-means input (capped, so one query cannot dominate)
+    repeats = np.minimum(counts, 10).astype(np.int64)
+    centroids, _ = compression.kmeans(np.repeat(vecs, repeats, axis=0), k, iters=30, seed=0)
+    centroids = compression.normalize(centroids)
+    labels = (vecs @ centroids.T).argmax(axis=1)
+
+    clusters = []
+    for j in range(len(centroids)):
+        members = np.flatnonzero(labels == j)
+        if not len(members):
+            continue
+        sims = vecs[members] @ centroids[j]
+        order = members[np.argsort(-(sims + 0.01 * np.log1p(counts[members])))]
+        member_sims = vecs[order] @ centroids[j]
+        clusters.append((j, texts[order[0]], [(texts[i], float(s)) for i, s in zip(order, member_sims)], centroids[j]))
+    return encoder, clusters
+
+
+@timed("precomputed.build")
+def build_answers(
+    answer_fn=None, k: int = PRECOMPUTE_CLUSTERS, top_k: int = PRECOMPUTE_TOP_K, if_stale: bool = False
+) -> int:
+    """Cluster queries, answer each cluster and replace the stored answers. Returns the number stored.
+
+    answer_fn(query, top_k, db) -> ChatResponse defaults to the /api/chat pipeline.
+    Runs under the job lease; returns 0 when another process holds it, or with
+    `if_stale` when answers for the current catalog version already exist.
+    """
+    token = leases.acquire(LEASE_NAME, PRECOMPUTE_LEASE_SECONDS)
+    if token is None:
+        logger.info("Precomputed answers are being rebuilt by another process")
+        return 0
+    try:
+        return _build_answers(answer_fn, k, top_k, if_stale)
+    finally:
+        leases.release(LEASE_NAME, token)
+
+
+def _build_answers(answer_fn, k: int, top_k: int, if_stale: bool) -> int:
+    if answer_fn is None:
+        from .api import answer_query as answer_fn
+
+    if if_stale:
+        with session_scope(read_only=True) as db:
+            version = get_catalog_version(db)
+            if db.query(models.PrecomputedAnswer.id).filter(models.PrecomputedAnswer.catalog_version == version).first():
+                return 0
+
+    queries = collect_queries()
+    if not queries:
+        return 0
+    encoder, clusters = cluster_queries(queries, k)
+
+    with session_scope() as db:
+        version = get_catalog_version(db)
+        rows = []
+        for j, rep, members, centroid in clusters:
+            resp = answer_fn(rep, top_k, db)
+            if not resp.recommendations:
+                continue
+            rows.append(models.PrecomputedAnswer(
+                catalog_version=version,
+                encoder=encoder,
+                cluster=j,
+                query=rep,
+                # only confident members are matched verbatim online (see _refresh)
+                member_queries=[
+                    {"query": q, "similarity": round(sim, 4)} for q, sim in members if sim >= PRECOMPUTED_MIN_SIMILARITY
+                ],
+                centroid=centroid.tolist(),
+                top_k=top_k,
+                message=resp.message,
+                recommendations=[r if isinstance(r, dict) else r.dict() for r in resp.recommendations],
+                meta=resp.metadata,
+            ))
+        db.query(models.PrecomputedAnswer).delete()
+        db.add_all(rows)
+        db.commit()
+    logger.info(f"Stored {len(rows)} precomputed answers for catalog {version}")
+    invalidate()
+    return len(rows)
+
+
+class _AnswerCache:
+    """Answers of the current catalog version, refreshed at most every PRECOMPUTED_CHECK_INTERVAL."""
+
+    def __init__(self):
+        self.version = None
+        self.checked_at = 0.0
+        self.rows: List[dict] = []
+        self.encoder = None
+        self.centroids = np.empty((0, 0), dtype=np.float32)
+        # normalized member query -> (row index, similarity to the centroid at build time)
+        self.by_query: Dict[str, Tuple[int, float]] = {}
+        self.lock = threading.Lock()
+        self.rebuilding = False  # this process; other processes are kept out by the job lease
+
+
+_cache = _AnswerCache()
+
+
+def invalidate() -> None:
+    _cache.checked_at = 0.0
+
+
+def _rebuild_in_background(version: str) -> None:
+    if _cache.rebuilding:
+        return
+    _cache.rebuilding = True
+
+    def run():
+        try:
+            logger.info(f"Catalog changed to {version}; rebuilding precomputed answers")
+            build_answers(if_stale=True)
+        except Exception as e:
+            logger.warning(f"Precomputed answer rebuild failed: {e}")
+        finally:
+            _cache.rebuilding = False
+
+    threading.Thread(target=run, name="precompute-answers", daemon=True).start()
+
+
+def _refresh(db) -> None:
+    now = time.monotonic()
+    if now - _cache.checked_at < PRECOMPUTED_CHECK_INTERVAL:
+        return
+    with _cache.lock:
+        if now - _cache.checked_at < PRECOMPUTED_CHECK_INTERVAL:
+            return
+        version = get_catalog_version(db)
+        rows = db.query(models.PrecomputedAnswer).filter(models.PrecomputedAnswer.catalog_version == version).all()
+        if not rows and PRECOMPUTE_AUTO and db.query(models.PrecomputedAnswer.id).first() is not None:
+            # answers exist, but for an older catalog
+            _rebuild_in_background(version)
+        _cache.version = version
+        _cache.rows = [
+            {c: getattr(r, c) for c in ("cluster", "query", "top_k", "message", "recommendations", "meta", "catalog_version")}
+            for r in rows
+        ]
+        _cache.encoder = rows[0].encoder if rows else None
+        _cache.centroids = np.array([r.centroid for r in rows], dtype=np.float32) if rows else np.empty((0, 0), np.float32)
+        _cache.by_query = {
+            normalize_query(m["query"]): (i, float(m["similarity"]))
+            for i, r in enumerate(rows)
+            for m in (r.member_queries or [])
+            if m["similarity"] >= PRECOMPUTED_MIN_SIMILARITY
+        }
+        _cache.checked_at = now
+
+
+def lookup(query: str, top_k: int, db) -> Tuple[Optional[dict], Optional[np.ndarray]]:
+    """(ChatResponse fields of a matching precomputed answer or None, query embedding or None).
+
+    On a miss, the embedding computed for the match is returned so that
+    search_knn(query_embedding=...) does not encode the query again. It is
+    None when no model embedding was computed.
+    """
+    if not PRECOMPUTED_ANSWERS:
+        return None, None
+    with span("precomputed.lookup"):
+        try:
+            _refresh(db)
+        except Exception as e:  # e.g. table not migrated yet
+            logger.warning(f"Precomputed answers unavailable: {e}")
+            _cache.checked_at = time.monotonic()
+            return None, None
+        if not _cache.rows:
+            return None, None
+
+        embedding = None
+        idx, similarity = _cache.by_query.get(normalize_query(query), (None, 0.0))
+        if idx is None:
+            encoder, raw = _embed([query])
+            if encoder != HASHING_ENCODER:
+                embedding = raw[0]
+            if encoder != _cache.encoder:
+                return None, embedding
+            sims = _cache.centroids @ compression.normalize(raw)[0]
+            idx = int(sims.argmax())
+            similarity = float(sims[idx])
+        row = _cache.rows[idx]
+        hit = similarity >= PRECOMPUTED_MIN_SIMILARITY and row["top_k"] == top_k
+    record_cache("precomputed_answers", hit)
+    if not hit:
+        return None, embedding
+    return {
+        "message": row["message"],
+        "recommendations": row["recommendations"],
+        "metadata": {
+            **(row["meta"] or {}),
+            "precomputed": True,
+            "cluster": row["cluster"],
+            "matched_query": row["query"],
+            "similarity": round(similarity, 4),
+            "catalog_version": row["catalog_version"],
+        },
+    }, None
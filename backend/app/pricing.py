@@ -0,0 +1,48 @@
+"""Normalized product prices.
+
+`Product.price` keeps the text shown on the page (e.g. "MRP:Regular price₹ 1,058₹1249Regular
+price₹ 1,058Sale price..."). parse_price() turns it into (amount, ISO currency), stored in
+`Product.price_amount` / `Product.price_currency` for range filters and sorting.
+
+The first amount wins: Shopify themes render the current price before the
+compare-at (MRP) price.
+"""
+import os
+import re
+from typing import Optional, Tuple
+
+DEFAULT_CURRENCY = os.getenv("DEFAULT_CURRENCY", "INR")
+
+CURRENCY_SYMBOLS = {
+    "₹": "INR", "rs": "INR", "rs.": "INR", "inr": "INR",
+    "$": "USD", "usd": "USD",
+    "€": "EUR", "eur": "EUR",
+    "£": "GBP", "gbp": "GBP",
+}
+
+_AMOUNT = r"(\d{1,3}(?:,\d{2,3})+(?:\.\d+)?|\d+(?:\.\d+)?)"
+_WITH_CURRENCY = re.compile(r"(₹|\$|€|£|\brs\.?|\binr\b|\busd\b|\beur\b|\bgbp\b)\s*" + _AMOUNT, re.IGNORECASE)
+# a bare number followed by "%" is a discount ("20% off"), not a price
+_BARE = re.compile(r"(?<![\w.])" + _AMOUNT + r"(?![\w.%]|\s*%)")
+
+
+def parse_price(text, currency: Optional[str] = None) -> Tuple[Optional[float], Optional[str]]:
+    """(amount, currency) from scraped price text, or (None, None) if it has no amount.
+
+    `currency` (e.g. from a product:price:currency meta tag) overrides the
+    detected symbol; bare numbers default to DEFAULT_CURRENCY.
+    """
+    if text is None:
+        return None, None
+    if isinstance(text, (int, float)):
+        return float(text), (currency or DEFAULT_CURRENCY).upper()
+    match = _WITH_CURRENCY.search(text)
+    if match:
+        symbol, amount = match.group(1).lower(), match.group(2)
+        detected = CURRENCY_SYMBOLS.get(symbol, DEFAULT_CURRENCY)
+    else:
+        match = _BARE.search(text)
+        if not match:
+            return None, None
+        amount, detected = match.group(1), DEFAULT_CURRENCY
+    return float(amount.replace(",", "")), (currency or detected).upper()
@@ -0,0 +1,82 @@
+"""Category and price columns of the products table, shared by the in-memory stores.
+
+app.catalog_store (/api/products) and app.search_filters (vector search
+pre-filter) both keep, per product in id order:
+- ids: int64 array
+- category codes: int32 array into a small dictionary of distinct categories,
+  so a category filter is matched against the dictionary once and then
+  becomes a vectorized mask
+- prices: float64 array of price_amount (NaN when unknown) for range masks
+  and price sorting
+"""
+import sys
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+def _price(p) -> float:
+    return np.nan if p.price_amount is None else float(p.price_amount)
+
+
+class ProductColumns:
+    """Immutable; replace() builds a new instance."""
+
+    __slots__ = ("ids", "category_codes", "categories", "prices")
+
+    def __init__(self, ids: np.ndarray, category_codes: np.ndarray, categories: List[str], prices: np.ndarray):
+        self.ids = ids
+        self.category_codes = category_codes
+        self.categories = categories
+        self.prices = prices
+
+    @classmethod
+    def build(cls, rows) -> "ProductColumns":
+        """Columns of `rows` (objects with id, category and price_amount), in id order."""
+        return cls(
+            np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32), [], np.empty(0, dtype=np.float64)
+        ).replace({}, sorted(rows, key=lambda p: p.id))
+
+    def replace(self, changed: Dict[int, object], added: List) -> "ProductColumns":
+        """Copy with the rows at the positions in `changed` replaced and `added` appended.
+
+        `added` must be in id order, with ids above the current ones.
+        """
+        codes = {c: i for i, c in enumerate(self.categories)}
+        category_codes = self.category_codes.tolist()
+        prices = self.prices.tolist()
+        for pos, p in changed.items():
+            category_codes[pos] = codes.setdefault(p.category or "", len(codes))
+            prices[pos] = _price(p)
+        for p in added:
+            category_codes.append(codes.setdefault(p.category or "", len(codes)))
+            prices.append(_price(p))
+        return ProductColumns(
+            np.concatenate([self.ids, np.fromiter((p.id for p in added), dtype=np.int64, count=len(added))]),
+            np.array(category_codes, dtype=np.int32),
+            sorted(codes, key=codes.get),
+            np.array(prices, dtype=np.float64),
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def mask(
+        self, category: Optional[str] = None, min_price: Optional[float] = None, max_price: Optional[float] = None
+    ) -> np.ndarray:
+        """Boolean mask of the products whose category contains `category` (case-insensitive) and whose price is in range."""
+        mask = np.ones(len(self), dtype=bool)
+        if category:
+            needle = category.lower()
+            matching = [i for i, c in enumerate(self.categories) if needle in c.lower()]
+            mask &= np.isin(self.category_codes, matching)
+        # NaN compares False, so unknown prices drop out of range filters
+        if min_price is not None:
+            mask &= self.prices >= min_price
+        if max_price is not None:
+            mask &= self.prices <= max_price
+        return mask
+
+    @property
+    def nbytes(self) -> int:
+        return self.ids.nbytes + self.category_codes.nbytes + self.prices.nbytes + sum(sys.getsizeof(c) for c in self.categories)
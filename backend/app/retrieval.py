@@ -1,29 +1,49 @@
-from typing import List, Dict, Any, Tuple
+from typing import List, Optional, Tuple
+import logging
 import numpy as np
 import os
-from .database import SessionLocal
-from . import models
+import threading
+import time
+from .database import SessionLocal, session_scope
+from . import models, compression, index_snapshot, leases
+from .catalog import get_catalog_version
+from .metrics import span, timed, record_cache, EMBEDDING_MODEL
+from .search_filters import SearchFilters, get_attribute_table
+
+logger = logging.getLogger(__name__)
 
 _EMBED_MODEL = None
 _USE_PRECOMPUTED = os.getenv("USE_PRECOMPUTED_EMBEDDINGS", "false").lower() == "true"
+# Rebuild the index snapshot in the background when it lags the catalog version
+INDEX_AUTO_REBUILD = os.getenv("INDEX_AUTO_REBUILD", "true").lower() == "true"
+INDEX_REBUILD_LEASE_SECONDS = float(os.getenv("INDEX_REBUILD_LEASE_SECONDS", "600"))
+# Seconds before this process retries a rebuild for the same catalog version (e.g. another one held the lease)
+INDEX_REBUILD_RETRY = float(os.getenv("INDEX_REBUILD_RETRY", "60"))
+INDEX_LEASE = "index_snapshot"
+
+_rebuild_lock = threading.Lock()
+_rebuild_requested = (None, 0.0)  # (catalog version, monotonic time) of the last rebuild started here
 
 
 def get_embedding_model(name: str = "all-MiniLM-L6-v2"):
     """Load embedding model - with fallback for pre-computed mode"""
     global _EMBED_MODEL
+    record_cache("embedding_model", _EMBED_MODEL is not None)
     if _EMBED_MODEL is None:
         if _USE_PRECOMPUTED:
             # In precomputed mode, we use TF-IDF style matching for queries
             _EMBED_MODEL = "precomputed"
-            print("Using pre-computed embeddings mode (lightweight)")
+            logger.info("Using pre-computed embeddings mode (lightweight)")
         else:
             try:
                 from sentence_transformers import SentenceTransformer
-                _EMBED_MODEL = SentenceTransformer(name)
-                print("Loaded SentenceTransformer model")
+                with span("embedding_model.load"):
+                    _EMBED_MODEL = SentenceTransformer(name)
+                logger.info("Loaded SentenceTransformer model %s", name)
             except Exception as e:
-                print(f"Failed to load SentenceTransformer: {e}, using precomputed mode")
+                logger.warning(f"Failed to load SentenceTransformer: {e}, using precomputed mode")
                 _EMBED_MODEL = "precomputed"
+        EMBEDDING_MODEL.labels("precomputed" if _EMBED_MODEL == "precomputed" else name).set(1)
     return _EMBED_MODEL
 
 
@@ -61,6 +81,7 @@ def enhanced_text_similarity(query: str, text: str) -> float:
     return score / max_possible
 
 
+@timed("embed_texts")
 def embed_texts(texts: List[str]) -> List[List[float]]:
     model = get_embedding_model()
     if model == "precomputed":
@@ -82,11 +103,11 @@ def chunk_text(text: str, max_chars: int = 500) -> List[str]:
     return chunks
 
 
-def build_embeddings_for_products(limit: int = 1000):
-    db = SessionLocal()
+def build_embeddings_for_products(limit: int = 1000, db=None):
+    own_session = db is None
+    db = db or SessionLocal()
     try:
         products = db.query(models.Product).limit(limit).all()
-        to_insert = []
         texts = []
         meta = []
         for p in products:
@@ -105,29 +126,186 @@ def build_embeddings_for_products(limit: int = 1000):
             obj = models.ProductChunk(product_id=m["product_id"], chunk_text=txt, embedding=emb, meta=m)
             db.add(obj)
         db.commit()
+
+        if get_embedding_model() != "precomputed":
+            build_index_snapshot(db)
         return len(embeddings)
     finally:
-        db.close()
+        if own_session:
+            db.close()
 
 
-def search_knn(query: str, top_k: int = 5) -> List[Tuple[int, float, str]]:
-    """Return list of tuples (product_id, score, chunk_text) ordered by descending score"""
-    db = SessionLocal()
+def load_chunk_embeddings(db) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return (embeddings, chunk_ids, product_ids) for every chunk that has a vector."""
+    rows = db.query(models.ProductChunk.id, models.ProductChunk.product_id, models.ProductChunk.embedding).all()
+    rows = [r for r in rows if r.embedding]
+    if not rows:
+        return np.empty((0, 0), dtype=np.float32), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    embs = np.array([r.embedding for r in rows], dtype=np.float32)
+    chunk_ids = np.array([r.id for r in rows], dtype=np.int64)
+    prod_ids = np.array([r.product_id for r in rows], dtype=np.int64)
+    return embs, chunk_ids, prod_ids
+
+
+def build_index_snapshot(db=None):
+    """Write a memory-mapped index snapshot of the stored chunk vectors (see app.index_snapshot)."""
+    own_session = db is None
+    db = db or SessionLocal()
     try:
-        model = get_embedding_model()
-        
+        embs, chunk_ids, prod_ids = load_chunk_embeddings(db)
+        if not len(embs):
+            return None
+        return index_snapshot.write_snapshot(
+            embs, chunk_ids, prod_ids,
+            catalog_version=get_catalog_version(db),
+            compression_method=compression.COMPRESSION,
+        )
+    finally:
+        if own_session:
+            db.close()
+
+
+def _rebuild_snapshot_in_background(catalog_version: str) -> None:
+    """Write a fresh snapshot for a catalog that moved past the active one; one process at a time (job lease)."""
+    global _rebuild_requested
+    if not INDEX_AUTO_REBUILD:
+        return
+    with _rebuild_lock:
+        version, started = _rebuild_requested
+        if version == catalog_version and time.monotonic() - started < INDEX_REBUILD_RETRY:
+            return
+        _rebuild_requested = (catalog_version, time.monotonic())
+
+    def run():
+        try:
+            token = leases.acquire(INDEX_LEASE, INDEX_REBUILD_LEASE_SECONDS)
+            if token is None:
+                return  # another process is rebuilding; its snapshot is picked up through CURRENT
+            try:
+                logger.info(f"Index snapshot is behind catalog {catalog_version}; rebuilding")
+                build_index_snapshot()
+            finally:
+                leases.release(INDEX_LEASE, token)
+        except Exception as e:
+            logger.warning(f"Index snapshot rebuild failed: {e}")
+
+    threading.Thread(target=run, name="index-snapshot-rebuild", daemon=True).start()
+
+
+@timed("search_knn.hydrate")
+def _hydrate(db, chunk_ids: np.ndarray, scores: np.ndarray) -> List[Tuple[int, float, str]]:
+    """Fetch chunk rows for ranked snapshot hits, skipping rows deleted since the snapshot."""
+    ids = chunk_ids.tolist()
+    rows = db.query(models.ProductChunk.id, models.ProductChunk.product_id, models.ProductChunk.chunk_text).filter(
+        models.ProductChunk.id.in_(ids)
+    ).all()
+    by_id = {r.id: r for r in rows}
+    results = []
+    for cid, score in zip(ids, scores.tolist()):
+        r = by_id.get(cid)
+        if r is not None:
+            results.append((r.product_id, float(score), r.chunk_text))
+    return results
+
+
+def _rank_snapshot(snap, q_emb: np.ndarray, n: int, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """(row positions, scores) of the best n snapshot rows: compressed codes when present, else the exact matrix."""
+    index = snap.compressed
+    with span("search_knn.score"):
+        if index is not None and index.method == compression.COMPRESSION:
+            n_candidates = max(n, compression.RERANK_CANDIDATES) if compression.RERANK else n
+            cand, scores = index.search(q_emb, n_candidates, mask=mask)
+            if compression.RERANK and len(cand):
+                # only the candidate rows of the mmap'd matrix are paged in
+                cand, scores = compression.rerank_exact(cand, snap.embeddings[cand], q_emb, n)
+            return cand, scores
+        sims = snap.embeddings @ compression.normalize(q_emb)
+        if mask is not None:
+            sims = np.where(mask, sims, -np.inf)
+        return compression.top_k_indices(sims, n)
+
+
+def _search_snapshot(db, snap, q_emb: np.ndarray, top_k: int, mask: Optional[np.ndarray] = None) -> List[Tuple[int, float, str]]:
+    """Score the query against a snapshot and hydrate the top_k rows that still exist.
+
+    `mask` (one bool per snapshot row) excludes rows before top-k selection.
+    Candidates are over-fetched, and fetched again with room for the misses
+    when chunks deleted since the snapshot leave fewer than top_k.
+    """
+    n = top_k * 2
+    while True:
+        cand, scores = _rank_snapshot(snap, q_emb, n, mask)
+        results = _hydrate(db, np.asarray(snap.chunk_ids)[cand], scores)
+        if len(results) >= top_k or len(cand) < n:
+            return results[:top_k]
+        n = top_k * 2 + len(cand) - len(results)
+
+
+@timed("search_knn")
+def search_knn(
+    query: str,
+    top_k: int = 5,
+    db=None,
+    filters: Optional[SearchFilters] = None,
+    query_embedding: Optional[np.ndarray] = None,
+) -> List[Tuple[int, float, str]]:
+    """Return list of tuples (product_id, score, chunk_text) ordered by descending score.
+
+    `filters` (see app.search_filters) restrict the search to matching products;
+    they are applied as a chunk mask before top-k selection, not to the results.
+    `query_embedding` is the query already encoded by the model (e.g. by
+    precomputed.lookup); it is encoded here otherwise.
+    Pass the request's session as `db`; one is opened only when called standalone.
+
+    The index snapshot is only searched while it matches the catalog version;
+    otherwise the chunks are scanned from the DB until a rebuilt snapshot lands.
+    """
+    if db is None:
+        with session_scope(read_only=True) as own_db:
+            return search_knn(query, top_k=top_k, db=own_db, filters=filters, query_embedding=query_embedding)
+
+    model = get_embedding_model()
+    table = get_attribute_table(db) if filters else None
+
+    if model != "precomputed":
+        snap = index_snapshot.get_snapshot()
+        if snap is not None and len(snap):
+            catalog_version = get_catalog_version(db)
+            record_cache("index_snapshot_current", snap.catalog_version == catalog_version)
+            if snap.catalog_version != catalog_version:
+                # chunks written after the snapshot would be missing from it
+                _rebuild_snapshot_in_background(catalog_version)
+                snap = None
+        if snap is not None and len(snap):
+            mask = None
+            if table is not None:
+                mask = table.chunk_mask(filters, snap.product_ids, cache_key=snap.version)
+                if not mask.any():
+                    return []
+            if query_embedding is not None:
+                q_emb = np.asarray(query_embedding, dtype=np.float32)
+            else:
+                with span("search_knn.encode"):
+                    q_emb = model.encode([query], convert_to_numpy=True)[0].astype(np.float32)
+            return _search_snapshot(db, snap, q_emb, top_k, mask)
+
+    with span("search_knn.load"):
         rows = db.query(models.ProductChunk).all()
-        if not rows:
-            return []
-        
-        # Pre-computed mode: use enhanced text similarity on pre-computed chunk texts
-        if model == "precomputed":
+    if table is not None:
+        mask = table.chunk_mask(filters, [r.product_id for r in rows])
+        rows = [r for r, keep in zip(rows, mask.tolist()) if keep]
+    if not rows:
+        return []
+    
+    # Pre-computed mode: use enhanced text similarity on pre-computed chunk texts
+    if model == "precomputed":
+        with span("search_knn.score"):
             results = []
             for r in rows:
                 score = enhanced_text_similarity(query, r.chunk_text or "")
                 if score > 0:
                     results.append((r.product_id, score, r.chunk_text))
-            
+
             # If no keyword matches, return top results anyway based on title match
             if not results:
                 for r in rows:
@@ -136,28 +314,33 @@ def search_knn(query: str, top_k: int = 5) -> List[Tuple[int, float, str]]:
                     score = enhanced_text_similarity(query, title)
                     if score > 0:
                         results.append((r.product_id, score, r.chunk_text))
-            
+
             results.sort(key=lambda x: x[1], reverse=True)
-            return results[:top_k]
-        
-        # Full semantic search mode (with SentenceTransformer)
-        q_emb = model.encode([query], convert_to_numpy=True)[0]
+        return results[:top_k]
+    
+    # Full semantic search mode (with SentenceTransformer)
+    if query_embedding is not None:
+        q_emb = query_embedding
+    else:
+        with span("search_knn.encode"):
+            q_emb = model.encode([query], convert_to_numpy=True)[0]
+    
+    embs = []
+    metas = []
+    texts = []
+    prod_ids = []
+    for r in rows:
+        if not r.embedding:
+            continue
+        embs.append(np.array(r.embedding, dtype=np.float32))
+        metas.append(r.meta)
+        texts.append(r.chunk_text)
+        prod_ids.append(r.product_id)
+
+    if not embs:
+        return []
         
-        embs = []
-        metas = []
-        texts = []
-        prod_ids = []
-        for r in rows:
-            if not r.embedding:
-                continue
-            embs.append(np.array(r.embedding, dtype=np.float32))
-            metas.append(r.meta)
-            texts.append(r.chunk_text)
-            prod_ids.append(r.product_id)
-
-        if not embs:
-            return []
-            
+    with span("search_knn.score"):
         embs = np.vstack(embs)
         q = q_emb.astype(np.float32)
         # cosine similarity
@@ -165,9 +348,7 @@ def search_knn(query: str, top_k: int = 5) -> List[Tuple[int, float, str]]:
         q_norm = q / np.linalg.norm(q)
         sims = (embs_norm @ q_norm)
         idx = np.argsort(-sims)[:top_k]
-        results = []
-        for i in idx:
-            results.append((prod_ids[i], float(sims[i]), texts[i]))
-        return results
-    finally:
-        db.close()
+    results = []
+    for i in idx:
+        results.append((prod_ids[i], float(sims[i]), texts[i]))
+    return results
@@ -5,6 +5,9 @@ from pydantic import BaseModel, Field
 class ProductBase(BaseModel):
     title: str
     price: Optional[str] = None
+    # parsed from `price` by crud.create_product when not given
+    price_amount: Optional[float] = None
+    price_currency: Optional[str] = None
     description: Optional[str] = None
     features: Optional[Any] = None
     image_url: Optional[str] = None
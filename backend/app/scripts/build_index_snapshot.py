@@ -0,0 +1,14 @@
+"""Write a memory-mapped index snapshot from the chunk embeddings already in the database."""
+from app.retrieval import build_index_snapshot
+
+
+def main():
+    snap = build_index_snapshot()
+    if snap is None:
+        print("No chunk embeddings found - run app.scripts.create_embeddings first")
+        return
+    print(f"Wrote snapshot {snap.version} with {len(snap)} vectors (catalog {snap.catalog_version})")
+
+
+if __name__ == "__main__":
+    main()
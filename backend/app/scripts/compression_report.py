@@ -0,0 +1,61 @@
+"""Report recall@k of each embedding compression codec against full-precision search.
+
+Usage: python -m app.scripts.compression_report [--queries 200] [--noise 0.05]
+
+Queries are sampled from the stored chunk vectors with a little Gaussian noise,
+so the report runs without loading the embedding model.
+"""
+import argparse
+import json
+
+import numpy as np
+
+from app import compression
+from app.database import SessionLocal
+from app.retrieval import load_chunk_embeddings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=200, help="number of sampled queries")
+    parser.add_argument("--noise", type=float, default=0.05, help="stddev of noise added to sampled queries")
+    parser.add_argument("--ks", type=str, default="1,5,10", help="comma separated k values")
+    parser.add_argument("--json", action="store_true", help="print raw JSON instead of a table")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        embs, _, _ = load_chunk_embeddings(db)
+    finally:
+        db.close()
+
+    if not len(embs):
+        print("No chunk embeddings found - run app.scripts.create_embeddings first")
+        return
+
+    rng = np.random.default_rng(0)
+    picks = rng.choice(len(embs), size=min(args.queries, len(embs)), replace=False)
+    queries = compression.normalize(embs[picks])
+    queries = queries + rng.normal(scale=args.noise, size=queries.shape).astype(np.float32)
+
+    ks = [int(k) for k in args.ks.split(",")]
+    rows = compression.recall_report(embs, queries, ks=ks)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+
+    print(f"{len(embs)} vectors x {embs.shape[1]} dims, {len(queries)} queries")
+    header = ["method", "rerank", "bytes/vec"] + [f"recall@{k}" for k in ks]
+    print("  ".join(f"{h:>10}" for h in header))
+    for row in rows:
+        if "error" in row:
+            print(f"{row['method']:>10}  error: {row['error']}")
+            continue
+        values = [row["method"], str(row["rerank"]), str(row["bytes_per_vector"])]
+        values += [f"{row[f'recall@{k}']:.3f}" for k in ks]
+        print("  ".join(f"{v:>10}" for v in values))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Local stand-in for the Gemini generateContent API, with configurable latency and failures.
+
+Usage (from backend/):
+    python -m app.scripts.fake_gemini --port 8081 --latency-ms 300 --slow-rate 0.05 --slow-ms 5000 --error-rate 0.02
+    GEMINI_BASE_URL=http://127.0.0.1:8081 GEMINI_API_KEY=fake uvicorn app.main:app
+
+POST /admin/config changes the behaviour of a running server (same keys as the
+flags, e.g. {"error_rate": 1.0} to trip the circuit breaker); GET /admin/stats
+counts the requests received.
+"""
+import argparse
+import asyncio
+import random
+
+import uvicorn
+from fastapi import FastAPI, HTTPException
+
+app = FastAPI(title="Fake Gemini")
+config = {"latency_ms": 300.0, "slow_rate": 0.0, "slow_ms": 5000.0, "error_rate": 0.0}
+stats = {"requests": 0, "errors": 0, "slow": 0}
+
+
+@app.post("/v1beta/models/{model}:generateContent")
+async def generate_content(model: str, payload: dict):
+    stats["requests"] += 1
+    delay = config["latency_ms"] * random.uniform(0.8, 1.2)
+    if random.random() < config["slow_rate"]:
+        stats["slow"] += 1
+        delay = config["slow_ms"]
+    await asyncio.sleep(delay / 1000.0)
+    if random.random() < config["error_rate"]:
+        stats["errors"] += 1
+        raise HTTPException(status_code=503, detail="fake overload")
+
+    prompt = payload["contents"][0]["parts"][0]["text"]
+    text = f"[{model}] Here is a friendly recommendation based on: {prompt[:80]}"
+    return {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP"}]}
+
+
+@app.post("/admin/config")
+def update_config(changes: dict):
+    config.update({k: float(v) for k, v in changes.items() if k in config})
+    return config
+
+
+@app.get("/admin/stats")
+def get_stats():
+    return {**stats, "config": config}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    for key, value in config.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=float, default=value)
+    args = parser.parse_args()
+    config.update({key: getattr(args, key) for key in config})
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""Cluster seeded and logged chat queries and store a precomputed answer per cluster."""
+import argparse
+
+from app import precomputed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clusters", type=int, default=precomputed.PRECOMPUTE_CLUSTERS)
+    parser.add_argument("--top-k", type=int, default=precomputed.PRECOMPUTE_TOP_K)
+    parser.add_argument("--dry-run", action="store_true", help="print the clusters without answering them")
+    args = parser.parse_args()
+
+    if args.dry_run:
+        queries = precomputed.collect_queries()
+        encoder, clusters = precomputed.cluster_queries(queries, args.clusters)
+        print(f"{len(queries)} distinct queries, encoder {encoder}")
+        for j, rep, members, _ in clusters:
+            confident = sum(sim >= precomputed.PRECOMPUTED_MIN_SIMILARITY for _, sim in members)
+            print(f"[{j}] {rep!r}: {len(members)} queries ({confident} confident), e.g. {[q for q, _ in members[1:4]]}")
+        return
+
+    n = precomputed.build_answers(k=args.clusters, top_k=args.top_k)
+    print(f"Stored {n} precomputed answers")
+
+
+if __name__ == "__main__":
+    main()
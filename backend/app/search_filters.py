@@ -0,0 +1,136 @@
+"""Metadata filters for the vector search (category, price range, feature attributes).
+
+Filters are applied as a boolean mask over chunk rows before top-k selection,
+so a selective filter still returns top_k matches instead of whatever
+survives a post-filtered top-k.
+
+The attribute table is built once per catalog version. It holds the
+category and price columns (app.product_columns, the same ones the catalog
+store uses) and, from the normalized feature rows (app.attributes), per
+feature key a dictionary of normalized values with the positions of the
+products having each one.
+
+A filter is resolved against the (small) dictionaries first. The matching
+product positions become a product mask, and chunks index into it through
+their product position. That mapping is cached per snapshot version.
+"""
+import logging
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from . import models
+from .attributes import normalize
+from .catalog import get_catalog_version
+from .metrics import record_cache, span
+from .product_columns import ProductColumns
+
+logger = logging.getLogger(__name__)
+
+
+class SearchFilters:
+    """Constraints on the products a search may return; unset fields do not filter.
+
+    category and attribute values match case-insensitively as substrings, like
+    /api/products search; attribute keys must match exactly (case-insensitive).
+    """
+
+    __slots__ = ("category", "min_price", "max_price", "attributes")
+
+    def __init__(
+        self,
+        category: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        attributes: Optional[Dict[str, str]] = None,
+    ):
+        self.category = category.strip().lower() if category and category.strip() else None
+        self.min_price = min_price
+        self.max_price = max_price
+        self.attributes = {normalize(k): normalize(v) for k, v in (attributes or {}).items()}
+
+    def __bool__(self) -> bool:
+        return bool(self.category or self.attributes) or self.min_price is not None or self.max_price is not None
+
+    def as_dict(self) -> dict:
+        return {k: getattr(self, k) for k in self.__slots__ if getattr(self, k) not in (None, {})}
+
+
+class AttributeTable:
+    """Product attributes of one catalog version, for building search masks."""
+
+    def __init__(self, version: str, rows, pairs=()):
+        """rows: (id, category, price_amount) per product; pairs: (product_id, key, value), normalized."""
+        self.version = version
+        self.columns = ProductColumns.build(rows)
+        self.ids = self.columns.ids
+        position = {int(pid): pos for pos, pid in enumerate(self.ids)}
+        postings: Dict[str, Dict[str, List[int]]] = {}
+        for pid, key, value in pairs:
+            if pid in position:
+                postings.setdefault(key, {}).setdefault(value, []).append(position[pid])
+        self.attributes = {
+            key: {value: np.array(p, dtype=np.int64) for value, p in values.items()}
+            for key, values in postings.items()
+        }
+        self._chunk_positions: Dict[str, np.ndarray] = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def product_mask(self, filters: SearchFilters) -> np.ndarray:
+        """Boolean mask over products, plus a trailing False for chunks of unknown products."""
+        mask = np.zeros(len(self) + 1, dtype=bool)
+        body = mask[:-1]
+        body[:] = self.columns.mask(filters.category, filters.min_price, filters.max_price)
+        for key, needle in filters.attributes.items():
+            hits = np.zeros(len(self), dtype=bool)
+            for value, positions in self.attributes.get(key, {}).items():
+                if needle in value:
+                    hits[positions] = True
+            body &= hits
+        return mask
+
+    def chunk_positions(self, product_ids, cache_key: Optional[str] = None) -> np.ndarray:
+        """Product position of each chunk row (len(self) for products not in the table)."""
+        if cache_key is not None and cache_key in self._chunk_positions:
+            return self._chunk_positions[cache_key]
+        product_ids = np.asarray(product_ids, dtype=np.int64)
+        pos = np.searchsorted(self.ids, product_ids)
+        pos = np.minimum(pos, len(self))
+        found = pos < len(self)
+        found[found] = self.ids[pos[found]] == product_ids[found]
+        pos[~found] = len(self)
+        if cache_key is not None:
+            self._chunk_positions = {cache_key: pos}  # only the active snapshot is worth keeping
+        return pos
+
+    def chunk_mask(self, filters: SearchFilters, product_ids, cache_key: Optional[str] = None) -> np.ndarray:
+        """Boolean mask over chunk rows whose product_ids satisfy `filters`."""
+        with span("search_filters.mask"):
+            return self.product_mask(filters)[self.chunk_positions(product_ids, cache_key)]
+
+
+_table: Optional[AttributeTable] = None
+_lock = threading.Lock()
+
+
+def get_attribute_table(db) -> AttributeTable:
+    """Attribute table for the current catalog version, rebuilt after catalog writes."""
+    global _table
+    version = get_catalog_version(db)
+    table = _table
+    record_cache("search_attributes", table is not None and table.version == version)
+    if table is not None and table.version == version:
+        return table
+    with _lock:
+        if _table is None or _table.version != version:
+            with span("search_filters.build"):
+                P, PA = models.Product, models.ProductAttribute
+                K, V = models.AttributeKey, models.AttributeValue
+                rows = db.query(P.id, P.category, P.price_amount).all()
+                pairs = db.query(PA.product_id, K.name, V.value).join(K, K.id == PA.key_id).join(V, V.id == PA.value_id).all()
+                _table = AttributeTable(version, rows, pairs)
+            logger.info(f"Search attribute table: {len(_table)} products, {len(_table.attributes)} keys (catalog {version})")
+        return _table
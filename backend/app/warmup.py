@@ -0,0 +1,91 @@
+"""Startup modes and readiness.
+
+STARTUP_MODE=lazy (default): the process starts listening right away; the
+embedding model, index snapshot and scraper stack load on first use.
+
+STARTUP_MODE=warm: same fast start, but a background thread preloads them
+while the server is already accepting requests. /ready reports 503 until the
+warm-up has finished, so a load balancer can hold traffic while /health
+(liveness) is green from the first moment.
+"""
+import logging
+import os
+import threading
+import time
+
+from .metrics import PRODUCTS, span
+
+logger = logging.getLogger(__name__)
+
+STARTUP_MODE = os.getenv("STARTUP_MODE", "lazy").lower()
+# Quick-start escape hatch: create missing tables at startup instead of via `alembic upgrade head`
+AUTO_CREATE_SCHEMA = os.getenv("AUTO_CREATE_SCHEMA", "false").lower() == "true"
+
+_lock = threading.Lock()
+_thread = None
+_state = {"mode": STARTUP_MODE, "started_at": None, "finished_at": None, "components": {}, "error": None}
+
+
+def _load_component(name: str, fn):
+    start = time.perf_counter()
+    try:
+        with span(f"warmup.{name}"):
+            fn()
+        _state["components"][name] = {"ready": True, "seconds": round(time.perf_counter() - start, 3)}
+    except Exception as e:
+        logger.warning(f"Warm-up of {name} failed: {e}")
+        _state["components"][name] = {"ready": False, "error": str(e)}
+        _state["error"] = _state["error"] or f"{name}: {e}"
+
+
+def _count_products():
+    from .database import session_scope
+    from . import models
+
+    with session_scope(read_only=True) as db:
+        count = db.query(models.Product).count()
+    PRODUCTS.set(count)
+    logger.info(f"Products in database: {count}")
+
+
+def _load_snapshot():
+    from . import index_snapshot
+    index_snapshot.get_snapshot(force=True)
+
+
+def _load_model():
+    from .retrieval import get_embedding_model
+    get_embedding_model()
+
+
+def _import_scraper():
+    import scraper.scraper  # noqa: F401  (requests + bs4)
+
+
+def warm_up():
+    """Load everything the first requests would otherwise pay for."""
+    _state["started_at"] = time.time()
+    _load_component("database", _count_products)
+    _load_component("index_snapshot", _load_snapshot)
+    _load_component("embedding_model", _load_model)
+    _load_component("scraper", _import_scraper)
+    _state["finished_at"] = time.time()
+    logger.info("Warm-up finished in %.2fs", _state["finished_at"] - _state["started_at"])
+
+
+def start_warmup():
+    """Run warm_up() in a daemon thread so startup does not wait for it."""
+    global _thread
+    with _lock:
+        if _thread is None:
+            _thread = threading.Thread(target=warm_up, name="warm-up", daemon=True)
+            _thread.start()
+
+
+def readiness() -> dict:
+    if STARTUP_MODE == "warm":
+        # a failed optional component (e.g. no snapshot yet) still counts as ready; the database must work
+        ready = _state["finished_at"] is not None and _state["components"].get("database", {}).get("ready", False)
+    else:
+        ready = True
+    return {"ready": ready, **_state}
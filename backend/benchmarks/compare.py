@@ -0,0 +1,61 @@
+"""Compare two benchmark result files written by benchmarks.run.
+
+Usage (from backend/): python -m benchmarks.compare OLD.json NEW.json [--metric p95_ms] [--threshold 10]
+
+Prints the change of one latency metric per catalog size and benchmark, and
+flags regressions slower than --threshold percent. Exits 1 if any regressed.
+"""
+import argparse
+import json
+import sys
+
+
+def flatten(result: dict) -> dict:
+    """{benchmark name: stats} for one catalog size."""
+    rows = {f"search_knn {mode}": stats for mode, stats in result.get("search_knn", {}).items()}
+    for group in ("catalog_store", "startup"):
+        rows.update({f"{group} {name}": stats for name, stats in result.get(group, {}).items() if isinstance(stats, dict)})
+    for name, stats in result.items():
+        if isinstance(stats, dict) and "p50_ms" in stats:
+            rows[name] = stats
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--metric", default="p95_ms")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent slowdown counted as a regression")
+    args = parser.parse_args()
+
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    print(f"{old['meta']['commit']} -> {new['meta']['commit']} ({args.metric})")
+
+    old_by_size = {r["size"]: r for r in old["results"]}
+    regressions = 0
+    for result in new["results"]:
+        base = old_by_size.get(result["size"])
+        if base is None or "error" in result or "error" in base:
+            continue
+        print(f"== {result['size']} products")
+        before, after = flatten(base), flatten(result)
+        for name in after:
+            if name not in before or args.metric not in after[name] or args.metric not in before[name]:
+                continue
+            a, b = before[name][args.metric], after[name][args.metric]
+            change = (b - a) / a * 100.0 if a else 0.0
+            flag = "  REGRESSION" if change > args.threshold else ""
+            regressions += bool(flag)
+            print(f"  {name:<40} {a:>10.3f} -> {b:>10.3f}  {change:+7.1f}%{flag}")
+        if "peak_rss_mb" in base and "peak_rss_mb" in result:
+            print(f"  {'peak_rss_mb':<40} {base['peak_rss_mb']:>10.1f} -> {result['peak_rss_mb']:>10.1f}")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Mixed read/write throughput against SQLite, default engine vs tuned engine.
+
+Usage (from backend/): python -m benchmarks.db_concurrency [--threads 8] [--seconds 5] [--write-ratio 0.2]
+
+Each worker thread loops for the given duration, doing either a product
+insert (a write transaction) or a point lookup plus a 20-row page (reads).
+"Locked" counts operations that failed with "database is locked".
+"""
+import argparse
+import json
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models, schemas
+from app.database import Base, make_engine
+
+
+def _seed(Session, n: int):
+    db = Session()
+    try:
+        db.add_all(
+            models.Product(
+                title=f"Seed product {i}",
+                price="₹ 499",
+                description="Ayurvedic herbal blend for hair fall and scalp health. " * 4,
+                category="Hair",
+                source_url=f"https://example.test/products/seed-{i}",
+            )
+            for i in range(n)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def run(tuned: bool, threads: int, seconds: float, write_ratio: float, seed_rows: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(f"sqlite:///{Path(tmp) / 'bench.db'}", tuned=tuned)
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        _seed(Session, seed_rows)
+
+        counts = {"reads": 0, "writes": 0, "locked": 0, "errors": 0}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + seconds
+
+        def worker(worker_id: int):
+            rng = random.Random(worker_id)
+            local = {k: 0 for k in counts}
+            seq = 0
+            while time.perf_counter() < deadline:
+                db = Session()
+                try:
+                    if rng.random() < write_ratio:
+                        seq += 1
+                        crud.create_product(db, schemas.ProductCreate(
+                            title=f"Bench product {worker_id}-{seq}",
+                            price="₹ 299",
+                            description="Sleep and stress support with ashwagandha.",
+                            category="Sleep",
+                            source_url=f"https://example.test/products/bench-{worker_id}-{seq}",
+                        ))
+                        local["writes"] += 1
+                    else:
+                        crud.get_product(db, rng.randint(1, seed_rows))
+                        crud.list_products(db, skip=rng.randint(0, max(0, seed_rows - 20)), limit=20)
+                        local["reads"] += 1
+                except OperationalError as e:
+                    db.rollback()
+                    local["locked" if "locked" in str(e) else "errors"] += 1
+                finally:
+                    db.close()
+            with lock:
+                for k, v in local.items():
+                    counts[k] += v
+
+        pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        start = time.perf_counter()
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        elapsed = time.perf_counter() - start
+        engine.dispose()
+
+    ops = counts["reads"] + counts["writes"]
+    return {
+        "engine": "tuned" if tuned else "default",
+        "threads": threads,
+        "seconds": round(elapsed, 3),
+        **counts,
+        "ops_per_sec": round(ops / elapsed, 1),
+        "reads_per_sec": round(counts["reads"] / elapsed, 1),
+        "writes_per_sec": round(counts["writes"] / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--seed-rows", type=int, default=2000)
+    parser.add_argument("--json", action="store_true", help="print raw JSON instead of a table")
+    args = parser.parse_args()
+
+    results = [run(tuned, args.threads, args.seconds, args.write_ratio, args.seed_rows) for tuned in (False, True)]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    cols = ["engine", "ops_per_sec", "reads_per_sec", "writes_per_sec", "locked", "errors"]
+    print(f"{args.threads} threads, {args.seconds}s, write ratio {args.write_ratio}")
+    print("  ".join(f"{c:>14}" for c in cols))
+    for r in results:
+        print("  ".join(f"{str(r[c]):>14}" for c in cols))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Chat-side LLM latency against the fake Gemini server: direct call vs gateway.
+
+Usage (from backend/): python -m benchmarks.llm_gateway [--requests 200] [--threads 8] [--slow-rate 0.05]
+
+Starts app.scripts.fake_gemini with a slow tail, then runs the same load
+through generate_with_gemini (the old path, one call with a 30s timeout) and
+through the gateway with and without hedging. A final phase sets the error
+rate to 100% and shows the circuit breaker failing fast. Prompts repeat, so
+some requests are coalesced.
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def summarize(latencies, answered: int) -> dict:
+    ordered = sorted(latencies)
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000.0, 1)
+    return {"p50_ms": pick(0.5), "p95_ms": pick(0.95), "p99_ms": pick(0.99), "max_ms": round(ordered[-1] * 1000.0, 1),
+            "answered": answered, "requests": len(ordered)}
+
+
+def load(fn, requests: int, threads: int, prompts: int) -> dict:
+    rng = random.Random(0)
+    batch = [f"Customer question #{rng.randrange(prompts)}" for _ in range(requests)]
+
+    def one(prompt):
+        start = time.perf_counter()
+        out = fn(prompt)
+        return time.perf_counter() - start, bool(out)
+
+    with ThreadPoolExecutor(threads) as pool:
+        results = list(pool.map(one, batch))
+    return summarize([r[0] for r in results], sum(r[1] for r in results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--prompts", type=int, default=50, help="distinct prompts in the load")
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--slow-ms", type=float, default=5000)
+    parser.add_argument("--budget-ms", type=float, default=3000)
+    args = parser.parse_args()
+
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "app.scripts.fake_gemini", "--port", str(port), "--latency-ms", str(args.latency_ms),
+         "--slow-rate", str(args.slow_rate), "--slow-ms", str(args.slow_ms)],
+        cwd=BACKEND_DIR,
+    )
+    os.environ.update(GEMINI_BASE_URL=base_url, GEMINI_API_KEY="fake")
+    from app import llm
+    from app.llm_gateway import LatencyWindow, LLMGateway
+
+    try:
+        deadline = time.perf_counter() + 30
+        while True:
+            try:
+                httpx.get(f"{base_url}/admin/stats")
+                break
+            except httpx.TransportError:
+                if time.perf_counter() > deadline:
+                    raise
+                time.sleep(0.1)
+
+        call = lambda prompt, timeout: llm.generate_with_gemini(prompt, timeout=timeout, raise_errors=True)
+        budget = args.budget_ms / 1000.0
+        results = {"direct": load(llm.generate_with_gemini, args.requests, args.threads, args.prompts)}
+        for name, hedge in (("gateway", False), ("gateway_hedged", True)):
+            gateway = LLMGateway(call, budget=budget, hedge=hedge, latency=LatencyWindow(min_samples=10))
+            load(gateway.generate, 20, args.threads, args.requests)  # latency samples for timeouts and hedging
+            results[name] = load(gateway.generate, args.requests, args.threads, args.prompts)
+            results[name]["gateway"] = gateway.stats()
+
+        httpx.post(f"{base_url}/admin/config", json={"error_rate": 1.0, "slow_rate": 0.0})
+        gateway = LLMGateway(call, budget=budget)
+        results["gateway_upstream_down"] = load(gateway.generate, args.requests, args.threads, args.requests)
+        results["gateway_upstream_down"]["gateway"] = gateway.stats()
+        results["fake_server"] = httpx.get(f"{base_url}/admin/stats").json()
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
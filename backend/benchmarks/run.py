@@ -0,0 +1,410 @@
+"""Retrieval and chat benchmark suite.
+
+Usage (from backend/):
+    python -m benchmarks.run [--sizes 1000,10000,100000] [--queries 200] [--out benchmarks/results]
+
+For every catalog size a fresh worker process builds a synthetic SQLite
+catalog (benchmarks.synthetic), then times:
+- build_embeddings_for_products (chunking, encoding, inserts, index snapshot)
+- search_knn in keyword mode (USE_PRECOMPUTED_EMBEDDINGS path) and semantic
+  mode, both as a DB scan and from the mmap'd snapshot, exact and compressed
+- filtered search (category + price + attribute): the pre-filter mask vs
+  filtering the unfiltered top-k afterwards
+- GET /api/products pagination, GET /api/facets (filtered counts) and POST
+  /api/chat, with Gemini replaced by a stub
+- startup: `import app.main`, and a real uvicorn process until /health
+  (time-to-listening) and /ready answer, for STARTUP_MODE=lazy and warm
+
+Each timing reports p50/p95/p99 latency and throughput; semantic modes also
+report recall@k of product ids against exact brute force over the snapshot.
+Peak RSS is per worker process. Results are written as JSON named after the
+current commit; compare two runs with `python -m benchmarks.compare`.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def summarize(latencies) -> dict:
+    lat = np.asarray(latencies, dtype=np.float64) * 1000.0
+    if not len(lat):
+        return {"n": 0}
+    return {
+        "n": int(len(lat)),
+        "mean_ms": round(float(lat.mean()), 3),
+        "p50_ms": round(float(np.percentile(lat, 50)), 3),
+        "p95_ms": round(float(np.percentile(lat, 95)), 3),
+        "p99_ms": round(float(np.percentile(lat, 99)), 3),
+        "throughput_per_sec": round(len(lat) / (lat.sum() / 1000.0), 1) if lat.sum() else None,
+    }
+
+
+def timed(fn, inputs) -> tuple:
+    latencies, outputs = [], []
+    for x in inputs:
+        start = time.perf_counter()
+        outputs.append(fn(x))
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies), outputs
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def recall(results, truth, k: int) -> float:
+    pairs = list(zip(results, truth))
+    total = 0.0
+    for got, expected in pairs:
+        expected = set(expected[:k])
+        if expected:
+            total += len(set(pid for pid, _, _ in got[:k]) & expected) / len(expected)
+    return round(total / max(1, len(pairs)), 4)
+
+
+def run_worker(size: int, n_queries: int, n_scan_queries: int, n_requests: int, top_k: int, codecs) -> dict:
+    """Runs inside the per-size subprocess; DATABASE_URL and INDEX_DIR are already set."""
+    from fastapi.testclient import TestClient
+
+    from app import compression, index_snapshot, llm, retrieval
+    from app.database import Base, engine, session_scope
+    from benchmarks import synthetic
+
+    out = {"size": size}
+    Base.metadata.create_all(bind=engine)
+    start = time.perf_counter()
+    with session_scope() as db:
+        synthetic.insert_products(db, synthetic.make_products(size))
+    out["seed_seconds"] = round(time.perf_counter() - start, 3)
+
+    encoder = synthetic.HashingEncoder()
+    retrieval._EMBED_MODEL = encoder
+    start = time.perf_counter()
+    n_chunks = retrieval.build_embeddings_for_products(limit=size)
+    elapsed = time.perf_counter() - start
+    out["build_embeddings"] = {
+        "chunks": n_chunks,
+        "seconds": round(elapsed, 3),
+        "products_per_sec": round(size / elapsed, 1),
+    }
+
+    queries = synthetic.make_queries(n_queries)
+    scan_queries = queries[:n_scan_queries]
+
+    # exact brute force over the full-precision snapshot is the recall baseline
+    snap = index_snapshot.get_snapshot(force=True)
+    matrix = np.asarray(snap.embeddings)
+    product_ids = np.asarray(snap.product_ids)
+    truth = []
+    for q in queries:
+        idx, _ = compression.top_k_indices(matrix @ compression.normalize(encoder.encode([q])[0]), top_k)
+        truth.append(product_ids[idx].tolist())
+
+    search = {}
+    retrieval._EMBED_MODEL = "precomputed"
+    search["keyword_scan"], _ = timed(lambda q: retrieval.search_knn(q, top_k=top_k), scan_queries)
+    retrieval._EMBED_MODEL = encoder
+
+    real_get_snapshot = index_snapshot.get_snapshot
+    index_snapshot.get_snapshot = lambda force=False: None
+    try:
+        stats, res = timed(lambda q: retrieval.search_knn(q, top_k=top_k), scan_queries)
+    finally:
+        index_snapshot.get_snapshot = real_get_snapshot
+    stats[f"recall@{top_k}"] = recall(res, truth, top_k)
+    search["semantic_scan"] = stats
+
+    stats, res = timed(lambda q: retrieval.search_knn(q, top_k=top_k), queries)
+    stats[f"recall@{top_k}"] = recall(res, truth, top_k)
+    search["semantic_snapshot"] = stats
+
+    search.update(measure_filtered_search(encoder, queries, matrix, product_ids, top_k))
+
+    for codec in codecs:
+        compression.COMPRESSION = codec
+        for rerank in (False, True):
+            compression.RERANK = rerank
+            try:
+                start = time.perf_counter()
+                if not rerank:
+                    retrieval.build_index_snapshot()
+                train_seconds = time.perf_counter() - start
+            except ValueError as e:
+                search[f"semantic_snapshot_{codec}"] = {"error": str(e)}
+                break
+            stats, res = timed(lambda q: retrieval.search_knn(q, top_k=top_k), queries)
+            stats[f"recall@{top_k}"] = recall(res, truth, top_k)
+            if not rerank:
+                stats["train_seconds"] = round(train_seconds, 3)
+            search[f"semantic_snapshot_{codec}{'_rerank' if rerank else ''}"] = stats
+    compression.COMPRESSION = "none"
+    out["search_knn"] = search
+
+    llm.GEMINI_API_KEY = llm.GEMINI_API_KEY or "benchmark"
+    llm.generate_with_gemini = lambda prompt, **kwargs: "Stub answer from the benchmark LLM."
+
+    with TestClient(app_factory()) as client:
+        rng = np.random.default_rng(0)
+        page = 50
+        skips = rng.integers(0, max(1, size - page), size=n_requests).tolist()
+        out["api_products"], _ = timed(lambda s: client.get("/api/products", params={"skip": s, "limit": page}), skips)
+        out["api_products_search"], _ = timed(
+            lambda s: client.get("/api/products", params={"skip": 0, "limit": page, "search": "hair"}), skips[: n_requests // 2]
+        )
+        # distinct price caps, so most requests miss the response cache and count in SQL
+        out["api_facets"], _ = timed(
+            lambda s: client.get("/api/facets", params={"max_price": 199 + s % 1300, "attr": "concern:hair"}), skips[: n_requests // 2]
+        )
+        chat_queries = synthetic.make_queries(n_requests, seed=2)
+        out["api_chat"], responses = timed(lambda q: client.post("/api/chat", json={"message": q}), chat_queries)
+        out["api_chat"]["errors"] = sum(1 for r in responses if r.status_code != 200)
+
+    out["catalog_store"] = measure_catalog_store(n_requests)
+    out["peak_rss_mb"] = peak_rss_mb()
+    out["startup"] = measure_startup()
+    return out
+
+
+def measure_filtered_search(encoder, queries, matrix, product_ids, top_k: int) -> dict:
+    """search_knn with a selective filter: mask before top-k vs post-filtering the top-k."""
+    from app import compression, retrieval
+    from app.database import session_scope
+    from app.search_filters import SearchFilters, get_attribute_table
+
+    filters = SearchFilters(category="hair", max_price=499, attributes={"concern": "hair fall"})
+    with session_scope() as db:
+        keep = get_attribute_table(db).chunk_mask(filters, product_ids)
+    allowed = set(product_ids[keep].tolist())
+    truth = []
+    for q in queries:
+        sims = np.where(keep, matrix @ compression.normalize(encoder.encode([q])[0]), -np.inf)
+        idx, _ = compression.top_k_indices(sims, top_k)
+        truth.append(product_ids[idx].tolist())
+
+    out = {}
+    runs = (
+        ("semantic_snapshot_filtered", lambda q: retrieval.search_knn(q, top_k=top_k, filters=filters)),
+        ("semantic_snapshot_post_filter", lambda q: [r for r in retrieval.search_knn(q, top_k=top_k) if r[0] in allowed]),
+    )
+    for name, fn in runs:
+        stats, res = timed(fn, queries)
+        stats[f"recall@{top_k}"] = recall(res, truth, top_k)
+        stats["mean_results"] = round(sum(len(r) for r in res) / max(1, len(res)), 2)
+        stats["selectivity"] = round(float(keep.mean()), 4)
+        out[name] = stats
+    return out
+
+
+def measure_catalog_store(n_requests: int, page: int = 50) -> dict:
+    """Memory of the whole catalog as ORM objects vs the columnar store, and filtered page latency of each."""
+    import asyncio
+    import tracemalloc
+
+    from app import catalog_store, crud
+    from app.async_database import AsyncSessionLocal
+    from app.catalog import get_catalog_version_async, product_dict
+
+    async def run():
+        out = {}
+        async with AsyncSessionLocal() as db:
+            version = await get_catalog_version_async(db)
+            tracemalloc.start()
+            rows, _ = await crud.search_products_async(db, 0, 10 ** 9)
+            out["orm_mb"] = round(tracemalloc.get_traced_memory()[0] / 2 ** 20, 2)
+            tracemalloc.stop()
+            del rows
+
+        store = catalog_store.CatalogStore()
+        tracemalloc.start()
+        async with AsyncSessionLocal() as db:
+            start = time.perf_counter()
+            cols = await store.ensure(db, version)
+            out["store_load_seconds"] = round(time.perf_counter() - start, 3)
+        out["store_mb"] = round(tracemalloc.get_traced_memory()[0] / 2 ** 20, 2)
+        tracemalloc.stop()
+
+        for name, search in (("page", None), ("search", "hair")):
+            sql, mem = [], []
+            async with AsyncSessionLocal() as db:
+                for i in range(n_requests):
+                    start = time.perf_counter()
+                    items, _ = await crud.search_products_async(db, i % 10 * page, page, search=search)
+                    [product_dict(p) for p in items]
+                    sql.append(time.perf_counter() - start)
+                    db.expunge_all()
+            for i in range(n_requests):
+                start = time.perf_counter()
+                positions, total = store.query(cols, i % 10 * page, page, search=search)
+                catalog_store.render_page(cols, positions, total, i % 10 * page, page)
+                mem.append(time.perf_counter() - start)
+            out[f"{name}_sql"] = summarize(sql)
+            out[f"{name}_store"] = summarize(mem)
+        return out
+
+    return asyncio.run(run())
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for(client, url: str, deadline: float) -> float:
+    while time.perf_counter() < deadline:
+        try:
+            if client.get(url).status_code == 200:
+                return time.perf_counter()
+        except Exception:
+            pass
+        time.sleep(0.01)
+    raise TimeoutError(url)
+
+
+def measure_startup(runs: int = 3, timeout: float = 60.0) -> dict:
+    """Cold-start timings in fresh interpreters, using this worker's DATABASE_URL and INDEX_DIR."""
+    import httpx
+
+    out = {}
+    imports = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import app.main"], cwd=BACKEND_DIR, check=True, capture_output=True)
+        imports.append(time.perf_counter() - start)
+    out["import_app"] = summarize(imports)
+
+    for mode in ("lazy", "warm"):
+        listening, ready = [], []
+        for _ in range(runs):
+            port = _free_port()
+            env = dict(os.environ, STARTUP_MODE=mode)
+            start = time.perf_counter()
+            proc = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+                cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            try:
+                with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1.0) as client:
+                    deadline = start + timeout
+                    listening.append(_wait_for(client, "/health", deadline) - start)
+                    ready.append(_wait_for(client, "/ready", deadline) - start)
+            finally:
+                proc.terminate()
+                proc.wait()
+        out[f"{mode}_time_to_listening"] = summarize(listening)
+        out[f"{mode}_time_to_ready"] = summarize(ready)
+    return out
+
+
+def app_factory():
+    from app.main import app
+    return app
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=str, default="1000,10000,100000")
+    parser.add_argument("--queries", type=int, default=200, help="search_knn queries per indexed mode")
+    parser.add_argument("--scan-queries", type=int, default=20, help="queries for the full-table-scan modes")
+    parser.add_argument("--requests", type=int, default=100, help="HTTP requests per endpoint")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--codecs", type=str, default="sq8,pq,pca", help="compression codecs to benchmark ('' for none)")
+    parser.add_argument("--out", type=str, default=str(RESULTS_DIR))
+    parser.add_argument("--worker", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    codecs = [c for c in args.codecs.split(",") if c]
+
+    if args.worker is not None:
+        result = run_worker(args.worker, args.queries, args.scan_queries, args.requests, args.top_k, codecs)
+        print("BENCHMARK_RESULT " + json.dumps(result))
+        return
+
+    results = []
+    for size in [int(s) for s in args.sizes.split(",")]:
+        print(f"== {size} products", flush=True)
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(
+                os.environ,
+                DATABASE_URL=f"sqlite:///{Path(tmp) / 'bench.db'}",
+                INDEX_DIR=str(Path(tmp) / "index"),
+                QUERY_LOG_PATH=str(Path(tmp) / "chat_queries.jsonl"),
+                USE_PRECOMPUTED_EMBEDDINGS="false",
+                EMBEDDING_COMPRESSION="none",
+            )
+            cmd = [sys.executable, "-m", "benchmarks.run", "--worker", str(size)] + [
+                f"--queries={args.queries}", f"--scan-queries={args.scan_queries}",
+                f"--requests={args.requests}", f"--top-k={args.top_k}", f"--codecs={args.codecs}",
+            ]
+            proc = subprocess.run(cmd, cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+        line = next((l for l in proc.stdout.splitlines() if l.startswith("BENCHMARK_RESULT ")), None)
+        if proc.returncode != 0 or line is None:
+            print(proc.stderr[-4000:], file=sys.stderr)
+            results.append({"size": size, "error": f"worker exited with {proc.returncode}"})
+            continue
+        result = json.loads(line[len("BENCHMARK_RESULT "):])
+        results.append(result)
+        print_result(result)
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "args": {k: v for k, v in vars(args).items() if k != "worker"},
+        },
+        "results": results,
+    }
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    path = out_dir / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{commit}.json"
+    path.write_text(json.dumps(report, indent=2))
+    print(f"Saved {path}")
+
+
+def print_result(result: dict):
+    print(f"  build_embeddings: {result['build_embeddings']['seconds']}s "
+          f"({result['build_embeddings']['products_per_sec']} products/s), peak RSS {result['peak_rss_mb']} MB")
+    rows = [(f"search_knn {mode}", stats) for mode, stats in result["search_knn"].items()]
+    rows += [(name, result[name]) for name in ("api_products", "api_products_search", "api_facets", "api_chat") if name in result]
+    store = result.get("catalog_store", {})
+    print(f"  catalog memory: ORM {store.get('orm_mb')} MB, columnar store {store.get('store_mb')} MB")
+    rows += [(f"catalog_store {name}", stats) for name, stats in store.items() if isinstance(stats, dict)]
+    rows += [(f"startup {name}", stats) for name, stats in result.get("startup", {}).items()]
+    for name, stats in rows:
+        if "error" in stats:
+            print(f"  {name:<40} error: {stats['error']}")
+            continue
+        recall_key = next((k for k in stats if k.startswith("recall@")), None)
+        extra = f"  {recall_key}={stats[recall_key]}" if recall_key else ""
+        print(f"  {name:<40} p50={stats['p50_ms']:>9.3f}ms  p95={stats['p95_ms']:>9.3f}ms  "
+              f"p99={stats['p99_ms']:>9.3f}ms  {stats['throughput_per_sec']:>8}/s{extra}")
+
+
+if __name__ == "__main__":
+    main()
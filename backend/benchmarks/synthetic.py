@@ -0,0 +1,132 @@
+"""Synthetic health & wellness catalog for benchmarks.
+
+Products are assembled from concern / format / ingredient templates so titles,
+descriptions and features read like the scraped catalog. Embeddings come from
+HashingEncoder, a deterministic stand-in for SentenceTransformer: it needs no
+model download, and queries sharing words with a product land near it.
+"""
+import random
+import re
+import zlib
+from typing import Dict, List
+
+import numpy as np
+from sqlalchemy import insert
+
+from app import models
+from app.attributes import rebuild_product_attributes
+from app.pricing import parse_price
+
+DIM = 384
+
+CONCERNS = {
+    "hair fall": ["hair fall", "thinning hair", "hair growth", "weak roots", "breakage"],
+    "dandruff": ["dandruff", "itchy scalp", "flaky scalp", "scalp health"],
+    "sleep": ["sleep", "insomnia", "restful nights", "melatonin balance"],
+    "stress": ["stress", "anxiety", "calm mind", "mood balance"],
+    "digestion": ["digestion", "gut health", "bloating", "constipation", "acidity"],
+    "skin": ["acne", "glowing skin", "pigmentation", "dry skin", "wrinkles"],
+    "metabolism": ["cholesterol", "weight management", "metabolism", "blood sugar"],
+    "energy": ["energy", "fatigue", "stamina", "immunity"],
+}
+FORMATS = {
+    "Hair": ["Hair Oil", "Shampoo", "Conditioner", "Scalp Serum", "Hair Mask"],
+    "Supplements": ["Tablets", "Capsules", "Gummies", "Herbal Blend", "Ras"],
+    "Skin": ["Face Serum", "Face Wash", "Night Cream", "Sunscreen Gel"],
+    "Wellness": ["Churna", "Kadha", "Tea", "Drops"],
+}
+INGREDIENTS = [
+    "Bhringraj", "Amla", "Ashwagandha", "Brahmi", "Shatavari", "Triphala", "Neem",
+    "Onion Seed", "Rosemary", "Biotin", "Tulsi", "Giloy", "Ginger", "Turmeric",
+    "Aloe Vera", "Jatamansi", "Methi", "Shikakai", "Vitamin C", "Zinc",
+]
+BENEFITS = [
+    "clinically tested", "100% natural", "ayurvedic formulation", "doctor recommended",
+    "no parabens or sulphates", "suitable for daily use", "backed by 5000 years of Ayurveda",
+]
+
+QUERIES = [
+    "What helps with hair fall?",
+    "I need something for better sleep",
+    "my scalp is itchy and flaky",
+    "natural remedy for stress and anxiety",
+    "bloating after meals, anything for digestion?",
+    "ayurvedic oil for thinning hair",
+    "supplement to lower cholesterol",
+    "I feel tired all the time, need more energy",
+    "face serum for acne and pigmentation",
+    "shampoo for dandruff",
+    "biotin tablets for hair growth",
+    "herbal tea for constipation",
+]
+
+
+def make_products(n: int, seed: int = 0) -> List[Dict]:
+    """Return n product dicts shaped like schemas.ProductCreate."""
+    rng = random.Random(seed)
+    concern_names = list(CONCERNS)
+    products = []
+    for i in range(n):
+        concern = rng.choice(concern_names)
+        category = rng.choice(list(FORMATS))
+        fmt = rng.choice(FORMATS[category])
+        ingredients = rng.sample(INGREDIENTS, 3)
+        terms = rng.sample(CONCERNS[concern], min(2, len(CONCERNS[concern])))
+        title = f"{ingredients[0]} {fmt} for {terms[0].title()}"
+        description = (
+            f"{title} is an {rng.choice(BENEFITS)} {fmt.lower()} that targets {terms[0]}"
+            f" and {terms[-1]}. Made with {ingredients[0]}, {ingredients[1]} and {ingredients[2]},"
+            f" it works at the root cause of {concern} and is {rng.choice(BENEFITS)}."
+            f" Use twice daily for 3 months for best results. {rng.choice(BENEFITS).capitalize()}."
+        )
+        price = rng.choice([199, 249, 299, 349, 399, 449, 499, 599, 699, 799, 899, 999, 1299, 1499])
+        products.append({
+            "title": f"{title} #{i}",
+            "price": f"MRP:Regular price₹ {price:,}Sale price",
+            "description": description,
+            "features": {
+                "Key Ingredients": ", ".join(ingredients),
+                "Concern": concern.title(),
+                "Format": fmt,
+                "features": rng.sample(BENEFITS, 2),
+            },
+            "image_url": f"https://example.test/images/{i}.jpg",
+            "category": category,
+            "source_url": f"https://example.test/products/{i}",
+        })
+    return products
+
+
+def insert_products(db, products: List[Dict], batch: int = 5000) -> None:
+    # bulk inserts skip crud.create_product, so parse prices here
+    products = [dict(p, **dict(zip(("price_amount", "price_currency"), parse_price(p.get("price"))))) for p in products]
+    for start in range(0, len(products), batch):
+        db.execute(insert(models.Product), products[start:start + batch])
+    rebuild_product_attributes(db.connection())
+    db.commit()
+
+
+def make_queries(n: int, seed: int = 1) -> List[str]:
+    rng = random.Random(seed)
+    return [rng.choice(QUERIES) for _ in range(n)]
+
+
+_TOKEN = re.compile(r"\b\w+\b")
+
+
+class HashingEncoder:
+    """Deterministic bag-of-words embedding with the SentenceTransformer.encode signature."""
+
+    def __init__(self, dim: int = DIM):
+        self.dim = dim
+
+    def _vector(self, text: str) -> np.ndarray:
+        v = np.zeros(self.dim, dtype=np.float32)
+        for tok in _TOKEN.findall(text.lower()):
+            h = zlib.crc32(tok.encode())
+            v[h % self.dim] += 1.0 if (h >> 16) & 1 else -1.0
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def encode(self, texts, convert_to_numpy: bool = True, show_progress_bar: bool = False, **_):
+        return np.vstack([self._vector(t) for t in texts]) if texts else np.empty((0, self.dim), dtype=np.float32)
@@ -23,6 +23,21 @@ deleted_chunks = cursor.rowcount
 conn.commit()
 print(f'Deleted {deleted_chunks} orphaned chunks')
 
+# Delete orphaned attribute rows (app.attributes removes them for ORM deletes)
+try:
+    cursor.execute("DELETE FROM product_attributes WHERE product_id NOT IN (SELECT id FROM products)")
+    conn.commit()
+except sqlite3.OperationalError:
+    print('No product_attributes table - run alembic upgrade head')
+
+# Invalidate catalog caches (app.catalog bumps this automatically for ORM writes)
+if deleted or deleted_chunks:
+    try:
+        cursor.execute("UPDATE catalog_state SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1")
+        conn.commit()
+    except sqlite3.OperationalError:
+        print('No catalog_state table - run alembic upgrade head')
+
 # Count remaining
 cursor.execute('SELECT COUNT(*) FROM products')
 remaining = cursor.fetchone()[0]
@@ -5,14 +5,14 @@ import sys
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.database import engine, Base, SessionLocal
+from app.database import SessionLocal, run_migrations
 from app import models, crud, schemas
 from scraper.scraper import scrape_site
 
 def init_db():
-    """Create tables and seed with products if empty."""
-    print("Creating database tables...")
-    Base.metadata.create_all(bind=engine)
+    """Migrate the schema and seed with products if empty."""
+    print("Running database migrations...")
+    run_migrations()
     
     db = SessionLocal()
     try:
@@ -13,6 +13,8 @@ import requests
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
 
+from app.pricing import parse_price
+
 DOMAIN = "traya.health"
 
 
@@ -53,9 +55,16 @@ def fetch_product(url: str) -> Dict:
 
     # price: look for meta tags or classes containing 'price'
     price = None
+    price_amount = None
+    price_currency = None
     price_meta = soup.find("meta", property="product:price:amount")
     if price_meta and price_meta.get("content"):
         price = price_meta.get("content")
+        # structured amount/currency, preferred over parsing the display text at ingest
+        price_amount, price_currency = parse_price(price)
+        currency_meta = soup.find("meta", property="product:price:currency")
+        if price_amount is not None and currency_meta and currency_meta.get("content"):
+            price_currency = currency_meta.get("content").strip().upper()
     # fallback find price-like text
     price_el = soup.select_one(".price, .product-price, .price--main, .product__price")
     if price_el:
@@ -106,6 +115,8 @@ def fetch_product(url: str) -> Dict:
     data = {
         "title": title or "",
         "price": price or "",
+        "price_amount": price_amount,
+        "price_currency": price_currency,
         "description": description or "",
         "features": features or None,
         "image_url": image_url or "",
@@ -0,0 +1,20 @@
+"""Backend tests. Run from backend/: python -m unittest discover -s tests -t .
+
+Settings are pinned here, before any app module is imported: a throwaway
+SQLite database and index directory, the lightweight query encoder, and no
+query log, background rebuilds or Gemini calls.
+"""
+import os
+import tempfile
+
+_TMP = tempfile.mkdtemp(prefix="backend-tests-")
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{os.path.join(_TMP, 'test.db')}",
+    INDEX_DIR=os.path.join(_TMP, "index"),
+    QUERY_LOG_PATH=os.path.join(_TMP, "chat_queries.jsonl"),
+    QUERY_LOG="false",
+    PRECOMPUTE_AUTO="false",
+    INDEX_AUTO_REBUILD="false",
+    USE_PRECOMPUTED_EMBEDDINGS="true",
+    GEMINI_API_KEY="",
+)
@@ -0,0 +1,65 @@
+import unittest
+from unittest import mock
+
+from sqlalchemy import delete, false, insert, select
+
+from app import attributes, crud, models, schemas
+from app.database import Base, engine, session_scope
+from app.search_filters import SearchFilters, get_attribute_table
+
+
+class InternTest(unittest.TestCase):
+    def setUp(self):
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as connection:
+            connection.execute(delete(models.ProductAttribute.__table__))
+            connection.execute(delete(models.AttributeKey.__table__))
+
+    def test_key_interned_concurrently_is_reused(self):
+        table = models.AttributeKey.__table__
+        real_select = attributes.select
+        calls = []
+
+        def stale_first_select(*columns):
+            # the first lookup misses a key that another writer stores before our insert
+            calls.append(columns)
+            query = real_select(*columns)
+            return query.where(false()) if len(calls) == 1 else query
+
+        with engine.begin() as connection:
+            connection.execute(insert(table).values(name="size", label="Size"))
+            stored = connection.execute(select(table.c.id).where(table.c.name == "size")).scalar_one()
+            with mock.patch.object(attributes, "select", side_effect=stale_first_select):
+                ids = attributes._intern(connection, table, "name", {"size": "SIZE", "color": "Color"})
+            labels = dict(connection.execute(select(table.c.name, table.c.label)).all())
+
+        self.assertEqual(ids["size"], stored)
+        self.assertEqual(labels, {"size": "Size", "color": "Color"})
+
+
+class AttributeFilterTest(unittest.TestCase):
+    def setUp(self):
+        Base.metadata.create_all(bind=engine)
+        with session_scope() as db:
+            db.query(models.ProductAttribute).delete()
+            db.query(models.ProductChunk).delete()
+            db.query(models.Product).delete()
+            db.commit()
+            self.ids = [
+                crud.create_product(db, schemas.ProductCreate(title=f"Shirt {i}", features={"fabric": fabric}, source_url=f"t://{i}")).id
+                for i, fabric in enumerate(["100% cotton", "1000 thread cotton", "poly_blend", "polyxblend"])
+            ]
+
+    def test_sql_filter_matches_search_mask(self):
+        for needle, expected in [("100%", [0]), ("poly_", [2]), ("cotton", [0, 1])]:
+            with self.subTest(needle=needle), session_scope() as db:
+                filters = {"fabric": needle}
+                sql = db.execute(crud.attribute_filter(select(models.Product.id), filters)).scalars().all()
+                table = get_attribute_table(db)
+                mask = table.product_mask(SearchFilters(attributes=filters))[:-1]
+                self.assertEqual(sorted(sql), [self.ids[i] for i in expected])
+                self.assertEqual(sorted(table.ids[mask].tolist()), [self.ids[i] for i in expected])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+from app import catalog_store, crud, models, schemas
+from app.database import Base, engine, session_scope
+from app.http_cache import response_cache
+from app.main import app
+
+
+def titles(client) -> dict:
+    body = client.get("/api/products", params={"limit": 500}).json()
+    return {p["id"]: p["title"] for p in body["products"]}
+
+
+class CatalogStoreRefreshTest(unittest.TestCase):
+    def setUp(self):
+        Base.metadata.create_all(bind=engine)
+        with session_scope() as db:
+            db.query(models.ProductAttribute).delete()
+            db.query(models.ProductChunk).delete()
+            db.query(models.Product).delete()
+            db.commit()
+            self.ids = [
+                crud.create_product(db, schemas.ProductCreate(title=f"Product {i}", price="₹ 100", source_url=f"t://{i}")).id
+                for i in range(3)
+            ]
+        catalog_store.store = catalog_store.CatalogStore()
+        response_cache.clear()
+        self.client = TestClient(app)
+
+    def rename(self, product_id: int, title: str) -> None:
+        with session_scope() as db:
+            db.get(models.Product, product_id).title = title
+            db.commit()
+
+    def test_updates_in_the_same_second_are_picked_up(self):
+        a, b, _ = self.ids
+        self.assertEqual(titles(self.client)[a], "Product 0")
+        self.rename(a, "Renamed 0")
+        self.assertEqual(titles(self.client)[a], "Renamed 0")
+        # written right after the previous refresh, typically within the same second
+        self.rename(b, "Renamed 1")
+        current = titles(self.client)
+        self.assertEqual(current[a], "Renamed 0")
+        self.assertEqual(current[b], "Renamed 1")
+
+    def test_refresh_is_incremental_and_handles_inserts_and_deletes(self):
+        titles(self.client)
+        loaded = catalog_store.store.cols
+        self.rename(self.ids[0], "Renamed 0")
+        with session_scope() as db:
+            new_id = crud.create_product(db, schemas.ProductCreate(title="New", source_url="t://new")).id
+        current = titles(self.client)
+        self.assertEqual(current[self.ids[0]], "Renamed 0")
+        self.assertEqual(current[new_id], "New")
+        # untouched rows keep their serialized fragment from the previous generation
+        self.assertIs(catalog_store.store.cols.fragments[2], loaded.fragments[2])
+
+        with session_scope() as db:
+            db.delete(db.get(models.Product, self.ids[1]))
+            db.commit()
+        self.assertNotIn(self.ids[1], titles(self.client))
+
+    def test_product_json_hides_the_version_stamp(self):
+        product = self.client.get("/api/products").json()["products"][0]
+        self.assertNotIn("catalog_version", product)
+        self.assertNotIn("updated_at", product)
+        self.assertIn("price_amount", product)
+
+
+class SearchMatchesStoreAndSqlTest(unittest.TestCase):
+    def setUp(self):
+        Base.metadata.create_all(bind=engine)
+        with session_scope() as db:
+            db.query(models.ProductAttribute).delete()
+            db.query(models.ProductChunk).delete()
+            db.query(models.Product).delete()
+            db.commit()
+            for i, (title, category) in enumerate([
+                ("Hair Oil 100% natural", "hair_care"),
+                ("Hair Oil 1000 ml", "hair care"),
+                ("Scalp a_b serum", "hairXcare"),
+                ("Scalp axb serum", "skin"),
+            ]):
+                crud.create_product(db, schemas.ProductCreate(title=title, category=category, source_url=f"t://{i}"))
+        catalog_store.store = catalog_store.CatalogStore()
+        self.client = TestClient(app)
+
+    def matches(self, store: bool, **params) -> list:
+        response_cache.clear()
+        with mock.patch.object(catalog_store, "CATALOG_STORE", store):
+            body = self.client.get("/api/products", params=params).json()
+        return sorted(p["title"] for p in body["products"])
+
+    def test_wildcard_characters_match_literally(self):
+        cases = [
+            ({"search": "100%"}, ["Hair Oil 100% natural"]),
+            ({"search": "a_b"}, ["Scalp a_b serum"]),
+            ({"category": "hair_"}, ["Hair Oil 100% natural"]),
+        ]
+        for params, expected in cases:
+            with self.subTest(**params):
+                self.assertEqual(self.matches(True, **params), expected)
+                self.assertEqual(self.matches(False, **params), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+from app import api, models, precomputed
+from app.database import Base, engine, session_scope
+from app.main import app
+
+
+class AnswerQueryTest(unittest.TestCase):
+    def setUp(self):
+        Base.metadata.create_all(bind=engine)
+        with session_scope() as db:
+            product = models.Product(title="Hair Oil", source_url="https://example.com/hair-oil", price="₹ 499")
+            db.add(product)
+            db.commit()
+            self.product_id = product.id
+
+    def tearDown(self):
+        with session_scope() as db:
+            db.query(models.Product).filter(models.Product.id == self.product_id).delete()
+            db.commit()
+
+    def test_caller_keeps_its_session(self):
+        results = [(self.product_id, 0.9, "Hair oil for stronger hair.")]
+        with session_scope() as session, \
+                mock.patch.object(api, "search_knn", return_value=results), \
+                mock.patch.object(api, "generate_response", return_value="Try the hair oil.") as llm:
+            db = mock.MagicMock(wraps=session)
+            resp = api.answer_query("hair oil", 3, db)
+            db.close.assert_not_called()
+        llm.assert_called_once()
+        self.assertEqual(resp.message, "Try the hair oil.")
+        self.assertEqual([r.product_id for r in resp.recommendations], [self.product_id])
+
+
+class ChatQueryTest(unittest.TestCase):
+    def setUp(self):
+        Base.metadata.create_all(bind=engine)
+        with session_scope() as db:
+            db.query(models.PrecomputedAnswer).delete()
+            db.commit()
+
+        def fake_answer(query, top_k, db):
+            return api.ChatResponse(message="Use hair oil.", recommendations=[
+                {"product_id": 1, "title": "Hair Oil", "score": 1.0, "reason": "oil"}
+            ], query=query.lower())
+
+        with mock.patch.object(precomputed, "collect_queries", return_value=[("hair oil for stronger hair", 3)]):
+            precomputed.build_answers(answer_fn=fake_answer, k=1, top_k=3)
+        precomputed.invalidate()
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        with session_scope() as db:
+            db.query(models.PrecomputedAnswer).delete()
+            db.commit()
+        precomputed.invalidate()
+
+    def test_query_is_normalized_alike_on_hits_and_misses(self):
+        message = "  Hair Oil For Stronger Hair "
+        hit = self.client.post("/api/chat", json={"message": message, "top_k": 3}).json()
+        self.assertTrue(hit["metadata"]["precomputed"])
+
+        with mock.patch.object(api, "search_knn", return_value=[(1, 0.9, "Hair oil.")]), \
+                mock.patch.object(api, "generate_response", return_value="Use hair oil."):
+            miss = self.client.post("/api/chat", json={"message": message, "top_k": 3, "max_price": 1000}).json()
+        self.assertNotIn("precomputed", miss["metadata"])
+        self.assertEqual(hit["query"], "hair oil for stronger hair")
+        self.assertEqual(miss["query"], hit["query"])
+
+
+if __name__ == "__main__":
+    unittest.main()
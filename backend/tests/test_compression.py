@@ -0,0 +1,41 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from app import compression
+
+CODECS = {
+    "pca": lambda: compression.PCACodec(dim=8),
+    "sq8": compression.ScalarQuantizer,
+    "pq": lambda: compression.ProductQuantizer(subvectors=8),
+}
+
+
+class CompressedIndexTest(unittest.TestCase):
+    def test_saved_index_is_memory_mapped_and_searches_the_same(self):
+        rng = np.random.default_rng(0)
+        x = compression.normalize(rng.normal(size=(300, 32)))
+        ids = np.arange(300, dtype=np.int64)
+        q = x[7] + 0.01
+        for method, make in CODECS.items():
+            with self.subTest(method=method):
+                codec = make().fit(x)
+                trained = compression.CompressedIndex(codec, codec.encode(x), ids, ids)
+                path = Path(tempfile.mkdtemp()) / "compressed"
+                trained.save(path)
+                loaded = compression.CompressedIndex.load(path)
+
+                self.assertEqual(loaded.method, method)
+                self.assertIsInstance(loaded.codes, np.memmap)
+                for array in loaded.codec.to_arrays().values():
+                    self.assertIsInstance(array, np.memmap)
+                expected, expected_scores = trained.search(q, 5)
+                got, scores = loaded.search(q, 5)
+                np.testing.assert_array_equal(got, expected)
+                np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+
+
+if __name__ == "__main__":
+    unittest.main()
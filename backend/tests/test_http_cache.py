@@ -0,0 +1,79 @@
+import gzip
+import unittest
+
+from fastapi.testclient import TestClient
+
+from app import catalog_store, crud, models, schemas
+from app.database import Base, engine, session_scope
+from app.http_cache import _accepts_gzip, response_cache
+from app.main import app
+
+
+class AcceptEncodingTest(unittest.TestCase):
+    def test_q_values(self):
+        for header, expected in [
+            ("gzip", True),
+            ("gzip, deflate, br", True),
+            ("GZIP;q=0.5", True),
+            ("x-gzip", True),
+            ("*", True),
+            ("gzip;q=0", False),
+            ("gzip; q=0.0, identity", False),
+            ("*;q=0", False),
+            ("br, *;q=0.1", True),
+            ("gzip;q=0, *", False),
+            ("identity", False),
+            ("", False),
+        ]:
+            with self.subTest(header=header):
+                self.assertEqual(_accepts_gzip(header), expected)
+
+
+class CatalogResponseTest(unittest.TestCase):
+    def setUp(self):
+        Base.metadata.create_all(bind=engine)
+        with session_scope() as db:
+            db.query(models.ProductAttribute).delete()
+            db.query(models.ProductChunk).delete()
+            db.query(models.Product).delete()
+            db.commit()
+            self.product_id = crud.create_product(db, schemas.ProductCreate(title="Hair Oil", source_url="t://oil")).id
+        catalog_store.store = catalog_store.CatalogStore()
+        response_cache.clear()
+        self.client = TestClient(app)
+
+    def get(self, **headers):
+        return self.client.get("/api/products", headers=headers)
+
+    def test_matching_if_none_match_is_not_modified(self):
+        first = self.get()
+        self.assertEqual(first.status_code, 200)
+        again = self.get(**{"If-None-Match": first.headers["etag"]})
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b"")
+        self.assertEqual(again.headers["etag"], first.headers["etag"])
+
+    def test_etag_changes_after_a_catalog_write(self):
+        etag = self.get().headers["etag"]
+        with session_scope() as db:
+            db.get(models.Product, self.product_id).title = "Renamed"
+            db.commit()
+        after = self.get(**{"If-None-Match": etag})
+        self.assertEqual(after.status_code, 200)
+        self.assertNotEqual(after.headers["etag"], etag)
+        self.assertEqual(after.json()["products"][0]["title"], "Renamed")
+
+    def test_gzip_negotiation(self):
+        for accept, compressed in [("gzip", True), ("gzip;q=0", False), ("identity", False)]:
+            with self.subTest(accept=accept):
+                # the client decodes gzip transparently; read the raw bytes instead
+                with self.client.stream("GET", "/api/products", headers={"Accept-Encoding": accept}) as resp:
+                    raw = b"".join(resp.iter_raw())
+                self.assertEqual(resp.headers.get("content-encoding") == "gzip", compressed)
+                self.assertEqual(resp.headers["etag"].endswith('-gz"'), compressed)
+                body = gzip.decompress(raw) if compressed else raw
+                self.assertIn(b"Hair Oil", body)
+
+
+if __name__ == "__main__":
+    unittest.main()
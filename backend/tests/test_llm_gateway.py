@@ -0,0 +1,104 @@
+import threading
+import time
+import unittest
+
+from app.llm_gateway import CircuitBreaker, LatencyWindow, LLMGateway
+
+
+class FakeUpstream:
+    """call(prompt, timeout) stand-in: replies "answer: <prompt>" after `delays` (one per call, then the last)."""
+
+    def __init__(self, delays=(0.0,), fail: bool = False, release: threading.Event = None):
+        self.delays = list(delays)
+        self.fail = fail
+        self.release = release
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt, timeout=None):
+        with self._lock:
+            n = self.calls
+            self.calls += 1
+        if self.release is not None:
+            self.release.wait(5)
+        time.sleep(self.delays[min(n, len(self.delays) - 1)])
+        if self.fail:
+            raise RuntimeError("upstream down")
+        return f"answer: {prompt}"
+
+
+class CoalescingTest(unittest.TestCase):
+    def test_identical_prompts_in_flight_share_one_call(self):
+        release = threading.Event()
+        upstream = FakeUpstream(release=release)
+        gateway = LLMGateway(upstream, budget=5)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(gateway.generate("hair fall"))) for _ in range(4)]
+        for t in threads:
+            t.start()
+        time.sleep(0.1)
+        release.set()
+        for t in threads:
+            t.join()
+        self.assertEqual(upstream.calls, 1)
+        self.assertEqual(results, ["answer: hair fall"] * 4)
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def test_opens_probes_and_closes(self):
+        upstream = FakeUpstream(fail=True)
+        breaker = CircuitBreaker(failures=2, reset_seconds=0.05)
+        gateway = LLMGateway(upstream, budget=1, breaker=breaker)
+
+        self.assertIsNone(gateway.generate("a"))
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertIsNone(gateway.generate("b"))
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertIsNone(gateway.generate("c"))
+        self.assertEqual(upstream.calls, 2)  # short-circuited
+
+        time.sleep(0.06)
+        self.assertIsNone(gateway.generate("d"))  # failed probe
+        self.assertEqual((upstream.calls, breaker.state), (3, CircuitBreaker.OPEN))
+
+        time.sleep(0.06)
+        upstream.fail = False
+        self.assertEqual(gateway.generate("e"), "answer: e")
+        self.assertEqual((breaker.state, breaker.failures), (CircuitBreaker.CLOSED, 0))
+
+    def test_probe_without_budget_does_not_leave_the_breaker_half_open(self):
+        upstream = FakeUpstream()
+        breaker = CircuitBreaker(failures=1, reset_seconds=0.01)
+        gateway = LLMGateway(upstream, budget=1, breaker=breaker)
+        breaker.failure()
+        time.sleep(0.02)
+
+        self.assertIsNone(gateway.generate("a", budget=-1))  # allowed as the probe, but no time left to call
+        self.assertEqual(upstream.calls, 0)
+        self.assertNotEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertEqual(gateway.generate("b"), "answer: b")
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+
+class HedgingTest(unittest.TestCase):
+    def test_slow_attempt_is_hedged_and_the_first_answer_wins(self):
+        latency = LatencyWindow(min_samples=1)
+        for _ in range(10):
+            latency.add(0.02)
+        upstream = FakeUpstream(delays=(1.0, 0.0))
+        gateway = LLMGateway(upstream, budget=5, hedge=True, latency=latency)
+
+        start = time.monotonic()
+        self.assertEqual(gateway.generate("sleep"), "answer: sleep")
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(upstream.calls, 2)
+
+    def test_no_hedge_without_latency_history(self):
+        upstream = FakeUpstream(delays=(0.05,))
+        gateway = LLMGateway(upstream, budget=5, hedge=True, latency=LatencyWindow(min_samples=20))
+        self.assertEqual(gateway.generate("sleep"), "answer: sleep")
+        self.assertEqual(upstream.calls, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import threading
+import time
+import unittest
+
+from app.metrics import SamplingProfiler
+
+
+def _busy(stop: threading.Event, depth: int):
+    if depth:
+        return _busy(stop, depth - 1)
+    while not stop.is_set():
+        time.sleep(0.001)
+
+
+class SamplingProfilerTest(unittest.TestCase):
+    def setUp(self):
+        self.stop = threading.Event()
+        self.threads = [threading.Thread(target=_busy, args=(self.stop, d), daemon=True) for d in range(5)]
+        for t in self.threads:
+            t.start()
+
+    def tearDown(self):
+        self.stop.set()
+        for t in self.threads:
+            t.join()
+
+    def test_stops_itself_after_seconds(self):
+        profiler = SamplingProfiler(interval=0.001)
+        profiler.start(seconds=0.05)
+        profiler._thread.join(timeout=2)
+        self.assertFalse(profiler.running)
+        self.assertGreater(profiler.summary()["samples"], 0)
+
+    def test_distinct_stacks_are_capped(self):
+        profiler = SamplingProfiler(interval=0.001, max_stacks=2)
+        profiler.start(seconds=0.1)
+        # reading while sampling must not see the counter change size mid-iteration
+        while profiler.running:
+            profiler.summary()
+            profiler.collapsed()
+        summary = profiler.summary(top=10)
+        self.assertLessEqual(summary["distinct_stacks"], 3)
+        self.assertIn(SamplingProfiler.OTHER_STACK, profiler.collapsed())
+
+
+if __name__ == "__main__":
+    unittest.main()
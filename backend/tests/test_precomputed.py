@@ -0,0 +1,108 @@
+import json
+import os
+import tempfile
+import types
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from app import leases, models, precomputed
+from app.database import Base, engine, session_scope
+
+HAIR_OIL = [
+    ("hair oil for stronger hair", 5),
+    ("hair oil for hair fall", 3),
+    ("best hair oil for stronger hair", 2),
+    ("stronger hair oil", 2),
+]
+OUTLIER = "best protein powder for gym bulking"
+
+
+def fake_answer(query, top_k, db):
+    return types.SimpleNamespace(
+        message=f"Answer for {query}",
+        recommendations=[{"product_id": 1, "title": "Hair Oil", "score": 1.0, "reason": "oil"}],
+        metadata={"prompt_tokens": 1},
+    )
+
+
+class PrecomputedLookupTest(unittest.TestCase):
+    def setUp(self):
+        Base.metadata.create_all(bind=engine)
+        with session_scope() as db:
+            db.query(models.PrecomputedAnswer).delete()
+            db.commit()
+        precomputed.invalidate()
+
+    def build(self, queries):
+        with mock.patch.object(precomputed, "collect_queries", return_value=queries):
+            return precomputed.build_answers(answer_fn=fake_answer, k=1, top_k=3)
+
+    def test_outlier_member_is_not_served(self):
+        # k=1 forces the outlier into the hair oil cluster
+        self.assertEqual(self.build(HAIR_OIL + [(OUTLIER, 1)]), 1)
+        with session_scope() as db:
+            row = db.query(models.PrecomputedAnswer).one()
+            members = {m["query"]: m["similarity"] for m in row.member_queries}
+            self.assertNotIn(OUTLIER, members)
+            self.assertTrue(all(sim >= precomputed.PRECOMPUTED_MIN_SIMILARITY for sim in members.values()))
+
+            self.assertIsNone(precomputed.lookup(OUTLIER, 3, db)[0])
+
+    def test_confident_member_reports_its_similarity(self):
+        self.build(HAIR_OIL + [(OUTLIER, 1)])
+        with session_scope() as db:
+            row = db.query(models.PrecomputedAnswer).one()
+            member = row.member_queries[0]
+            hit, _ = precomputed.lookup(member["query"], 3, db)
+        self.assertIsNotNone(hit)
+        self.assertEqual(hit["metadata"]["similarity"], member["similarity"])
+        self.assertLess(hit["metadata"]["similarity"], 1.0)
+
+
+class PrecomputeLeaseTest(unittest.TestCase):
+    def setUp(self):
+        Base.metadata.create_all(bind=engine)
+        with session_scope() as db:
+            db.query(models.JobLease).delete()
+            db.query(models.PrecomputedAnswer).delete()
+            db.commit()
+
+    def test_lease_is_exclusive_until_released_or_expired(self):
+        token = leases.acquire("job", 60)
+        self.assertIsNotNone(token)
+        self.assertIsNone(leases.acquire("job", 60))
+        leases.release("job", token)
+        self.assertIsNotNone(leases.acquire("job", -1))  # already expired
+        self.assertIsNotNone(leases.acquire("job", 60))
+
+    def test_build_skips_while_another_process_rebuilds(self):
+        token = leases.acquire(precomputed.LEASE_NAME, 60)
+        answer = mock.Mock(side_effect=fake_answer)
+        with mock.patch.object(precomputed, "collect_queries", return_value=HAIR_OIL):
+            self.assertEqual(precomputed.build_answers(answer_fn=answer, k=1), 0)
+            answer.assert_not_called()
+            leases.release(precomputed.LEASE_NAME, token)
+            self.assertEqual(precomputed.build_answers(answer_fn=answer, k=1), 1)
+            # the next process to notice the new catalog finds it already rebuilt
+            self.assertEqual(precomputed.build_answers(answer_fn=answer, k=1, if_stale=True), 0)
+        self.assertEqual(answer.call_count, 1)
+
+
+class QueryLogTest(unittest.TestCase):
+    def test_log_is_rotated_and_both_generations_are_read(self):
+        path = Path(tempfile.mkdtemp()) / "queries.jsonl"
+        with mock.patch.multiple(precomputed, QUERY_LOG=True, QUERY_LOG_PATH=path, QUERY_LOG_MAX_BYTES=200):
+            for i in range(10):
+                precomputed.log_query(f"hair oil number {i}")
+            self.assertLess(os.path.getsize(path), 200)
+            rotated = path.with_name(path.name + ".1")
+            self.assertLessEqual(os.path.getsize(rotated), 200 + 100)
+            logged = [json.loads(line)["query"] for p in (rotated, path) for line in p.read_text().splitlines()]
+            self.assertEqual(logged, [f"hair oil number {i}" for i in range(10)][-len(logged):])
+            collected = {q for q, _ in precomputed.collect_queries()}
+        self.assertTrue(set(logged) <= collected)
+
+
+if __name__ == "__main__":
+    unittest.main()
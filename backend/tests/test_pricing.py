@@ -0,0 +1,45 @@
+import unittest
+
+from app.pricing import parse_price
+
+
+class ParsePriceTest(unittest.TestCase):
+    def test_parse_price(self):
+        for text, expected in [
+            # currency symbols and codes
+            ("₹ 499", (499.0, "INR")),
+            ("Rs. 1,299.50", (1299.5, "INR")),
+            ("INR 250", (250.0, "INR")),
+            ("$19.99", (19.99, "USD")),
+            ("€ 12", (12.0, "EUR")),
+            ("£7.5", (7.5, "GBP")),
+            ("Price: 350", (350.0, "INR")),
+            # thousands separators, western and Indian grouping
+            ("₹1,058", (1058.0, "INR")),
+            ("₹1,00,000", (100000.0, "INR")),
+            ("$1,234,567.89", (1234567.89, "USD")),
+            # ranges and sale/MRP pairs: the first amount wins
+            ("₹499 - ₹999", (499.0, "INR")),
+            ("MRP:Regular price₹ 1,058₹1249Regular price₹ 1,058Sale price", (1058.0, "INR")),
+            # percentages are discounts, not prices
+            ("20% off", (None, None)),
+            ("Save 15 % today", (None, None)),
+            ("20% off, now 399", (399.0, "INR")),
+            ("20% off ₹ 799", (799.0, "INR")),
+            # unparseable
+            ("", (None, None)),
+            ("Sold out", (None, None)),
+            ("v2.0", (None, None)),
+            (None, (None, None)),
+        ]:
+            with self.subTest(text=text):
+                self.assertEqual(parse_price(text), expected)
+
+    def test_numbers_and_currency_override(self):
+        self.assertEqual(parse_price(499), (499.0, "INR"))
+        self.assertEqual(parse_price("$10", currency="cad"), (10.0, "CAD"))
+        self.assertEqual(parse_price(12.5, currency="usd"), (12.5, "USD"))
+
+
+if __name__ == "__main__":
+    unittest.main()
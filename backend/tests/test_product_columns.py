@@ -0,0 +1,43 @@
+import types
+import unittest
+
+import numpy as np
+
+from app.product_columns import ProductColumns
+from app.search_filters import AttributeTable, SearchFilters
+
+
+def row(pid, category, price):
+    return types.SimpleNamespace(id=pid, category=category, price_amount=price)
+
+
+ROWS = [row(3, "Hair Care", 499), row(1, "hair care", None), row(7, "Skin", 1200), row(5, None, 250)]
+
+
+class ProductColumnsTest(unittest.TestCase):
+    def test_mask_matches_category_case_insensitively_and_drops_unknown_prices(self):
+        cols = ProductColumns.build(ROWS)
+        self.assertEqual(cols.ids.tolist(), [1, 3, 5, 7])
+        self.assertEqual(cols.ids[cols.mask(category="HAIR")].tolist(), [1, 3])
+        self.assertEqual(cols.ids[cols.mask(max_price=500)].tolist(), [3, 5])
+        self.assertEqual(cols.ids[cols.mask(category="hair", min_price=100)].tolist(), [3])
+
+    def test_replace_equals_a_fresh_build(self):
+        cols = ProductColumns.build(ROWS[:3])
+        changed = row(3, "Skin", 99)
+        merged = cols.replace({1: changed}, [row(9, "Oils", 10)])
+        fresh = ProductColumns.build([ROWS[1], changed, ROWS[2], row(9, "Oils", 10)])
+        self.assertEqual(merged.ids.tolist(), fresh.ids.tolist())
+        np.testing.assert_array_equal(merged.prices, fresh.prices)
+        self.assertEqual(
+            [merged.categories[c] for c in merged.category_codes], [fresh.categories[c] for c in fresh.category_codes]
+        )
+
+    def test_attribute_table_masks_chunks_of_unknown_products(self):
+        table = AttributeTable("v1", ROWS, [(3, "size", "100 ml"), (1, "size", "50 ml")])
+        keep = table.chunk_mask(SearchFilters(category="hair", attributes={"size": "100"}), [1, 3, 3, 42])
+        self.assertEqual(keep.tolist(), [False, True, True, False])
+
+
+if __name__ == "__main__":
+    unittest.main()
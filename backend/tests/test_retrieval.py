@@ -0,0 +1,99 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from app import compression, index_snapshot, models, retrieval
+from app.catalog import get_catalog_version
+from app.database import Base, engine, session_scope
+
+DIM = 8
+
+
+def vector(i: int) -> list:
+    v = np.full(DIM, 0.01, dtype=np.float32)
+    v[i % DIM] = 1.0
+    return v.tolist()
+
+
+class FakeModel:
+    """Encodes "q<i>" as the unit vector of axis i."""
+
+    def encode(self, texts, convert_to_numpy=True, **kwargs):
+        return np.array([vector(int(t[1:])) for t in texts], dtype=np.float32)
+
+
+class SnapshotSearchTest(unittest.TestCase):
+    def setUp(self):
+        Base.metadata.create_all(bind=engine)
+        patcher = mock.patch.object(retrieval, "get_embedding_model", return_value=FakeModel())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with session_scope() as db:
+            db.query(models.ProductChunk).delete()
+            db.query(models.Product).delete()
+            product = models.Product(title="Hair Oil", source_url="https://example.com/snapshot-test")
+            db.add(product)
+            db.flush()
+            self.product_id = product.id
+            db.add_all([
+                models.ProductChunk(product_id=product.id, chunk_text=f"chunk {i}", embedding=vector(i))
+                for i in range(6)
+            ])
+            db.commit()
+            retrieval.build_index_snapshot(db)
+
+    def add_chunk(self, i: int):
+        with session_scope() as db:
+            db.add(models.ProductChunk(product_id=self.product_id, chunk_text=f"new chunk {i}", embedding=vector(i)))
+            db.commit()
+
+    def search(self, query, top_k=1):
+        with session_scope(read_only=True) as db, \
+                mock.patch.object(retrieval, "_search_snapshot", wraps=retrieval._search_snapshot) as snapshot:
+            return retrieval.search_knn(query, top_k=top_k, db=db), snapshot.called
+
+    def test_current_snapshot_is_searched(self):
+        results, from_snapshot = self.search("q2")
+        self.assertTrue(from_snapshot)
+        self.assertEqual(results[0][2], "chunk 2")
+
+    def test_stale_snapshot_falls_back_to_db_scan_and_is_rebuilt(self):
+        self.add_chunk(7)
+        with mock.patch.object(retrieval, "_rebuild_snapshot_in_background") as rebuild:
+            results, from_snapshot = self.search("q7")
+        self.assertFalse(from_snapshot)
+        self.assertEqual(results[0][2], "new chunk 7")
+        with session_scope(read_only=True) as db:
+            rebuild.assert_called_once_with(get_catalog_version(db))
+
+        retrieval.build_index_snapshot()
+        results, from_snapshot = self.search("q7")
+        self.assertTrue(from_snapshot)
+        self.assertEqual(results[0][2], "new chunk 7")
+
+    def check_deleted_chunks_are_replaced(self):
+        # the top 3 hits are deleted after the snapshot was taken; 3 other chunks remain
+        snap = index_snapshot.get_snapshot(force=True)
+        q = np.array(vector(0), dtype=np.float32)
+        with session_scope() as db:
+            first = [text for _, _, text in retrieval._search_snapshot(db, snap, q, 3)]
+            db.query(models.ProductChunk).filter(models.ProductChunk.chunk_text.in_(first)).delete()
+            db.commit()
+            results = retrieval._search_snapshot(db, snap, q, 3)
+        self.assertEqual(len(results), 3)
+        self.assertFalse({text for _, _, text in results} & set(first))
+
+    def test_chunks_deleted_after_the_snapshot_are_replaced(self):
+        self.check_deleted_chunks_are_replaced()
+
+    def test_chunks_deleted_after_the_compressed_snapshot_are_replaced(self):
+        with mock.patch.object(compression, "COMPRESSION", "sq8"):
+            with session_scope() as db:
+                retrieval.build_index_snapshot(db)
+            self.assertIsNotNone(index_snapshot.get_snapshot(force=True).compressed)
+            self.check_deleted_chunks_are_replaced()
+
+
+if __name__ == "__main__":
+    unittest.main()